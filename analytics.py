@@ -0,0 +1,119 @@
+"""
+analytics.py
+Purpose: Collect every comic, movie and LEGO result into one snapshot
+
+build_snapshot() runs each calculate_* function in calculations.py once and
+returns their results as a read-only AnalyticsSnapshot, which the report
+writers share, so writing the report in several formats doesn't re-run the
+same queries. The aggregation itself stays in SQL (GROUP BY over covering
+indexes, or the aggregate tables when they exist), every query goes
+through the same shared connection (connections.py), and each result is
+kept in the result cache (result_cache.py).
+"""
+
+import sqlite3
+from types import MappingProxyType
+from typing import Mapping, NamedTuple
+
+from tracing import traced
+
+
+class AnalyticsSnapshot(NamedTuple):
+    """
+    Read-only results of every calculation, same shapes as calculations.py:
+
+        comics_per_year:         {year: count}
+        rating_differences:      {title: {"imdb", "rt", "difference", "is_star_wars"}}
+        average_ratings:         {"star_wars": {...}, "other_movies": {...}}
+        top_rated_movies:        {"top_by_imdb": (...), "top_by_rt": (...)}
+        lego_complexity_by_year: {year: average_num_parts}
+        top_lego_sets:           ({"set_num", "name", "year", "num_parts"}, ...)
+        lego_theme_averages:     ((theme_name, avg_parts, set_count), ...)
+    """
+
+    comics_per_year: Mapping
+    rating_differences: Mapping
+    average_ratings: Mapping
+    top_rated_movies: Mapping
+    lego_complexity_by_year: Mapping
+    top_lego_sets: tuple
+    lego_theme_averages: tuple
+
+
+def _freeze(value):
+    """Recursively turns dicts into read-only mappings and lists into tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+@traced()
+def _movie_aggregates_columnar(db_filename):
+    # NumPy is only needed for this path
+    from movie_columns import MovieColumns
+
+    try:
+        columns = MovieColumns.load(db_filename)
+    except sqlite3.Error as e:
+        print(f"Database error (movies): {e}")
+        return {}, {}, {}
+    return (
+        columns.rating_differences(),
+        columns.average_ratings(),
+        columns.top_rated(10),
+    )
+
+
+@traced()
+def build_snapshot(db_filename="starwars.db", top_lego_limit=10, columnar=False):
+    """
+    Computes every calculation once, with one shared connection.
+
+    Args:
+        db_filename (str): filename of the database
+        top_lego_limit (int): how many of the most complex sets to keep
+        columnar (bool): compute the movie results with NumPy arrays
+            (movie_columns.py) instead of the SQL queries, as
+            `main.py calc --columnar` does. Same results, but slower than
+            SQL end to end (2.9s vs 2.3s at 1M movies, see
+            benchmarks/bench_movie_columnar.py and the build_snapshot*
+            entries of run_benchmarks.py); only the averages and top-10
+            lists on their own are faster, and the columnar results are
+            not kept in the result cache.
+
+    Returns:
+        AnalyticsSnapshot: read-only results. Parts that hit a database
+            error are left empty, like the calculate_* functions do.
+    """
+    # calculations imports this module, so it can't be imported at the top
+    from calculations import (
+        calculate_average_ratings_comparison,
+        calculate_comics_per_year,
+        calculate_lego_complexity_by_year,
+        calculate_lego_theme_averages,
+        calculate_rating_differences,
+        calculate_top_lego_sets,
+        calculate_top_rated_movies,
+    )
+
+    if columnar:
+        rating_differences, average_ratings, top_rated_movies = (
+            _movie_aggregates_columnar(db_filename)
+        )
+    else:
+        rating_differences = calculate_rating_differences(db_filename)
+        average_ratings = calculate_average_ratings_comparison(db_filename)
+        top_rated_movies = calculate_top_rated_movies(db_filename)
+
+    results = {
+        "comics_per_year": calculate_comics_per_year(db_filename),
+        "rating_differences": rating_differences,
+        "average_ratings": average_ratings,
+        "top_rated_movies": top_rated_movies,
+        "lego_complexity_by_year": calculate_lego_complexity_by_year(db_filename),
+        "top_lego_sets": calculate_top_lego_sets(top_lego_limit, db_filename),
+        "lego_theme_averages": calculate_lego_theme_averages(db_filename),
+    }
+    return AnalyticsSnapshot(**{k: _freeze(v) for k, v in results.items()})
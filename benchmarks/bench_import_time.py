@@ -0,0 +1,141 @@
+"""
+bench_import_time.py
+Purpose: Measure how fast each main.py subcommand starts
+
+Runs `python -X importtime main.py <command>` against a synthetic database
+(see synthetic_db.py) in a temp folder and reports, per subcommand, the
+time spent importing modules and the total wall time, next to a bare
+`python -c pass` for reference. The slowest imports of each subcommand are
+listed so a heavy import that sneaks back in is easy to spot.
+
+`collect` isn't run (it needs the network); its imports are timed with
+`main.py collect --help`, which is what it loads before contacting an API.
+
+Usage (from the project root):
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --rows 100000 --repeat 5 --top 8
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from synthetic_db import generate_database
+
+MAIN = os.path.join(ROOT_DIR, "main.py")
+
+# (label, command line after `python -X importtime`)
+COMMANDS = (
+    ("python -c pass", ["-c", "pass"]),
+    ("status", [MAIN, "status"]),
+    ("calc", [MAIN, "calc"]),
+    ("setup", [MAIN, "setup"]),
+    ("collect --help", [MAIN, "collect", "--help"]),
+    ("plot", [MAIN, "plot", "--dpi", "50"]),
+)
+
+
+def parse_importtime(stderr):
+    """
+    Reads -X importtime output.
+
+    Returns:
+        dict: {top-level module: cumulative microseconds}, i.e. the modules
+            imported directly by the script rather than by another module
+    """
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        # Nested imports are indented by two spaces per level
+        if not name[1:].startswith(" "):
+            imports[name.strip()] = int(cumulative)
+    return imports
+
+
+def run_once(args, work_dir, db_filename):
+    """
+    Runs one command under -X importtime.
+
+    Returns:
+        tuple: (wall seconds, {module: cumulative microseconds})
+    """
+    command = [sys.executable, "-X", "importtime", *args]
+    if args[0] == MAIN:
+        command[4:4] = ["--db", db_filename]
+    env = dict(os.environ, MPLBACKEND="Agg")
+    start = time.perf_counter()
+    result = subprocess.run(
+        command, cwd=work_dir, env=env, capture_output=True, text=True
+    )
+    seconds = time.perf_counter() - start
+    if result.returncode != 0:
+        raise SystemExit(f"{' '.join(args)} failed:\n{result.stderr[-2000:]}")
+    return seconds, parse_importtime(result.stderr)
+
+
+def measure(args, work_dir, db_filename, repeat):
+    """
+    One untimed warm-up run (fills the OS and result caches), then `repeat`
+    timed runs.
+
+    Returns:
+        tuple: (median wall seconds, median import seconds, {module: seconds}
+            from the fastest run)
+    """
+    run_once(args, work_dir, db_filename)
+    runs = [run_once(args, work_dir, db_filename) for _ in range(repeat)]
+    import_totals = [sum(imports.values()) / 1e6 for _, imports in runs]
+    fastest = min(runs, key=lambda run: run[0])[1]
+    return (
+        statistics.median(seconds for seconds, _ in runs),
+        statistics.median(import_totals),
+        {name: us / 1e6 for name, us in fastest.items()},
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10_000, help="database rows")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs each")
+    parser.add_argument("--top", type=int, default=5, help="slowest imports shown")
+    parser.add_argument("--seed", type=int, default=0, help="synthetic data seed")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_filename = os.path.join(work_dir, "starwars.db")
+        generate_database(db_filename, rows=args.rows, seed=args.seed)
+        for label, command in COMMANDS:
+            results[label] = measure(command, work_dir, db_filename, args.repeat)
+
+    baseline_wall, _, _ = results["python -c pass"]
+    print(
+        f"\n{'Command':<18} {'Imports (ms)':>13} {'Wall (ms)':>10} {'Over python':>12}"
+    )
+    print("-" * 56)
+    for label, (wall, imports, _) in results.items():
+        print(
+            f"{label:<18} {imports * 1000:>13.1f} {wall * 1000:>10.1f} "
+            f"{(wall - baseline_wall) * 1000:>+12.1f}"
+        )
+
+    for label, (_, _, modules) in results.items():
+        if label == "python -c pass":
+            continue
+        slowest = sorted(modules.items(), key=lambda item: -item[1])[: args.top]
+        print(f"\nSlowest imports, {label}:")
+        for name, seconds in slowest:
+            print(f"  {name:<40} {seconds * 1000:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+bench_movie_columnar.py
+Purpose: Compare the SQL/loop movie calculations with the NumPy columnar ones
+
+Builds a synthetic database with only MovieMetrics rows (see synthetic_db.py)
+and times two ways of computing the rating differences, group averages
+and top-10 lists:
+
+    sql:      calculate_rating_differences + calculate_average_ratings_comparison
+              + calculate_top_rated_movies (four queries, what build_snapshot runs)
+    columnar: movie_columns.MovieColumns (one query, NumPy arrays)
+
+The results are checked against each other and the script exits with
+status 1 if they differ.
+
+Usage (from the project root):
+    python benchmarks/bench_movie_columnar.py --movies 1000000
+"""
+
+import argparse
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calculations import (
+    calculate_average_ratings_comparison,
+    calculate_rating_differences,
+    calculate_top_rated_movies,
+)
+from movie_columns import MovieColumns
+from result_cache import disable as disable_result_cache
+from synthetic_db import generate_database
+
+# Time the calculations themselves, not the result cache
+disable_result_cache()
+
+
+def run_sql(db_filename):
+    return (
+        calculate_rating_differences(db_filename),
+        calculate_average_ratings_comparison(db_filename),
+        calculate_top_rated_movies(db_filename),
+    )
+
+
+def run_columnar(db_filename):
+    columns = MovieColumns.load(db_filename)
+    return (
+        columns.rating_differences(),
+        columns.average_ratings(),
+        columns.top_rated(10),
+    )
+
+
+def same_results(expected, actual):
+    """
+    Compares (rating_differences, averages, top_rated) results. Averages may
+    differ in the last bits (different summation order), and movies tied on
+    a top-10 score may come back in a different order, so the top lists are
+    compared by score.
+    """
+    diffs_a, averages_a, top_a = expected
+    diffs_b, averages_b, top_b = actual
+    if diffs_a != diffs_b:
+        return False
+    for group in ("star_wars", "other_movies"):
+        for key in ("imdb", "rt", "count"):
+            if not math.isclose(
+                averages_a[group][key], averages_b[group][key], rel_tol=1e-9
+            ):
+                return False
+    for key, score in (("top_by_imdb", "imdb"), ("top_by_rt", "rt")):
+        if [m[score] for m in top_a[key]] != [m[score] for m in top_b[key]]:
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark columnar movie metrics")
+    parser.add_argument("--movies", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--db", help="reuse/keep this database instead of a temp file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_filename = args.db or os.path.join(temp_dir, "movies.db")
+        if not (args.db and os.path.exists(args.db)):
+            start = time.perf_counter()
+            generate_database(
+                db_filename, rows=args.movies, shares={"MovieMetrics": 1.0}
+            )
+            print(
+                f"Generated {args.movies:,} movies in {time.perf_counter() - start:.1f}s"
+            )
+
+        results = {}
+        print(f"\n{'Mode':<10} {'Median (s)':>11} {'Speedup':>8}")
+        print("-" * 31)
+        baseline = None
+        for mode, func in (
+            ("sql", run_sql),
+            ("columnar", run_columnar),
+        ):
+            times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                results[mode] = func(db_filename)
+                times.append(time.perf_counter() - start)
+            median = statistics.median(times)
+            baseline = baseline or median
+            print(f"{mode:<10} {median:>11.3f} {baseline / median:>7.1f}x")
+
+    ok = same_results(results["sql"], results["columnar"])
+    print("\nResults match." if ok else "\nERROR: results differ!")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
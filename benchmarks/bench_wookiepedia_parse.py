@@ -0,0 +1,108 @@
+"""
+bench_wookiepedia_parse.py
+Purpose: Compare the full-tree and comic-rows-only parsers in collect_wookiepedia
+
+Runs both modes of find_comic_rows, the parser scrape() uses, on a saved
+copy of the "Timeline of canon media" page, extracts every row the way
+scrape() does, and reports parse time and peak memory (tracemalloc) for each.
+
+Usage (from the project root):
+    python benchmarks/bench_wookiepedia_parse.py --save      # download a copy first
+    python benchmarks/bench_wookiepedia_parse.py --html timeline.html --repeat 5
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "collection_files"
+    ),
+)
+
+from collect_wookiepedia import collect_comics, extract_comic_row, find_comic_rows
+
+
+def parse(html_content, fast):
+    """What scrape() does with the page when every row is new."""
+    return [extract_comic_row(row) for row in find_comic_rows(html_content, fast)]
+
+
+def measure(html_content, fast, repeat):
+    """
+    Parses the page `repeat` times and returns the rows plus timing/memory stats.
+
+    Returns:
+        tuple: (rows, median_seconds, peak_bytes)
+    """
+    times = []
+    rows = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = parse(html_content, fast)
+        times.append(time.perf_counter() - start)
+
+    # Separate run for memory, tracemalloc slows parsing down a lot
+    tracemalloc.start()
+    parse(html_content, fast)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return rows, statistics.median(times), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument(
+        "--html", default="timeline.html", help="saved copy of the page"
+    )
+    parser.add_argument(
+        "--save", action="store_true", help="download the page to --html first"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per mode")
+    args = parser.parse_args()
+
+    if args.save:
+        with open(args.html, "w", encoding="utf-8") as f:
+            f.write(collect_comics())
+        print(f"Saved page to {args.html}")
+
+    if not os.path.exists(args.html):
+        print(f"ERROR: {args.html} not found. Run with --save to download it.")
+        sys.exit(1)
+
+    with open(args.html, encoding="utf-8") as f:
+        html_content = f.read()
+    print(
+        f"Page size: {len(html_content) / 1024 / 1024:.1f} MB, {args.repeat} runs per mode\n"
+    )
+
+    full_rows, full_time, full_peak = measure(html_content, False, args.repeat)
+    fast_rows, fast_time, fast_peak = measure(html_content, True, args.repeat)
+
+    print(f"{'Mode':<20} {'Rows':>6} {'Time (s)':>10} {'Peak MB':>10}")
+    print("-" * 50)
+    print(
+        f"{'full tree':<20} {len(full_rows):>6} {full_time:>10.3f} {full_peak / 1e6:>10.1f}"
+    )
+    print(
+        f"{'comic rows only':<20} {len(fast_rows):>6} {fast_time:>10.3f} {fast_peak / 1e6:>10.1f}"
+    )
+    print("-" * 50)
+    print(
+        f"Speedup: {full_time / fast_time:.1f}x, "
+        f"memory: {full_peak / max(fast_peak, 1):.1f}x less"
+    )
+
+    if full_rows != fast_rows:
+        print("WARNING: the two parsers returned different rows!")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+load_test.py
+Purpose: Load test the three collectors against the local mock API
+
+Starts benchmarks/mock_api.py in the background, points the collectors at it
+through their base-URL environment variables and runs each one against a
+fresh temporary database and HTTP cache. For every collector it reports
+request throughput, latency percentiles, response status counts and rows
+ingested per second.
+
+Usage (from the project root):
+    python benchmarks/load_test.py --latency 0.05 --jitter 0.05 --movies 500
+    python benchmarks/load_test.py --collectors lego --rate-limit-rate 0.02
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import math
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "collection_files"))
+
+from database_setup import database_setup
+from http_cache import HTTPCache, set_cache
+from mock_api import add_config_arguments, base_urls, config_from_args, start_server
+
+COLLECTORS = ["omdb", "lego", "wookieepedia"]
+
+
+class TimedSession(requests.Session):
+    """requests.Session that records the latency and status of every call."""
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.statuses = Counter()
+
+    def request(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = super().request(*args, **kwargs)
+        except requests.RequestException:
+            self._record(start, "error")
+            raise
+        self._record(start, response.status_code)
+        return response
+
+    def _record(self, start, status):
+        with self.lock:
+            self.latencies.append(time.perf_counter() - start)
+            self.statuses[status] += 1
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(pct / 100 * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
+
+
+def count_rows(db_filename, table):
+    conn = sqlite3.connect(db_filename)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def run_collector(name, db_filename, args, config):
+    """
+    Runs one collector against the mock server.
+
+    Returns:
+        tuple: (table the collector fills, whether it finished)
+    """
+    if name == "omdb":
+        collect_omdb = importlib.import_module("collect_omdb")
+        movies = [
+            (f"tt{i:07d}", f"Mock Movie {i}", 0) for i in range(1, config.movies + 1)
+        ]
+        collect_omdb.insert_into_database(
+            limit=len(movies),
+            concurrent=True,
+            max_in_flight=args.max_in_flight,
+            requests_per_second=args.requests_per_second,
+            db_filename=db_filename,
+            movies=movies,
+            api_key="mock",
+        )
+        return "MovieMetrics", True
+
+    if name == "lego":
+        collect_lego = importlib.import_module("collect_lego")
+        collect_lego.sync_lego_catalog(
+            db_filename=db_filename,
+            theme_ids={i: f"Mock Theme {i}" for i in range(1, args.themes + 1)},
+            page_size=args.page_size,
+            max_in_flight=args.max_in_flight,
+            requests_per_second=args.requests_per_second,
+            api_key="mock",
+        )
+        return "lego_sets", True
+
+    collect_wookiepedia = importlib.import_module("collect_wookiepedia")
+    try:
+        html_content = collect_wookiepedia.collect_comics()
+    except SystemExit:
+        # collect_comics() exits when the page can't be fetched
+        return "comics", False
+    collect_wookiepedia.scrape(html_content, db_filename, limit=None)
+    return "comics", True
+
+
+def load_test(name, work_dir, args, config):
+    """
+    Runs one collector on a fresh database and cache and measures it.
+
+    Returns:
+        dict: throughput, latency and ingest statistics
+    """
+    db_filename = os.path.join(work_dir, f"{name}.db")
+    with contextlib.redirect_stdout(io.StringIO()):
+        database_setup(db_filename)
+
+    session = TimedSession()
+    set_cache(HTTPCache(os.path.join(work_dir, f"{name}_cache.db"), session=session))
+
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stdout if args.verbose else output):
+        table, finished = run_collector(name, db_filename, args, config)
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(session.latencies)
+    rows = count_rows(db_filename, table)
+    return {
+        "finished": finished,
+        "seconds": elapsed,
+        "requests": len(latencies),
+        "requests_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            f"p{pct}": percentile(latencies, pct) * 1000 for pct in (50, 90, 95, 99)
+        },
+        "statuses": {str(status): count for status, count in session.statuses.items()},
+        "rows": rows,
+        "rows_per_second": rows / elapsed if elapsed else 0.0,
+    }
+
+
+def print_report(results):
+    print(
+        f"\n{'collector':<14}{'reqs':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+        f"{'p99 ms':>9}{'rows':>8}{'rows/s':>10}  statuses"
+    )
+    for name, stats in results.items():
+        latency = stats["latency_ms"]
+        statuses = ", ".join(f"{k}: {v}" for k, v in sorted(stats["statuses"].items()))
+        flag = "" if stats["finished"] else "  (aborted)"
+        print(
+            f"{name:<14}{stats['requests']:>7}{stats['requests_per_second']:>9.1f}"
+            f"{latency['p50']:>9.1f}{latency['p95']:>9.1f}{latency['p99']:>9.1f}"
+            f"{stats['rows']:>8}{stats['rows_per_second']:>10.1f}  {statuses}{flag}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the collectors")
+    parser.add_argument(
+        "--collectors", nargs="+", choices=COLLECTORS, default=COLLECTORS
+    )
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument(
+        "--requests-per-second",
+        type=float,
+        default=1000.0,
+        help="collector-side rate limit",
+    )
+    parser.add_argument("--themes", type=int, default=5, help="Lego themes to sync")
+    parser.add_argument("--page-size", type=int, default=100, help="Lego page size")
+    parser.add_argument("--output", help="save the results to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="show collector output")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    config = config_from_args(args)
+    server = start_server(config)
+    # Must be set before the collectors are imported, they read it at import time
+    os.environ.update(base_urls(server.url))
+    print(f"Mock API on {server.url}")
+
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            for name in args.collectors:
+                print(f"Running {name}...")
+                results[name] = load_test(name, work_dir, args, config)
+    finally:
+        server.shutdown()
+
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
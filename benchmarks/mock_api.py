@@ -0,0 +1,280 @@
+"""
+mock_api.py
+Purpose: Local stand-in for the OMDb, Rebrickable and Wookieepedia servers
+
+Serves the three endpoints the collectors use, with made-up but
+deterministic data, so they can be load tested without touching the real
+services:
+
+    /omdb/?i=tt0000001              OMDb movie lookup
+    /api/v3/lego/sets/?theme_id=    Rebrickable sets, paginated with `next` links
+    /wiki/Timeline_of_canon_media   timeline page with <tr class="comic"> rows
+
+Latency, the share of 500 errors and 429 (rate limited) responses, and the
+catalog sizes are configurable. Point the collectors at it with the
+OMDB_BASE_URL, REBRICKABLE_BASE_URL and WOOKIEEPEDIA_TIMELINE_URL
+environment variables (see base_urls()).
+
+Usage (from the project root):
+    python benchmarks/mock_api.py --port 8765 --latency 0.05 --error-rate 0.01
+"""
+
+import argparse
+import html
+import json
+import random
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+OMDB_PATH = "/omdb/"
+LEGO_SETS_PATH = "/api/v3/lego/sets/"
+TIMELINE_PATH = "/wiki/Timeline_of_canon_media"
+
+
+@dataclass
+class MockConfig:
+    """
+    How the mock server behaves.
+
+        latency:         seconds added to every response
+        jitter:          extra random 0..jitter seconds per response
+        error_rate:      share of requests answered with a 500
+        rate_limit_rate: share of requests answered with a 429
+        movies:          number of valid IMDb ids (tt0000001 .. ttN)
+        sets_per_theme:  Rebrickable sets returned for each theme
+        comics:          comic rows on the timeline page
+        seed:            seed for the error/latency randomness
+    """
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    movies: int = 1000
+    sets_per_theme: int = 500
+    comics: int = 2000
+    seed: int = 0
+
+
+def _rng_for(key):
+    # Same key -> same fake record, whatever order requests arrive in
+    return random.Random(zlib.crc32(key.encode("utf-8")))
+
+
+def fake_movie(imdb_id):
+    rng = _rng_for(imdb_id)
+    rt = rng.randint(5, 100)
+    return {
+        "Title": f"Mock Movie {imdb_id}",
+        "imdbID": imdb_id,
+        "imdbRating": "N/A" if rng.random() < 0.03 else f"{rng.uniform(3, 9.5):.1f}",
+        "Ratings": [
+            {"Source": "Internet Movie Database", "Value": "7.0/10"},
+            {"Source": "Rotten Tomatoes", "Value": f"{rt}%"},
+        ],
+        "BoxOffice": f"${rng.randint(10_000, 900_000_000):,}",
+        "Response": "True",
+    }
+
+
+def fake_lego_set(theme_id, index):
+    rng = _rng_for(f"{theme_id}-{index}")
+    return {
+        "set_num": f"{theme_id}{index:05d}-1",
+        "name": f"Mock Set {theme_id}-{index}",
+        "year": rng.randint(1999, 2025),
+        "theme_id": theme_id,
+        "num_parts": rng.randint(10, 5000),
+    }
+
+
+def timeline_page(comics):
+    rows = []
+    for i in range(comics):
+        year = 2015 + i % 10
+        rows.append(
+            '<tr class="comic"><td>ABY</td><td>C</td>'
+            f"<td><i>{html.escape(f'Mock Comic {i}')}</i></td>"
+            f"<td>{year}-01-01</td></tr>"
+        )
+    return (
+        "<html><body><table class='sortable'>"
+        "<tr><th>Year</th><th>Type</th><th>Title</th><th>Released</th></tr>"
+        + "".join(rows)
+        + "</table></body></html>"
+    )
+
+
+class MockAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # keep load tests quiet
+
+    def do_GET(self):
+        server = self.server
+        config = server.config
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        with server.lock:
+            delay = config.latency + server.rng.uniform(0, config.jitter)
+            roll = server.rng.random()
+            server.requests += 1
+        if delay:
+            time.sleep(delay)
+
+        if roll < config.rate_limit_rate:
+            self._send(429, {"detail": "Request was throttled."}, {"Retry-After": "1"})
+        elif roll < config.rate_limit_rate + config.error_rate:
+            self._send(500, {"detail": "Mock server error."})
+        elif url.path == OMDB_PATH:
+            self._omdb(query)
+        elif url.path == LEGO_SETS_PATH:
+            self._lego_sets(url, query)
+        elif url.path == TIMELINE_PATH:
+            self._send(200, server.timeline, content_type="text/html; charset=utf-8")
+        else:
+            self._send(404, {"detail": "Not found."})
+
+    def _omdb(self, query):
+        imdb_id = query.get("i", "")
+        try:
+            number = int(imdb_id[2:]) if imdb_id.startswith("tt") else 0
+        except ValueError:
+            number = 0
+        if 1 <= number <= self.server.config.movies:
+            self._send(200, fake_movie(imdb_id))
+        else:
+            self._send(200, {"Response": "False", "Error": "Incorrect IMDb ID."})
+
+    def _lego_sets(self, url, query):
+        total = self.server.config.sets_per_theme
+        theme_id = int(query.get("theme_id", 0))
+        page = int(query.get("page", 1))
+        page_size = int(query.get("page_size", 100))
+
+        start = (page - 1) * page_size
+        results = [
+            fake_lego_set(theme_id, i)
+            for i in range(start, min(start + page_size, total))
+        ]
+        next_url = None
+        if start + page_size < total:
+            next_query = dict(query, page=page + 1)
+            next_url = (
+                f"http://{self.headers['Host']}{url.path}?{urlencode(next_query)}"
+            )
+
+        self._send(200, {"count": total, "next": next_url, "results": results})
+
+    def _send(self, status, body, headers=None, content_type="application/json"):
+        if not isinstance(body, str):
+            body = json.dumps(body)
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MockAPIServer(ThreadingHTTPServer):
+    """Threaded HTTP server carrying the MockConfig and a request counter."""
+
+    daemon_threads = True
+
+    def __init__(self, address, config=None):
+        super().__init__(address, MockAPIHandler)
+        self.config = config or MockConfig()
+        self.rng = random.Random(self.config.seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.timeline = timeline_page(self.config.comics)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_server(config=None, host="127.0.0.1", port=0):
+    """
+    Starts a mock server in a background thread.
+
+    Args:
+        config (MockConfig, optional): behaviour of the server
+        host (str): address to bind
+        port (int): port to bind, 0 picks a free one
+
+    Returns:
+        MockAPIServer: running server; call shutdown() when done
+    """
+    server = MockAPIServer((host, port), config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def base_urls(server_url):
+    """Environment variables that point the collectors at a mock server."""
+    return {
+        "OMDB_BASE_URL": server_url + OMDB_PATH,
+        "REBRICKABLE_BASE_URL": server_url + "/api/v3",
+        "WOOKIEEPEDIA_TIMELINE_URL": server_url + TIMELINE_PATH,
+    }
+
+
+def add_config_arguments(parser):
+    """Adds the MockConfig options to an argparse parser."""
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds per response"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="extra random latency"
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 500s")
+    parser.add_argument(
+        "--rate-limit-rate", type=float, default=0.0, help="share of 429s"
+    )
+    parser.add_argument("--movies", type=int, default=1000, help="valid IMDb ids")
+    parser.add_argument(
+        "--sets-per-theme", type=int, default=500, help="Lego sets per theme"
+    )
+    parser.add_argument("--comics", type=int, default=2000, help="timeline comic rows")
+    parser.add_argument("--seed", type=int, default=0, help="randomness seed")
+
+
+def config_from_args(args):
+    return MockConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        movies=args.movies,
+        sets_per_theme=args.sets_per_theme,
+        comics=args.comics,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the mock API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockAPIServer((args.host, args.port), config_from_args(args))
+    print(f"Mock API running on {server.url}")
+    for name, value in base_urls(server.url).items():
+        print(f"  export {name}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
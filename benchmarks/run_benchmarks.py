@@ -0,0 +1,213 @@
+"""
+run_benchmarks.py
+Purpose: Time every calculate_* and plot_* function on synthetic databases
+
+For each scale a synthetic starwars.db is generated (see synthetic_db.py),
+then every calculate_* function in calculations.py, every plot_* function
+in visualizations.py and analytics.build_snapshot (SQL and columnar) are
+run against it. Wall time (median of --repeat runs)
+and peak Python memory (one extra run under tracemalloc) are saved as JSON.
+
+With --baseline, results are compared to a stored run and the script exits
+with status 1 if any function got slower by more than --threshold.
+
+Usage (from the project root):
+    python benchmarks/run_benchmarks.py --rows 10000 100000 --output bench.json
+    python benchmarks/run_benchmarks.py --rows 10000 100000 --baseline bench.json
+"""
+
+import argparse
+import inspect
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Charts are written to a temp dir, never shown
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import analytics
+import calculations
+import result_cache
+import visualizations
+from synthetic_db import generate_database
+
+# Time the calculations themselves, not the result cache
+result_cache.disable()
+
+# Times below this are mostly noise and never count as a regression
+MIN_REGRESSION_SECONDS = 0.05
+
+
+def _functions(module, prefix):
+    return {
+        name: func
+        for name, func in inspect.getmembers(module, inspect.isfunction)
+        if name.startswith(prefix) and func.__module__ == module.__name__
+    }
+
+
+def build_benchmarks(db_filename, output_dir, dpi):
+    """
+    Returns {name: zero-argument callable} for every calculate_* and plot_*,
+    plus build_snapshot with and without the columnar movie path.
+    """
+    benchmarks = {}
+    for name, func in _functions(calculations, "calculate_").items():
+        benchmarks[name] = lambda func=func: func(db_filename=db_filename)
+    for name, columnar in (
+        ("build_snapshot", False),
+        ("build_snapshot_columnar", True),
+    ):
+        benchmarks[name] = lambda columnar=columnar: analytics.build_snapshot(
+            db_filename, columnar=columnar
+        )
+
+    # Each plot gets its calculation's result, computed once up front
+    plot_options = {"output_dir": output_dir, "dpi": dpi, "show": False}
+    for calculate, plot in visualizations.CHARTS.values():
+        data = calculate(db_filename)
+        benchmarks[plot.__name__] = lambda plot=plot, data=data: plot(
+            data, **plot_options
+        )
+    return benchmarks
+
+
+def measure(func, repeat):
+    """
+    Runs func `repeat` times for timing, then once more under tracemalloc.
+
+    Returns:
+        dict: {"seconds": median wall time, "peak_bytes": tracemalloc peak}
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"seconds": statistics.median(times), "peak_bytes": peak}
+
+
+def run_scale(rows, work_dir, repeat, dpi, seed):
+    """
+    Generates a database with `rows` rows and benchmarks every function on it.
+
+    Returns:
+        dict: {function name: {"seconds", "peak_bytes"}}
+    """
+    db_filename = os.path.join(work_dir, f"bench_{rows}.db")
+    output_dir = os.path.join(work_dir, f"charts_{rows}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    generate_database(db_filename, rows=rows, seed=seed)
+    print(f"\n{rows:,} rows (generated in {time.perf_counter() - start:.1f}s)")
+
+    results = {}
+    for name, func in sorted(build_benchmarks(db_filename, output_dir, dpi).items()):
+        results[name] = measure(func, repeat)
+        print(
+            f"  {name:<45} {results[name]['seconds']:>9.3f}s "
+            f"{results[name]['peak_bytes'] / 1024 ** 2:>9.1f} MiB"
+        )
+    return results
+
+
+def find_regressions(results, baseline, threshold):
+    """
+    Compares wall times with a baseline run.
+
+    Args:
+        results (dict): {rows: {function: stats}} from this run
+        baseline (dict): the same structure from a stored run
+        threshold (float): allowed slowdown, 0.25 means 25% slower
+
+    Returns:
+        list: (rows, function, baseline seconds, current seconds) for each
+            function slower than the threshold allows
+    """
+    regressions = []
+    for rows, functions in results.items():
+        for name, stats in functions.items():
+            old = baseline.get(rows, {}).get(name)
+            if old is None:
+                continue
+            limit = old["seconds"] * (1 + threshold)
+            if (
+                stats["seconds"] > limit
+                and stats["seconds"] - old["seconds"] > MIN_REGRESSION_SECONDS
+            ):
+                regressions.append((rows, name, old["seconds"], stats["seconds"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark calculations and charts")
+    parser.add_argument(
+        "--rows",
+        type=int,
+        nargs="+",
+        default=[10_000, 100_000],
+        help="total database rows for each scale (e.g. 10000 1000000 10000000)",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per function")
+    parser.add_argument("--dpi", type=int, default=100, help="chart resolution")
+    parser.add_argument("--seed", type=int, default=0, help="synthetic data seed")
+    parser.add_argument("--output", help="save results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="allowed slowdown against the baseline (default 0.25 = 25%%)",
+    )
+    parser.add_argument(
+        "--work-dir", help="keep databases and charts here instead of a temp dir"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        work_dir = args.work_dir or temp_dir
+        os.makedirs(work_dir, exist_ok=True)
+        results = {
+            str(rows): run_scale(rows, work_dir, args.repeat, args.dpi, args.seed)
+            for rows in args.rows
+        }
+
+    if args.output:
+        report = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = find_regressions(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions (more than {args.threshold:.0%} slower):")
+            for rows, name, old, new in regressions:
+                print(f"  {rows:>10} rows  {name:<45} {old:.3f}s -> {new:.3f}s")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+synthetic_db.py
+Purpose: Build fake starwars.db files of any size for benchmarking
+
+Fills comics, lego_sets, lego_set_names, lego_themes and MovieMetrics with
+random but realistic-looking rows (NULL ratings, missing years, repeated
+set names, ...). Rows are generated lazily and inserted in chunks, so a
+10M-row database doesn't need 10M rows in memory.
+
+Usage (from the project root):
+    python benchmarks/synthetic_db.py bench_100k.db --rows 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from itertools import islice
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_setup import connect, database_setup
+
+# Share of the total row count that goes to each table
+TABLE_SHARES = {
+    "comics": 0.20,
+    "lego_set_names": 0.10,
+    "lego_sets": 0.40,
+    "MovieMetrics": 0.30,
+}
+NUM_THEMES = 50
+CHUNK_SIZE = 50_000
+
+
+def _chunks(rows, size=CHUNK_SIZE):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _comics(rng, count):
+    for i in range(count):
+        # ~2% of rows have no usable date, like the real timeline
+        year = "" if rng.random() < 0.02 else str(rng.randint(1977, 2025))
+        yield (f"Star Wars Comic #{i}", year)
+
+
+def _lego_set_names(count):
+    for i in range(count):
+        yield (f"Lego Set {i}",)
+
+
+def _lego_sets(rng, count, num_names):
+    theme_ids = list(range(1, NUM_THEMES + 1))
+    for i in range(count):
+        year = None if rng.random() < 0.01 else rng.randint(1970, 2025)
+        num_parts = None if rng.random() < 0.05 else int(rng.lognormvariate(5, 1.2))
+        yield (
+            f"{i}-1",
+            rng.randint(1, num_names) if num_names else None,
+            year,
+            num_parts,
+            rng.choice(theme_ids),
+        )
+
+
+def _movies(rng, count):
+    for i in range(count):
+        imdb = None if rng.random() < 0.03 else round(rng.uniform(3.0, 9.5), 1)
+        rt = None if rng.random() < 0.05 else rng.randint(5, 100)
+        yield (
+            f"tt{i:08d}",
+            f"Movie {i}",
+            rng.randint(10_000, 2_000_000_000),
+            imdb,
+            rt,
+            1 if rng.random() < 0.02 else 0,
+        )
+
+
+def generate_database(filename, rows=10_000, seed=0, profile="fast", shares=None):
+    """
+    Creates a synthetic database with about `rows` rows in total.
+
+    Args:
+        filename (str): database to create (overwritten if it exists)
+        rows (int): total rows across all tables
+        seed (int): random seed, the same seed gives the same database
+        profile (str): database_setup performance profile
+        shares (dict, optional): {table: share of rows}, defaults to
+            TABLE_SHARES. Tables left out get no rows.
+
+    Returns:
+        dict: {table name: rows inserted}
+    """
+    if os.path.exists(filename):
+        os.remove(filename)
+    database_setup(filename, profile=profile)
+
+    rng = random.Random(seed)
+    shares = TABLE_SHARES if shares is None else shares
+    counts = {table: int(rows * shares.get(table, 0)) for table in TABLE_SHARES}
+    counts["lego_themes"] = NUM_THEMES
+
+    conn = connect(filename)
+    with conn:
+        conn.executemany(
+            "INSERT INTO lego_themes (id, name) VALUES (?, ?)",
+            [(i, f"Theme {i}") for i in range(1, NUM_THEMES + 1)],
+        )
+        inserts = [
+            (
+                "INSERT INTO comics (title, release_date) VALUES (?, ?)",
+                _comics(rng, counts["comics"]),
+            ),
+            (
+                "INSERT INTO lego_set_names (name) VALUES (?)",
+                _lego_set_names(counts["lego_set_names"]),
+            ),
+            (
+                "INSERT INTO lego_sets (set_num, name_id, year, num_parts, theme_id) "
+                "VALUES (?, ?, ?, ?, ?)",
+                _lego_sets(rng, counts["lego_sets"], counts["lego_set_names"]),
+            ),
+            (
+                "INSERT INTO MovieMetrics "
+                "(imdb_id, title, box_office, imdb_rating, rotten_tomatoes, is_star_wars) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                _movies(rng, counts["MovieMetrics"]),
+            ),
+        ]
+        for sql, generated_rows in inserts:
+            for chunk in _chunks(generated_rows):
+                conn.executemany(sql, chunk)
+
+    conn.execute("ANALYZE")
+    conn.close()
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic starwars.db")
+    parser.add_argument("filename", help="database file to create")
+    parser.add_argument("--rows", type=int, default=10_000, help="total rows")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = generate_database(args.filename, rows=args.rows, seed=args.seed)
+    print(
+        f"Generated {sum(counts.values()):,} rows in {time.perf_counter() - start:.1f}s"
+    )
+    for table, count in counts.items():
+        print(f"  {table:<16} {count:>12,}")
@@ -1,20 +1,183 @@
 import sqlite3
 
-
-def calculate_comics_per_year(db_filename="starwars.db"):
-    conn = sqlite3.connect(db_filename)
-    cursor = conn.cursor()
-
-    query = """
+from analytics import build_snapshot
+from connections import get_connection
+from database_setup import explain_query_plans, has_aggregate_tables
+from report import (
+    format_comic_data,
+    format_lego_calculations,
+    format_omdb_calculations,
+    write_report,
+)
+from result_cache import cached_result, print_stats
+from tracing import traced
+
+# SQL used by the calculate_* functions. Kept at module level so
+# check_query_plans() can EXPLAIN the exact same statements.
+COMICS_PER_YEAR_QUERY = """
     SELECT release_date, COUNT(*)
     FROM comics
     WHERE release_date != '' AND release_date IS NOT NULL
     GROUP BY release_date
     ORDER BY release_date ASC
+"""
+
+RATING_DIFFERENCES_QUERY = """
+    SELECT title, imdb_rating, rotten_tomatoes, is_star_wars
+    FROM MovieMetrics
+    WHERE imdb_rating IS NOT NULL AND rotten_tomatoes IS NOT NULL
+    ORDER BY title ASC
+"""
+
+# is_star_wars = 1 for Star Wars, 0 for the other movies
+AVERAGE_RATINGS_QUERY = """
+    SELECT AVG(imdb_rating), AVG(rotten_tomatoes), COUNT(*)
+    FROM MovieMetrics
+    WHERE is_star_wars = ?
+    AND imdb_rating IS NOT NULL
+    AND rotten_tomatoes IS NOT NULL
+"""
+
+# Ties are listed by title, like movie_columns.top_k
+TOP_BY_IMDB_QUERY = """
+    SELECT title, imdb_rating, rotten_tomatoes, is_star_wars
+    FROM MovieMetrics
+    WHERE imdb_rating IS NOT NULL
+    ORDER BY imdb_rating DESC, title ASC
+    LIMIT 10
+"""
+
+TOP_BY_RT_QUERY = """
+    SELECT title, imdb_rating, rotten_tomatoes, is_star_wars
+    FROM MovieMetrics
+    WHERE rotten_tomatoes IS NOT NULL
+    ORDER BY rotten_tomatoes DESC, title ASC
+    LIMIT 10
+"""
+
+# combined_score and rating_gap are generated columns (see
+# database_setup.MOVIE_GENERATED_COLUMNS), NULL unless both ratings exist
+TOP_COMBINED_QUERY = """
+    SELECT title, imdb_rating, rotten_tomatoes, is_star_wars, combined_score
+    FROM MovieMetrics
+    WHERE combined_score IS NOT NULL
+    ORDER BY combined_score DESC, title ASC
+    LIMIT ?
+"""
+
+STAR_WARS_RATING_GAPS_QUERY = """
+    SELECT title, imdb_rating, rotten_tomatoes, rating_gap
+    FROM MovieMetrics
+    WHERE is_star_wars = 1 AND rating_gap IS NOT NULL
+    ORDER BY rating_gap DESC, title ASC
+"""
+
+LEGO_COMPLEXITY_BY_YEAR_QUERY = """
+    SELECT year, AVG(num_parts)
+    FROM lego_sets
+    WHERE year IS NOT NULL
+      AND num_parts IS NOT NULL
+    GROUP BY year
+    ORDER BY year ASC;
+"""
+
+TOP_LEGO_SETS_QUERY = """
+    SELECT s.set_num, n.name, s.year, s.num_parts
+    FROM lego_sets s
+    JOIN lego_set_names n ON s.name_id = n.id
+    WHERE num_parts IS NOT NULL
+    ORDER BY num_parts DESC
+    LIMIT ?;
+"""
+
+# JOIN lego_sets (s) and lego_themes (t)
+LEGO_THEME_AVERAGES_QUERY = """
+    SELECT t.name, AVG(s.num_parts), COUNT(s.set_num)
+    FROM lego_sets s
+    JOIN lego_themes t ON s.theme_id = t.id
+    WHERE s.num_parts IS NOT NULL
+    GROUP BY t.name
+    HAVING COUNT(s.set_num) >= 1
+    ORDER BY AVG(s.num_parts) DESC
+    LIMIT 10
+"""
+
+# Same results read from the trigger-maintained aggregate tables
+# (database_setup.create_aggregate_tables), one row per group.
+AGG_COMICS_PER_YEAR_QUERY = """
+    SELECT release_date, comic_count
+    FROM agg_comics_per_year
+    ORDER BY release_date ASC
+"""
+
+AGG_AVERAGE_RATINGS_QUERY = """
+    SELECT imdb_sum / movie_count, rt_sum / movie_count, movie_count
+    FROM agg_movie_ratings
+    WHERE is_star_wars = ?
+"""
+
+AGG_LEGO_COMPLEXITY_BY_YEAR_QUERY = """
+    SELECT year, parts_sum * 1.0 / set_count
+    FROM agg_lego_year
+    ORDER BY year ASC
+"""
+
+AGG_LEGO_THEME_AVERAGES_QUERY = """
+    SELECT t.name, SUM(a.parts_sum) * 1.0 / SUM(a.set_count), SUM(a.set_count)
+    FROM agg_lego_theme a
+    JOIN lego_themes t ON a.theme_id = t.id
+    GROUP BY t.name
+    ORDER BY 2 DESC
+    LIMIT 10
+"""
+
+# {name: (sql, params)} for every query the calculations run
+CALCULATION_QUERIES = {
+    "comics_per_year": (COMICS_PER_YEAR_QUERY, ()),
+    "rating_differences": (RATING_DIFFERENCES_QUERY, ()),
+    "average_ratings_star_wars": (AVERAGE_RATINGS_QUERY, (1,)),
+    "average_ratings_other": (AVERAGE_RATINGS_QUERY, (0,)),
+    "top_by_imdb": (TOP_BY_IMDB_QUERY, ()),
+    "top_by_rt": (TOP_BY_RT_QUERY, ()),
+    "top_combined": (TOP_COMBINED_QUERY, (15,)),
+    "star_wars_rating_gaps": (STAR_WARS_RATING_GAPS_QUERY, ()),
+    "lego_complexity_by_year": (LEGO_COMPLEXITY_BY_YEAR_QUERY, ()),
+    "top_lego_sets": (TOP_LEGO_SETS_QUERY, (10,)),
+    "lego_theme_averages": (LEGO_THEME_AVERAGES_QUERY, ()),
+}
+
+
+def check_query_plans(db_filename="starwars.db"):
     """
+    Prints the EXPLAIN QUERY PLAN of every calculation query and whether
+    it is answered from an index (see database_setup.INDEXES).
 
+    Returns:
+        list: names of the queries that still do a full table scan
+    """
+    results = explain_query_plans(db_filename, CALCULATION_QUERIES)
+    full_scans = []
+    for name, result in results.items():
+        status = "OK  " if result["uses_index"] else "SCAN"
+        print(f"[{status}] {name}")
+        for line in result["plan"]:
+            print(f"         {line}")
+        if not result["uses_index"]:
+            full_scans.append(name)
+    return full_scans
+
+
+@traced()
+@cached_result("comics")
+def calculate_comics_per_year(db_filename="starwars.db"):
+    cursor = None
     try:
-        cursor.execute(query)
+        conn = get_connection(db_filename)
+        cursor = conn.cursor()
+        if has_aggregate_tables(conn):
+            cursor.execute(AGG_COMICS_PER_YEAR_QUERY)
+        else:
+            cursor.execute(COMICS_PER_YEAR_QUERY)
         results = cursor.fetchall()
         comics_by_year = {year: count for year, count in results}
         return comics_by_year
@@ -24,7 +187,8 @@ def calculate_comics_per_year(db_filename="starwars.db"):
         return {}
 
     finally:
-        conn.close()
+        if cursor is not None:
+            cursor.close()
 
 
 def write_comic_data(data, filename="calculation_results.txt"):
@@ -33,11 +197,7 @@ def write_comic_data(data, filename="calculation_results.txt"):
     """
     try:
         with open(filename, "w") as f:
-            f.write("Star Wars Comics Released Per Year\n")
-            f.write("================================\n")
-            # Iterate through the dictionary to write clear lines
-            for year, count in data.items():
-                f.write(f"Year: {year} | Comics Released: {count}\n")
+            f.write(format_comic_data(data))
 
         print(f"Successfully wrote formatted results to {filename}")
     except IOError as e:
@@ -50,6 +210,8 @@ def write_comic_data(data, filename="calculation_results.txt"):
 # ============================================================================
 
 
+@traced()
+@cached_result("MovieMetrics")
 def calculate_rating_differences(db_filename="starwars.db"):
     """
     REQUIRED CALCULATION: Difference between IMDb and RT for all movies.
@@ -58,18 +220,11 @@ def calculate_rating_differences(db_filename="starwars.db"):
     Returns:
         dict: All movies with their rating differences
     """
-    conn = sqlite3.connect(db_filename)
-    cursor = conn.cursor()
-
-    query = """
-    SELECT title, imdb_rating, rotten_tomatoes, is_star_wars
-    FROM MovieMetrics
-    WHERE imdb_rating IS NOT NULL AND rotten_tomatoes IS NOT NULL
-    ORDER BY title ASC
-    """
-
+    cursor = None
     try:
-        cursor.execute(query)
+        conn = get_connection(db_filename)
+        cursor = conn.cursor()
+        cursor.execute(RATING_DIFFERENCES_QUERY)
         results = cursor.fetchall()
 
         rating_diffs = {}
@@ -90,9 +245,12 @@ def calculate_rating_differences(db_filename="starwars.db"):
         return {}
 
     finally:
-        conn.close()
+        if cursor is not None:
+            cursor.close()
 
 
+@traced()
+@cached_result("MovieMetrics")
 def calculate_average_ratings_comparison(db_filename="starwars.db"):
     """
     REQUIRED CALCULATION: Compare Star Wars average ratings to all other top movies.
@@ -101,36 +259,24 @@ def calculate_average_ratings_comparison(db_filename="starwars.db"):
     Returns:
         dict: Averages for Star Wars vs Other Top Movies
     """
-    conn = sqlite3.connect(db_filename)
-    cursor = conn.cursor()
-
+    cursor = None
     try:
-        # Star Wars averages
-        cursor.execute(
-            """
-            SELECT AVG(imdb_rating), AVG(rotten_tomatoes), COUNT(*)
-            FROM MovieMetrics
-            WHERE is_star_wars = 1 
-            AND imdb_rating IS NOT NULL 
-            AND rotten_tomatoes IS NOT NULL
-        """
-        )
-        sw_result = cursor.fetchone()
+        conn = get_connection(db_filename)
+        cursor = conn.cursor()
+        query = AVERAGE_RATINGS_QUERY
+        if has_aggregate_tables(conn):
+            query = AGG_AVERAGE_RATINGS_QUERY
+
+        # Star Wars averages (the aggregate table has no row for an empty group)
+        cursor.execute(query, (1,))
+        sw_result = cursor.fetchone() or (None, None, 0)
         sw_imdb = sw_result[0] * 10 if sw_result[0] else 0
         sw_rt = sw_result[1] if sw_result[1] else 0
         sw_count = sw_result[2]
 
         # Other movies averages
-        cursor.execute(
-            """
-            SELECT AVG(imdb_rating), AVG(rotten_tomatoes), COUNT(*)
-            FROM MovieMetrics
-            WHERE is_star_wars = 0 
-            AND imdb_rating IS NOT NULL 
-            AND rotten_tomatoes IS NOT NULL
-        """
-        )
-        other_result = cursor.fetchone()
+        cursor.execute(query, (0,))
+        other_result = cursor.fetchone() or (None, None, 0)
         other_imdb = other_result[0] * 10 if other_result[0] else 0
         other_rt = other_result[1] if other_result[1] else 0
         other_count = other_result[2]
@@ -145,9 +291,12 @@ def calculate_average_ratings_comparison(db_filename="starwars.db"):
         return {}
 
     finally:
-        conn.close()
+        if cursor is not None:
+            cursor.close()
 
 
+@traced()
+@cached_result("MovieMetrics")
 def calculate_top_rated_movies(db_filename="starwars.db"):
     """
     EXTRA CALCULATION: Find top 10 movies overall and see where Star Wars ranks.
@@ -156,39 +305,23 @@ def calculate_top_rated_movies(db_filename="starwars.db"):
     Returns:
         dict: Top movies by IMDb and RT, with Star Wars highlighted
     """
-    conn = sqlite3.connect(db_filename)
-    cursor = conn.cursor()
-
+    cursor = None
     try:
+        conn = get_connection(db_filename)
+        cursor = conn.cursor()
         # Top 10 by IMDb
-        cursor.execute(
-            """
-            SELECT title, imdb_rating, rotten_tomatoes, is_star_wars
-            FROM MovieMetrics
-            WHERE imdb_rating IS NOT NULL
-            ORDER BY imdb_rating DESC
-            LIMIT 10
-        """
-        )
+        cursor.execute(TOP_BY_IMDB_QUERY)
         top_imdb = cursor.fetchall()
 
         # Top 10 by RT
-        cursor.execute(
-            """
-            SELECT title, imdb_rating, rotten_tomatoes, is_star_wars
-            FROM MovieMetrics
-            WHERE rotten_tomatoes IS NOT NULL
-            ORDER BY rotten_tomatoes DESC
-            LIMIT 10
-        """
-        )
+        cursor.execute(TOP_BY_RT_QUERY)
         top_rt = cursor.fetchall()
 
         return {
             "top_by_imdb": [
                 {
                     "title": row[0],
-                    "imdb": row[1] * 10,
+                    "imdb": row[1] * 10 if row[1] is not None else None,
                     "rt": row[2],
                     "is_star_wars": row[3],
                 }
@@ -197,7 +330,7 @@ def calculate_top_rated_movies(db_filename="starwars.db"):
             "top_by_rt": [
                 {
                     "title": row[0],
-                    "imdb": row[1] * 10,
+                    "imdb": row[1] * 10 if row[1] is not None else None,
                     "rt": row[2],
                     "is_star_wars": row[3],
                 }
@@ -210,132 +343,107 @@ def calculate_top_rated_movies(db_filename="starwars.db"):
         return {}
 
     finally:
-        conn.close()
+        if cursor is not None:
+            cursor.close()
 
 
-def write_omdb_calculations_to_file(filename="calculation_results.txt"):
+@traced()
+@cached_result("MovieMetrics")
+def calculate_star_wars_rating_differences(db_filename="starwars.db"):
     """
-    Writes all OMDB calculations to a text file in clear, readable format.
+    calculate_rating_differences for the Star Wars movies only, read from
+    the rating_gap index instead of scanning every movie.
+
+    Returns:
+        dict: Star Wars movies with their rating differences, largest first
     """
+    cursor = None
     try:
-        with open(filename, "a") as f:
-            f.write("\n\n")
-            f.write("=" * 70 + "\n")
-            f.write("STAR WARS vs ALL OTHER MOVIES - RATING ANALYSIS\n")
-            f.write("=" * 70 + "\n\n")
-
-            # CALCULATION 1: Average ratings comparison
-            f.write("AVERAGE RATINGS COMPARISON\n")
-            f.write("-" * 70 + "\n")
-
-            averages = calculate_average_ratings_comparison()
-
-            f.write(f"Star Wars Movies ({averages['star_wars']['count']} total):\n")
-            f.write(
-                f"  Average IMDb Rating:           {averages['star_wars']['imdb']:.1f}/100\n"
-            )
-            f.write(
-                f"  Average Rotten Tomatoes Score: {averages['star_wars']['rt']:.1f}/100\n\n"
-            )
-
-            f.write(f"Other Movies ({averages['other_movies']['count']} total):\n")
-            f.write(
-                f"  Average IMDb Rating:           {averages['other_movies']['imdb']:.1f}/100\n"
-            )
-            f.write(
-                f"  Average Rotten Tomatoes Score: {averages['other_movies']['rt']:.1f}/100\n\n"
-            )
-
-            # Calculate differences
-            imdb_diff = averages["star_wars"]["imdb"] - averages["other_movies"]["imdb"]
-            rt_diff = averages["star_wars"]["rt"] - averages["other_movies"]["rt"]
-
-            f.write("Comparison:\n")
-            f.write(f"  Star Wars IMDb is {abs(imdb_diff):.1f} points ")
-            f.write("HIGHER\n" if imdb_diff > 0 else "LOWER\n")
-            f.write(f"  Star Wars RT is {abs(rt_diff):.1f} points ")
-            f.write("HIGHER\n" if rt_diff > 0 else "LOWER\n")
-
-            # CALCULATION 2: Rating differences for Star Wars only
-            f.write("\n\n")
-            f.write("STAR WARS MOVIES - CRITIC vs AUDIENCE AGREEMENT\n")
-            f.write("-" * 70 + "\n")
-            f.write(f"{'Movie Title':<45} {'IMDb':<8} {'RT':<8} {'Diff':<8}\n")
-            f.write("-" * 70 + "\n")
-
-            all_diffs = calculate_rating_differences()
-            sw_diffs = {k: v for k, v in all_diffs.items() if v["is_star_wars"]}
-
-            for title, data in sorted(sw_diffs.items()):
-                short_title = title[:42] + "..." if len(title) > 42 else title
-                f.write(
-                    f"{short_title:<45} "
-                    f"{data['imdb']:>6.1f}  "
-                    f"{data['rt']:>6.1f}  "
-                    f"{data['difference']:>+6.1f}\n"
-                )
-
-            # CALCULATION 3: Top movies ranking
-            f.write("\n\n")
-            f.write("TOP 10 HIGHEST RATED MOVIES (ALL MOVIES)\n")
-            f.write("-" * 70 + "\n")
-
-            top_movies = calculate_top_rated_movies()
-
-            f.write("By IMDb Rating:\n")
-            for i, movie in enumerate(top_movies["top_by_imdb"], 1):
-                marker = "[STAR WARS]" if movie["is_star_wars"] else "[Other]    "
-                short_title = (
-                    movie["title"][:40] + "..."
-                    if len(movie["title"]) > 40
-                    else movie["title"]
-                )
-                f.write(f"{i:2}. {marker} {short_title:<43} {movie['imdb']:.1f}\n")
-
-            f.write("\nBy Rotten Tomatoes Score:\n")
-            for i, movie in enumerate(top_movies["top_by_rt"], 1):
-                marker = "[STAR WARS]" if movie["is_star_wars"] else "[Other]    "
-                short_title = (
-                    movie["title"][:40] + "..."
-                    if len(movie["title"]) > 40
-                    else movie["title"]
-                )
-                f.write(f"{i:2}. {marker} {short_title:<43} {movie['rt']:.0f}\n")
-
-            f.write("\n" + "=" * 70 + "\n")
+        conn = get_connection(db_filename)
+        cursor = conn.cursor()
+        cursor.execute(STAR_WARS_RATING_GAPS_QUERY)
+        return {
+            title: {
+                "imdb": imdb_rating * 10,
+                "rt": rt_score,
+                "difference": gap,
+                "is_star_wars": 1,
+            }
+            for title, imdb_rating, rt_score, gap in cursor.fetchall()
+        }
 
-        print(f"Successfully wrote OMDB calculations to {filename}")
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return {}
 
-    except IOError as e:
-        print(f"Error writing to file {filename}: {e}")
+    finally:
+        if cursor is not None:
+            cursor.close()
 
 
-if __name__ == "__main__":
-    # Comics calculations
-    data = calculate_comics_per_year()
-    print("Comics per year", data)
-    write_comic_data(data)
+@traced()
+@cached_result("MovieMetrics")
+def calculate_top_combined_movies(limit=15, db_filename="starwars.db"):
+    """
+    EXTRA CALCULATION: Movies with the best combined score (average of the
+    IMDb rating out of 100 and the RT score).
 
-    # OMDB calculations
-    print("\nCalculating OMDB movie ratings comparisons...")
+    Returns:
+        list[dict]: Each dict has keys: title, imdb, rt, is_star_wars, combined
+    """
+    cursor = None
+    try:
+        conn = get_connection(db_filename)
+        cursor = conn.cursor()
+        cursor.execute(TOP_COMBINED_QUERY, (limit,))
+        return [
+            {
+                "title": title,
+                "imdb": imdb_rating * 10,
+                "rt": rt_score,
+                "is_star_wars": is_star_wars,
+                "combined": combined,
+            }
+            for title, imdb_rating, rt_score, is_star_wars, combined in cursor.fetchall()
+        ]
 
-    averages = calculate_average_ratings_comparison()
-    print(
-        f"\nStar Wars average: IMDb {averages['star_wars']['imdb']:.1f}, RT {averages['star_wars']['rt']:.1f}"
-    )
-    print(
-        f"Other movies average: IMDb {averages['other_movies']['imdb']:.1f}, RT {averages['other_movies']['rt']:.1f}"
-    )
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return []
+
+    finally:
+        if cursor is not None:
+            cursor.close()
 
-    diffs = calculate_rating_differences()
-    print(f"\nTotal movies with ratings: {len(diffs)}")
 
-    # Write OMDB calculations to file
-    write_omdb_calculations_to_file()
+def write_omdb_calculations_to_file(filename="calculation_results.txt", snapshot=None):
+    """
+    Writes all OMDB calculations to a text file in clear, readable format.
+    run_calculations() writes the whole report at once instead.
+
+    Args:
+        filename (str): file to append to
+        snapshot (AnalyticsSnapshot, optional): precomputed results from
+            analytics.build_snapshot. Built here if not given.
+    """
+    if snapshot is None:
+        snapshot = build_snapshot()
+
+    try:
+        with open(filename, "a") as f:
+            f.write(format_omdb_calculations(snapshot))
+
+        print(f"Successfully wrote OMDB calculations to {filename}")
+
+    except IOError as e:
+        print(f"Error writing to file {filename}: {e}")
+
 
 # LEGOLEGO LEGOOOO
 
 
+@traced()
+@cached_result("lego_sets")
 def calculate_lego_complexity_by_year(db_filename="starwars.db"):
     """
     Calculates the average Lego set complexity (number of pieces)
@@ -344,20 +452,14 @@ def calculate_lego_complexity_by_year(db_filename="starwars.db"):
     Returns:
         dict: {year: average_num_parts}
     """
-    conn = sqlite3.connect(db_filename)
-    cursor = conn.cursor()
-
-    query = """
-    SELECT year, AVG(num_parts)
-    FROM lego_sets
-    WHERE year IS NOT NULL
-      AND num_parts IS NOT NULL
-    GROUP BY year
-    ORDER BY year ASC;
-    """
-
+    cursor = None
     try:
-        cursor.execute(query)
+        conn = get_connection(db_filename)
+        cursor = conn.cursor()
+        if has_aggregate_tables(conn):
+            cursor.execute(AGG_LEGO_COMPLEXITY_BY_YEAR_QUERY)
+        else:
+            cursor.execute(LEGO_COMPLEXITY_BY_YEAR_QUERY)
         results = cursor.fetchall()
         complexity_by_year = {year: avg_parts for year, avg_parts in results}
         return complexity_by_year
@@ -367,9 +469,12 @@ def calculate_lego_complexity_by_year(db_filename="starwars.db"):
         return {}
 
     finally:
-        conn.close()
+        if cursor is not None:
+            cursor.close()
 
 
+@traced()
+@cached_result("lego_sets", "lego_set_names")
 def calculate_top_lego_sets(limit=10, db_filename="starwars.db"):
     """
     Finds the most complex Lego sets by piece count.
@@ -377,20 +482,11 @@ def calculate_top_lego_sets(limit=10, db_filename="starwars.db"):
     Returns:
         list[dict]: Each dict has keys: set_num, name, year, num_parts
     """
-    conn = sqlite3.connect(db_filename)
-    cursor = conn.cursor()
-
-    query = """
-    SELECT s.set_num, n.name, s.year, s.num_parts
-    FROM lego_sets s
-    JOIN lego_set_names n ON s.name_id = n.id
-    WHERE num_parts IS NOT NULL
-    ORDER BY num_parts DESC
-    LIMIT ?;
-    """
-
+    cursor = None
     try:
-        cursor.execute(query, (limit,))
+        conn = get_connection(db_filename)
+        cursor = conn.cursor()
+        cursor.execute(TOP_LEGO_SETS_QUERY, (limit,))
         rows = cursor.fetchall()
         top_sets = [
             {
@@ -408,31 +504,25 @@ def calculate_top_lego_sets(limit=10, db_filename="starwars.db"):
         return []
 
     finally:
-        conn.close()
+        if cursor is not None:
+            cursor.close()
 
 
+@traced()
+@cached_result("lego_sets", "lego_themes")
 def calculate_lego_theme_averages(db_filename="starwars.db"):
     """
     Calculates the average number of parts per Lego theme.
     Demonstrates the REQUIRED JOIN for the project rubric.
     """
-    conn = sqlite3.connect(db_filename)
-    cursor = conn.cursor()
-
-    # JOIN lego_sets (s) and lego_themes (t)
-    query = """
-    SELECT t.name, AVG(s.num_parts), COUNT(s.set_num)
-    FROM lego_sets s
-    JOIN lego_themes t ON s.theme_id = t.id
-    WHERE s.num_parts IS NOT NULL
-    GROUP BY t.name
-    HAVING COUNT(s.set_num) >= 1 
-    ORDER BY AVG(s.num_parts) DESC
-    LIMIT 10
-    """
-
+    cursor = None
     try:
-        cursor.execute(query)
+        conn = get_connection(db_filename)
+        cursor = conn.cursor()
+        if has_aggregate_tables(conn):
+            cursor.execute(AGG_LEGO_THEME_AVERAGES_QUERY)
+        else:
+            cursor.execute(LEGO_THEME_AVERAGES_QUERY)
         results = cursor.fetchall()
         # Returns list of tuples: (theme_name, avg_parts, set_count)
         return results
@@ -442,67 +532,26 @@ def calculate_lego_theme_averages(db_filename="starwars.db"):
         return []
 
     finally:
-        conn.close()
+        if cursor is not None:
+            cursor.close()
 
 
-def write_lego_calculations_to_file(filename="calculation_results.txt"):
+def write_lego_calculations_to_file(filename="calculation_results.txt", snapshot=None):
     """
     Appends Lego-only complexity calculations to the text file.
+    run_calculations() writes the whole report at once instead.
+
+    Args:
+        filename (str): file to append to
+        snapshot (AnalyticsSnapshot, optional): precomputed results from
+            analytics.build_snapshot. Built here if not given.
     """
+    if snapshot is None:
+        snapshot = build_snapshot()
+
     try:
         with open(filename, "a") as f:
-            f.write("\n\n")
-            f.write("=" * 70 + "\n")
-            f.write("LEGO SET COMPLEXITY ANALYSIS\n")
-            f.write("=" * 70 + "\n\n")
-
-            # CALCULATION 1: Average complexity by year
-            f.write("AVERAGE LEGO COMPLEXITY BY YEAR\n")
-            f.write("-" * 70 + "\n")
-
-            complexity = calculate_lego_complexity_by_year()
-            if not complexity:
-                f.write("No Lego data available in the database.\n\n")
-            else:
-                for year, avg_parts in sorted(complexity.items()):
-                    f.write(
-                        f"Year: {year:<6} | "
-                        f"Average Pieces per Set: {avg_parts:6.1f}\n"
-                    )
-
-            # CALCULATION 2: Top most complex Lego sets
-            f.write("\nTOP MOST COMPLEX LEGO SETS (BY PART COUNT)\n")
-            f.write("-" * 70 + "\n")
-
-            top_sets = calculate_top_lego_sets()
-            if not top_sets:
-                f.write("No Lego sets found in the database.\n")
-            else:
-                for i, s in enumerate(top_sets, 1):
-                    year_str = s["year"] if s["year"] is not None else "N/A"
-                    f.write(
-                        f"{i:2}. {s['name']} "
-                        f"(Set {s['set_num']}, {year_str}) "
-                        f"- {s['num_parts']} pieces\n"
-                    )
-
-            f.write("\n" + "=" * 70 + "\n")
-
-            f.write("\nTOP 10 LEGO THEMES BY COMPLEXITY (AVG PARTS)\n")
-            f.write("-" * 70 + "\n")
-
-            # Call the new join function
-            theme_stats = calculate_lego_theme_averages()
-
-            if not theme_stats:
-                f.write("No theme data available.\n")
-            else:
-                f.write(f"{'Theme Name':<40} {'Avg Parts':<10} {'Set Count':<10}\n")
-                f.write("-" * 70 + "\n")
-                for name, avg, count in theme_stats:
-                    # Handle cases where name might be None
-                    safe_name = name if name else "Unknown Theme"
-                    f.write(f"{safe_name:<40} {avg:<10.1f} {count:<10}\n")
+            f.write(format_lego_calculations(snapshot))
 
         print(f"Successfully wrote LEGO calculations to {filename}")
 
@@ -510,16 +559,44 @@ def write_lego_calculations_to_file(filename="calculation_results.txt"):
         print(f"Error writing Lego calculations to file {filename}: {e}")
 
 
-if __name__ == "__main__":
-    # Quick manual test if you ever run this file directly
-    print("\nWriting COMIC calculations...")
-    print("Comics per year:", calculate_comics_per_year())
-    write_comic_data(calculate_comics_per_year())
+def run_calculations(
+    db_filename="starwars.db", filename="calculation_results.txt", columnar=False
+):
+    """
+    Computes every calculation once and writes the full report to `filename`,
+    plus the same results as JSON and CSV next to it (see report.py).
+
+    Args:
+        db_filename (str): filename of the database
+        filename (str): text report file (overwritten)
+        columnar (bool): compute the movie results with NumPy arrays, see
+            analytics.build_snapshot
+    """
+    # Every calculation is computed once here and shared by all formats
+    snapshot = build_snapshot(db_filename, columnar=columnar)
 
-    print("\nWriting OMDB calculations...")
-    write_omdb_calculations_to_file()
+    print("\nComics per year:", dict(snapshot.comics_per_year))
 
-    print("\nWriting LEGO calculations...")
-    write_lego_calculations_to_file()
+    averages = snapshot.average_ratings
+    print(
+        f"\nStar Wars average: IMDb {averages['star_wars']['imdb']:.1f}, RT {averages['star_wars']['rt']:.1f}"
+    )
+    print(
+        f"Other movies average: IMDb {averages['other_movies']['imdb']:.1f}, RT {averages['other_movies']['rt']:.1f}"
+    )
+    print(f"\nTotal movies with ratings: {len(snapshot.rating_differences)}")
+
+    print("\nWriting reports...")
+    try:
+        for path, written in write_report(snapshot, filename).items():
+            status = "Successfully wrote" if written else "Unchanged:"
+            print(f"{status} {path}")
+    except OSError as e:
+        print(f"Error writing reports for {filename}: {e}")
 
     print("\nAll calculations complete!")
+    print_stats()
+
+
+if __name__ == "__main__":
+    run_calculations()
@@ -3,12 +3,33 @@
 # Purpose: Collect Lego sets from the Rebrickable API and store them in starwars.db
 
 
+import argparse
+import csv
+import gzip
+import os
 import re
 import requests
 import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+
+# tracing.py lives in the project root; don't rely on collection_state or
+# http_cache having added it to sys.path first
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from collection_state import load_cursor, save_cursor
+from http_cache import cached_get, get_cache
+from rate_limit import TokenBucket
+from tracing import count, span, traced
 
 DB_NAME = "starwars.db"
-BASE_URL = "https://rebrickable.com/api/v3/lego/sets/"
+# REBRICKABLE_BASE_URL points the collector at another server (e.g. benchmarks/mock_api.py)
+API_ROOT = os.environ.get("REBRICKABLE_BASE_URL", "https://rebrickable.com/api/v3")
+BASE_URL = API_ROOT.rstrip("/") + "/lego/sets/"
 LIMIT_PER_RUN = 25  # rubric: max 25 rows per run
 THEME_IDS = {
     158: "Star Wars",
@@ -18,6 +39,12 @@ THEME_IDS = {
     435: "Ninjago",
 }
 
+# Failed pages worth asking for again: rate limited or a server error
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 4
+RETRY_BACKOFF = 1.0  # seconds before the first retry, doubled after each
+MAX_RETRY_WAIT = 60.0  # longest Retry-After we honour
+
 
 def get_api_key(filename="api_keys.txt"):
     """
@@ -67,15 +94,490 @@ def fetch_lego_sets(api_key, page_size=100, page=1, theme_id=158):
     }
 
     try:
-        response = requests.get(BASE_URL, headers=headers, params=params)
+        response = cached_get(
+            BASE_URL, params=params, headers=headers, source="rebrickable"
+        )
         response.raise_for_status()
-        data = response.json()
+        with span("lego.parse"):
+            data = response.json()
         return data.get("results", [])
     except requests.RequestException as e:
         print(f"Error fetching Lego sets: {e}")
         return []
 
 
+def retry_delay(response, attempt):
+    """
+    Seconds to wait before retrying a failed request: the server's
+    Retry-After (seconds or an HTTP date) if it sent one, otherwise
+    exponential backoff. Capped at MAX_RETRY_WAIT.
+    """
+    delay = RETRY_BACKOFF * 2**attempt
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+            except (TypeError, ValueError):
+                pass
+    return min(max(delay, 0.0), MAX_RETRY_WAIT)
+
+
+def fetch_lego_page(
+    api_key, url=BASE_URL, params=None, bucket=None, retries=MAX_RETRIES
+):
+    """
+    Fetches one full page from the Rebrickable sets endpoint.
+
+    429s, 5xx responses and connection errors are retried up to `retries`
+    times, waiting as long as the server's Retry-After asks (or with
+    exponential backoff).
+
+    Args:
+        api_key (str): Rebrickable API key
+        url (str): page URL. Either BASE_URL with `params`, or the `next`
+            link of a previous page (which already has its query string).
+        params (dict, optional): query params for the first page
+        bucket (TokenBucket, optional): rate limiter to take a token from
+            before every attempt
+        retries (int): attempts after the first one
+
+    Returns:
+        dict: page JSON with "count", "next" and "results", or None on error
+    """
+    headers = {"Authorization": f"key {api_key}"}
+
+    for attempt in range(retries + 1):
+        if bucket is not None:
+            bucket.acquire()
+        response = None
+        try:
+            response = cached_get(
+                url, params=params, headers=headers, source="rebrickable"
+            )
+            response.raise_for_status()
+            with span("lego.parse"):
+                return response.json()
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        except requests.RequestException as e:
+            if response is None or response.status_code not in RETRY_STATUSES:
+                print(f"Error fetching Lego page {url}: {e}")
+                return None
+            error = e
+
+        if attempt < retries:
+            delay = retry_delay(response, attempt)
+            count("lego_retries_total")
+            print(f"   Retrying Lego page in {delay:.1f}s ({error})")
+            time.sleep(delay)
+
+    print(f"Error fetching Lego page {url}: {error} (gave up after {retries} retries)")
+    return None
+
+
+def fetch_theme_catalog(api_key, theme_id, bucket, page_size=1000):
+    """
+    Fetches every set of one theme by following the API's `next` links.
+
+    Args:
+        api_key (str): Rebrickable API key
+        theme_id (int): theme to fetch
+        bucket (TokenBucket): rate limiter shared with the other themes
+        page_size (int): results per page (Rebrickable allows up to 1000)
+
+    Returns:
+        tuple: (theme_id, list of set dicts, number of pages fetched,
+        complete). `complete` is False if a page still failed after its
+        retries, so the sets after it are missing.
+    """
+    url = BASE_URL
+    params = {"page_size": page_size, "theme_id": theme_id}
+    lego_sets = []
+    pages = 0
+
+    while url:
+        data = fetch_lego_page(api_key, url, params, bucket=bucket)
+        if data is None:
+            return theme_id, lego_sets, pages, False
+        pages += 1
+        lego_sets.extend(data.get("results", []))
+
+        # The next link carries page/page_size/theme_id itself
+        url = data.get("next")
+        params = None
+
+    return theme_id, lego_sets, pages, True
+
+
+# Stay under SQLite's bound-parameter limit in IN (...) lists
+IN_CHUNK_SIZE = 500
+
+
+class NameResolver:
+    """
+    In-memory cache of lego_set_names (name -> id) for bulk inserts.
+
+    Names are resolved a whole page/batch at a time: cached names cost
+    nothing, unknown names are looked up with one IN (...) query, and names
+    that are still missing are inserted with a single executemany and read
+    back. SQLite assigns their ids (AUTOINCREMENT) while the transaction
+    holds the write lock, so two writers never hand out the same id. Use
+    one resolver per transaction; call clear() once it commits or rolls
+    back.
+
+    Args:
+        cursor (sqlite3.Cursor): cursor inside the caller's transaction
+        preload (bool): read every existing name up front
+    """
+
+    def __init__(self, cursor, preload=False):
+        self.cursor = cursor
+        self.ids = {}
+        if preload:
+            self.preload()
+
+    def preload(self):
+        """Loads every existing name into the cache with one query."""
+        self.cursor.execute("SELECT name, id FROM lego_set_names")
+        self.ids.update(self.cursor.fetchall())
+
+    def clear(self):
+        """Forgets every cached name (e.g. after a commit or rollback)."""
+        self.ids = {}
+
+    def _lookup(self, names):
+        for i in range(0, len(names), IN_CHUNK_SIZE):
+            chunk = names[i : i + IN_CHUNK_SIZE]
+            placeholders = ", ".join("?" for _ in chunk)
+            self.cursor.execute(
+                f"SELECT name, id FROM lego_set_names WHERE name IN ({placeholders})",
+                chunk,
+            )
+            self.ids.update(self.cursor.fetchall())
+
+    def resolve_many(self, names):
+        """
+        Returns the id of every name, creating missing names in bulk.
+
+        Args:
+            names (iterable[str]): set names (duplicates are fine)
+
+        Returns:
+            dict: {name: id} for every name passed in (None for a missing
+            name)
+        """
+        unique_names = list(dict.fromkeys(names))
+        unknown = [
+            name for name in unique_names if name is not None and name not in self.ids
+        ]
+        self._lookup(unknown)
+
+        new_names = [name for name in unknown if name not in self.ids]
+        if new_names:
+            # OR IGNORE: another writer may have added the name since the lookup
+            self.cursor.executemany(
+                "INSERT OR IGNORE INTO lego_set_names (name) VALUES (?)",
+                [(name,) for name in new_names],
+            )
+            self._lookup(new_names)
+
+        return {name: self.ids.get(name) for name in unique_names}
+
+
+def find_existing_set_nums(cursor, set_nums):
+    """
+    Returns which of the given set numbers are already in lego_sets,
+    using one IN (...) query per chunk instead of one SELECT per set.
+    """
+    set_nums = list(set_nums)
+    existing = set()
+    for i in range(0, len(set_nums), IN_CHUNK_SIZE):
+        chunk = set_nums[i : i + IN_CHUNK_SIZE]
+        placeholders = ", ".join("?" for _ in chunk)
+        cursor.execute(
+            f"SELECT set_num FROM lego_sets WHERE set_num IN ({placeholders})", chunk
+        )
+        existing.update(row[0] for row in cursor.fetchall())
+    return existing
+
+
+@traced("lego.sync")
+def sync_lego_catalog(
+    db_filename=DB_NAME,
+    theme_ids=THEME_IDS,
+    page_size=1000,
+    max_in_flight=4,
+    requests_per_second=1.0,
+    api_key=None,
+):
+    """
+    Full-catalog sync: downloads every set of every theme in `theme_ids` and
+    bulk-loads the ones that are missing. No 25-row limit applies here.
+
+    Themes are fetched concurrently (up to `max_in_flight` at once) and all
+    requests share one token bucket, so the whole run stays inside the
+    Rebrickable rate budget. Each theme follows the API's `next` links
+    instead of guessing a page number from the row count. Rate-limited and
+    failed pages are retried (see fetch_lego_page); a theme whose page
+    still fails is loaded up to that page and reported as INCOMPLETE.
+
+    Args:
+        db_filename (str): filename of the database
+        theme_ids (dict): {theme_id: theme name} to sync
+        page_size (int): results per page
+        max_in_flight (int): themes fetched at the same time
+        requests_per_second (float): shared API rate limit
+        api_key (str, optional): Rebrickable API key. Loaded from api_keys.txt if None.
+
+    Returns:
+        int: number of new Lego sets added
+    """
+    if api_key is None:
+        api_key = get_api_key()
+    if not api_key:
+        print("No Rebrickable API key found; aborting Lego sync.")
+        return 0
+
+    bucket = TokenBucket(requests_per_second)
+    start = time.perf_counter()
+
+    print(f"Syncing {len(theme_ids)} themes ({max_in_flight} in flight)...")
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        results = list(
+            executor.map(
+                lambda t_id: fetch_theme_catalog(api_key, t_id, bucket, page_size),
+                theme_ids,
+            )
+        )
+    fetch_time = time.perf_counter() - start
+
+    total_pages = sum(result[2] for result in results)
+    total_sets = sum(len(result[1]) for result in results)
+    incomplete = [theme_id for theme_id, _, _, complete in results if not complete]
+
+    conn = sqlite3.connect(db_filename)
+    cursor = conn.cursor()
+    names = NameResolver(cursor)
+    rows_added = 0
+
+    # One transaction for the whole load
+    with span("lego.insert", sets=total_sets), conn:
+        cursor.executemany(
+            "INSERT OR IGNORE INTO lego_themes (id, name) VALUES (?, ?)",
+            list(theme_ids.items()),
+        )
+
+        for theme_id, lego_sets, pages, complete in results:
+            lego_sets = [s for s in lego_sets if s.get("set_num")]
+            name_ids = names.resolve_many(s.get("name") for s in lego_sets)
+
+            cursor.executemany(
+                """
+                INSERT OR IGNORE INTO lego_sets
+                (set_num, name_id, year, num_parts, theme_id)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                [
+                    (
+                        s["set_num"],
+                        name_ids.get(s.get("name")),
+                        s.get("year"),
+                        s.get("num_parts"),
+                        theme_id,
+                    )
+                    for s in lego_sets
+                ],
+            )
+            # rowcount, unlike total_changes, leaves out trigger writes
+            added = cursor.rowcount
+            rows_added += added
+            count("rows_written_total", added, table="lego_sets")
+            print(
+                f"   {theme_ids[theme_id]}: {len(lego_sets)} sets on {pages} pages, "
+                f"{added} new" + ("" if complete else " (INCOMPLETE: a page failed)")
+            )
+
+    conn.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"\n{'=' * 60}")
+    print(f"Pages fetched: {total_pages} in {fetch_time:.1f}s")
+    print(
+        f"Sets synced: {total_sets} ({total_sets / elapsed if elapsed else 0:.1f} sets/second)"
+    )
+    print(f"Lego sets added this run: {rows_added}")
+    if incomplete:
+        print(
+            "INCOMPLETE themes (run --sync again to fetch the rest): "
+            + ", ".join(theme_ids[theme_id] for theme_id in incomplete)
+        )
+    print(f"{'=' * 60}\n")
+
+    return rows_added
+
+
+def open_csv(path):
+    """Opens a CSV file for streaming, transparently un-gzipping *.gz files."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def load_theme_parents(themes_path):
+    """
+    Reads a Rebrickable themes.csv(.gz) download.
+
+    Returns:
+        dict: {theme_id: (name, parent_id or None)}
+    """
+    themes = {}
+    with open_csv(themes_path) as f:
+        for row in csv.DictReader(f):
+            theme_id = _to_int(row.get("id"))
+            if theme_id is not None:
+                themes[theme_id] = (row.get("name"), _to_int(row.get("parent_id")))
+    return themes
+
+
+@traced("lego.ingest_csv")
+def ingest_lego_csv(
+    sets_path,
+    themes_path=None,
+    db_filename=DB_NAME,
+    theme_ids=THEME_IDS,
+    batch_size=5000,
+):
+    """
+    Offline bulk load from Rebrickable's sets.csv.gz (and themes.csv.gz)
+    downloads, no API calls needed.
+
+    The sets file is streamed and written in batches of `batch_size`
+    inside one transaction, so memory stays flat however big the file is.
+    Names go through the same NameResolver as the API collectors; its
+    cache is cleared after every batch so it doesn't grow with the number
+    of distinct names.
+    With a themes file, sets in sub-themes (e.g. "Star Wars > Episode IV")
+    are stored under their top-level theme in `theme_ids`, matching what
+    the API's theme_id filter returns.
+
+    Args:
+        sets_path (str): path to sets.csv or sets.csv.gz
+        themes_path (str, optional): path to themes.csv or themes.csv.gz
+        db_filename (str): filename of the database
+        theme_ids (dict, optional): {theme_id: name} to keep. None loads
+            every theme and keeps each set's own theme_id; that needs
+            `themes_path`, which provides the lego_themes rows.
+        batch_size (int): rows per executemany batch
+
+    Returns:
+        int: number of new Lego sets added
+
+    Raises:
+        ValueError: if theme_ids is None and there is no themes file
+    """
+    if theme_ids is None and not themes_path:
+        raise ValueError(
+            "loading every theme needs the themes file for the lego_themes rows"
+        )
+    themes = load_theme_parents(themes_path) if themes_path else {}
+
+    def target_theme(theme_id):
+        """Walks up the parent chain to the first theme we collect."""
+        if theme_ids is None:
+            return theme_id
+        seen = set()
+        while theme_id is not None and theme_id not in seen:
+            if theme_id in theme_ids:
+                return theme_id
+            seen.add(theme_id)
+            theme_id = themes.get(theme_id, (None, None))[1]
+        return None
+
+    conn = sqlite3.connect(db_filename)
+    cursor = conn.cursor()
+    names = NameResolver(cursor)
+    rows_added = 0
+    rows_read = 0
+    start = time.perf_counter()
+
+    def flush(batch):
+        name_ids = names.resolve_many(row[1] for row in batch)
+        cursor.executemany(
+            """
+            INSERT OR IGNORE INTO lego_sets
+            (set_num, name_id, year, num_parts, theme_id)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            [
+                (set_num, name_ids.get(name), year, num_parts, theme_id)
+                for set_num, name, year, num_parts, theme_id in batch
+            ],
+        )
+        added = cursor.rowcount
+        count("rows_written_total", added, table="lego_sets")
+        # Keep memory flat: the ids are looked up again if a name comes back
+        names.clear()
+        return added
+
+    with conn:
+        if theme_ids is None:
+            theme_rows = [(t_id, name) for t_id, (name, _) in themes.items()]
+        else:
+            theme_rows = list(theme_ids.items())
+        cursor.executemany(
+            "INSERT OR IGNORE INTO lego_themes (id, name) VALUES (?, ?)", theme_rows
+        )
+
+        batch = []
+        with open_csv(sets_path) as f:
+            for row in csv.DictReader(f):
+                rows_read += 1
+                set_num = row.get("set_num")
+                theme_id = target_theme(_to_int(row.get("theme_id")))
+                if not set_num or theme_id is None:
+                    continue
+
+                batch.append(
+                    (
+                        set_num,
+                        row.get("name"),
+                        _to_int(row.get("year")),
+                        _to_int(row.get("num_parts")),
+                        theme_id,
+                    )
+                )
+                if len(batch) >= batch_size:
+                    rows_added += flush(batch)
+                    batch = []
+
+        if batch:
+            rows_added += flush(batch)
+
+    conn.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"\n{'=' * 60}")
+    print(
+        f"Read {rows_read} CSV rows in {elapsed:.1f}s "
+        f"({rows_read / elapsed if elapsed else 0:.0f} rows/second)"
+    )
+    print(f"Lego sets added this run: {rows_added}")
+    print(f"{'=' * 60}\n")
+
+    return rows_added
+
+
+@traced("lego.collect")
 def insert_lego_sets(limit=25, db_filename=DB_NAME, page_size=100):
     """
     Inserts Lego set data into the database, limiting to `limit`
@@ -83,6 +585,14 @@ def insert_lego_sets(limit=25, db_filename=DB_NAME, page_size=100):
 
     Now also populates lego_themes so that lego_sets.theme_id
     links to lego_themes.id (shared integer key).
+
+    Each theme's position (page, results of it handled, and the page's
+    `next` link) is saved in collection_state with every batch of inserts,
+    so the next run continues from that exact result instead of guessing
+    the page from a row count, and follows `next` once a page is done.
+    The theme's last page is fetched again once per run, so sets added
+    upstream after it was finished are still picked up (once the cached
+    page is older than the Rebrickable TTL in http_cache).
     """
     api_key = get_api_key()
     rows_added = 0
@@ -113,68 +623,127 @@ def insert_lego_sets(limit=25, db_filename=DB_NAME, page_size=100):
         print(f"\n--- Processing Theme: {theme_name} (ID: {theme_id}) ---")
 
         rows_added_this_theme = 0
-
-        # How many Lego sets in THIS THEME already in DB?
-        cursor.execute("SELECT COUNT(*) FROM lego_sets WHERE theme_id = ?", (theme_id,))
-        count_for_theme = cursor.fetchone()[0]
-
-        # If we have 0-99 items, we need page 1.
-        # If we have 100-199 items, we need page 2
-        page_to_fetch = (count_for_theme // page_size) + 1
-        print(f"   Existing sets for {theme_name}: {count_for_theme}")
-        print(f"   Fetching Page {page_to_fetch}...")
-
-        # Fetch a big page of sets, we will still only insert up to `limit`
-        lego_sets = fetch_lego_sets(
-            api_key, page_size=page_size, page=page_to_fetch, theme_id=theme_id
-        )
-        if not lego_sets:
-            print(f"   No data found on page {page_to_fetch} for {theme_name}.")
-            continue
-
-        for s in lego_sets:
-            if rows_added >= limit:
+        rechecked = False
+        state_key = f"theme:{theme_id}"
+        state = load_cursor(conn, "rebrickable", state_key)
+        if state is None or state["page_size"] != page_size:
+            # No cursor yet: guess the page from the row count like before
+            # If we have 0-99 items, we need page 1.
+            # If we have 100-199 items, we need page 2
+            cursor.execute(
+                "SELECT COUNT(*) FROM lego_sets WHERE theme_id = ?", (theme_id,)
+            )
+            count_for_theme = cursor.fetchone()[0]
+            print(f"   Existing sets for {theme_name}: {count_for_theme}")
+            state = {
+                "page": (count_for_theme // page_size) + 1,
+                "offset": 0,
+                "size": None,
+                "next": None,
+                "page_size": page_size,
+            }
+
+        while rows_added < limit and rows_added_this_theme < max_per_theme:
+            if state["size"] is not None and state["offset"] >= state["size"]:
+                if state["next"]:
+                    # Page done: follow its `next` link
+                    page, offset = state["page"] + 1, 0
+                    url, params = state["next"], None
+                elif rechecked:
+                    print(f"   Every page of {theme_name} has been processed.")
+                    break
+                else:
+                    # The last page: fetch it again (once per run) from the
+                    # start, in case sets were added upstream since. Stored
+                    # sets are skipped, and a new `next` link is followed.
+                    rechecked = True
+                    page, offset = state["page"], 0
+                    url = BASE_URL
+                    params = {
+                        "page_size": page_size,
+                        "page": page,
+                        "theme_id": theme_id,
+                    }
+            else:
+                # Resume inside the page the last run stopped in
+                page, offset = state["page"], state["offset"]
+                url = BASE_URL
+                params = {"page_size": page_size, "page": page, "theme_id": theme_id}
+
+            print(f"   Fetching Page {page} from result {offset}...")
+            data = fetch_lego_page(api_key, url, params)
+            if data is None:
                 break
-            if rows_added_this_theme >= max_per_theme:
-                print(
-                    f"   > Hit 'fair share' limit ({max_per_theme}) for {theme_name}."
-                )
+            lego_sets = data.get("results", [])
+            if not lego_sets:
+                print(f"   No data found on page {page} for {theme_name}.")
                 break
 
-            set_num = s.get("set_num")
-            if not set_num:
-                continue
-
-            # Skip duplicates
-            cursor.execute("SELECT 1 FROM lego_sets WHERE set_num = ?", (set_num,))
-            if cursor.fetchone():
-                continue
-
-            # Handle Name ID (lego_set_names table)
-            name = s.get("name")
-            cursor.execute("SELECT id FROM lego_set_names WHERE name = ?", (name,))
-            res = cursor.fetchone()
-
-            if res:
-                name_id = res[0]
-            else:
-                cursor.execute("INSERT INTO lego_set_names (name) VALUES (?)", (name,))
-                name_id = cursor.lastrowid
-
-            # Insert Lego Set
-            cursor.execute(
-                """
-                INSERT INTO lego_sets (set_num, name_id, year, num_parts, theme_id)
-                VALUES (?, ?, ?, ?, ?)
-                """,
-                (set_num, name_id, s.get("year"), s.get("num_parts"), theme_id),
+            # One query for the page instead of one SELECT per set
+            existing = find_existing_set_nums(
+                cursor,
+                [s.get("set_num") for s in lego_sets[offset:] if s.get("set_num")],
             )
-            rows_added += 1
-            rows_added_this_theme += 1
-            print(f"   Added: {name}")
 
-    conn.commit()
-    conn.commit()
+            new_sets = []
+            position = offset
+            while position < len(lego_sets):
+                if rows_added + len(new_sets) >= limit:
+                    break
+                if rows_added_this_theme + len(new_sets) >= max_per_theme:
+                    print(
+                        f"   > Hit 'fair share' limit ({max_per_theme}) for {theme_name}."
+                    )
+                    break
+
+                s = lego_sets[position]
+                position += 1
+                set_num = s.get("set_num")
+                if not set_num or set_num in existing:
+                    continue
+                existing.add(set_num)
+                new_sets.append(s)
+
+            state = {
+                "page": page,
+                "offset": position,
+                "size": len(lego_sets),
+                "next": data.get("next"),
+                "page_size": page_size,
+            }
+
+            # The new sets and the cursor past them are committed together
+            with span("lego.insert", theme=theme_id), conn:
+                if new_sets:
+                    # Handle Name IDs (lego_set_names table) for the whole page
+                    # at once, with a resolver that lives for this transaction
+                    names = NameResolver(cursor)
+                    name_ids = names.resolve_many(s.get("name") for s in new_sets)
+
+                    # Insert Lego Sets
+                    cursor.executemany(
+                        """
+                        INSERT INTO lego_sets (set_num, name_id, year, num_parts, theme_id)
+                        VALUES (?, ?, ?, ?, ?)
+                        """,
+                        [
+                            (
+                                s["set_num"],
+                                name_ids[s.get("name")],
+                                s.get("year"),
+                                s.get("num_parts"),
+                                theme_id,
+                            )
+                            for s in new_sets
+                        ],
+                    )
+                save_cursor(conn, "rebrickable", state_key, state)
+            count("rows_written_total", len(new_sets), table="lego_sets")
+            rows_added += len(new_sets)
+            rows_added_this_theme += len(new_sets)
+            for s in new_sets:
+                print(f"   Added: {s.get('name')}")
+
     conn.close()
 
     # Show total after insert
@@ -193,6 +762,41 @@ def insert_lego_sets(limit=25, db_filename=DB_NAME, page_size=100):
 
 
 if __name__ == "__main__":
-    # For testing this file directly:
-    added = insert_lego_sets(limit=25)
+    parser = argparse.ArgumentParser(description="Collect Lego sets from Rebrickable")
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="download the full catalog of every theme instead of 25 new sets",
+    )
+    parser.add_argument(
+        "--ingest-csv",
+        metavar="SETS_CSV",
+        help="load a Rebrickable sets.csv.gz download instead of calling the API",
+    )
+    parser.add_argument(
+        "--themes-csv",
+        metavar="THEMES_CSV",
+        help="themes.csv.gz download, maps sub-themes to their parent theme",
+    )
+    parser.add_argument(
+        "--all-themes",
+        action="store_true",
+        help="with --ingest-csv, load every theme instead of THEME_IDS",
+    )
+    args = parser.parse_args()
+    if args.all_themes and not args.themes_csv:
+        parser.error("--all-themes needs --themes-csv for the theme names")
+
+    if args.ingest_csv:
+        added = ingest_lego_csv(
+            args.ingest_csv,
+            args.themes_csv,
+            theme_ids=None if args.all_themes else THEME_IDS,
+        )
+    elif args.sync:
+        added = sync_lego_catalog()
+    else:
+        # For testing this file directly:
+        added = insert_lego_sets(limit=25)
     print(f"Job complete. Total new Lego sets added: {added}")
+    get_cache().report()
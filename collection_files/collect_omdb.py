@@ -9,10 +9,27 @@ rank according to IMDb and Rotten Tomatoes scores.
 This file creates its own MovieMetrics table (no need to modify database_setup.py)
 """
 
+import os
 import requests
 import sqlite3
 import re
+import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+# tracing.py lives in the project root; don't rely on collection_state or
+# http_cache having added it to sys.path first
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from collection_state import load_cursor, save_cursor
+from http_cache import cached_get, get_cache
+from rate_limit import TokenBucket
+from tracing import count, span, traced
+
+# OMDB_BASE_URL points the collector at another server (e.g. benchmarks/mock_api.py)
+BASE_URL = os.environ.get("OMDB_BASE_URL", "http://www.omdbapi.com/")
 
 
 def get_api_key(filename="api_keys.txt"):
@@ -201,13 +218,25 @@ def parse_rotten_tomatoes(ratings_list):
     return None
 
 
+def omdb_found(response):
+    """
+    OMDb reports errors, including a transient "not found", as a 200 with
+    "Response": "False". Those aren't cached, so the next run asks again.
+    """
+    try:
+        return response.json().get("Response") == "True"
+    except ValueError:
+        return False
+
+
 def fetch_movie_data(api_key, imdb_id):
     """Fetches movie data from OMDB API."""
-    base_url = "http://www.omdbapi.com/"
     params = {"apikey": api_key, "i": imdb_id, "type": "movie"}
 
     try:
-        response = requests.get(base_url, params=params)
+        response = cached_get(
+            BASE_URL, params=params, source="omdb", cacheable=omdb_found
+        )
         response.raise_for_status()
         data = response.json()
 
@@ -220,123 +249,319 @@ def fetch_movie_data(api_key, imdb_id):
         return None
 
 
-def collect_omdb_data():
+def parse_movie_data(movie_data, is_star_wars):
+    """
+    Converts a raw OMDB API response into the dict stored in MovieMetrics.
+
+    Args:
+        movie_data (dict): JSON response from the OMDB API
+        is_star_wars (int): 1 if the movie is a Star Wars movie, else 0
+
+    Returns:
+        dict: movie_info dict with the MovieMetrics columns
+    """
+    box_office = parse_box_office(movie_data.get("BoxOffice"))
+
+    imdb_rating = None
+    if movie_data.get("imdbRating") and movie_data.get("imdbRating") != "N/A":
+        try:
+            imdb_rating = float(movie_data.get("imdbRating"))
+        except ValueError:
+            pass
+
+    rotten_tomatoes = parse_rotten_tomatoes(movie_data.get("Ratings", []))
+
+    movie_info = {
+        "imdb_id": movie_data.get("imdbID"),
+        "title": movie_data.get("Title"),
+        "box_office": box_office,
+        "imdb_rating": imdb_rating,
+        "rotten_tomatoes": rotten_tomatoes,
+        "is_star_wars": is_star_wars,
+    }
+    return movie_info
+
+
+def collect_omdb_data(movies=None, api_key=None):
     """
     Collects both Star Wars AND top movies from OMDB API.
     This ensures we get 100+ movies for the project.
 
+    Args:
+        movies (list, optional): (imdb_id, title, is_star_wars) tuples to
+            fetch. Defaults to every Star Wars and top movie.
+        api_key (str, optional): OMDB API key. Loaded from api_keys.txt if None.
+
     Returns:
         list: List of movie data dictionaries
     """
-    api_key = get_api_key()
+    if api_key is None:
+        api_key = get_api_key()
     if not api_key:
         return []
 
     # Combine Star Wars and top movies
-    all_movies = get_star_wars_movies() + get_top_movies()
+    all_movies = movies
+    if all_movies is None:
+        all_movies = get_star_wars_movies() + get_top_movies()
 
     movies_data = []
 
     print(f"Collecting {len(all_movies)} movies from OMDB API...")
 
-    for imdb_id, title, is_star_wars in all_movies:
-        movie_data = fetch_movie_data(api_key, imdb_id)
+    with span("omdb.fetch", movies=len(all_movies)):
+        for imdb_id, title, is_star_wars in all_movies:
+            movie_data = fetch_movie_data(api_key, imdb_id)
 
-        if not movie_data:
-            continue
+            if not movie_data:
+                continue
+
+            movies_data.append(parse_movie_data(movie_data, is_star_wars))
+
+            # Small delay to respect API rate limits
+            time.sleep(0.1)
+
+    return movies_data
 
-        # Parse data
-        box_office = parse_box_office(movie_data.get("BoxOffice"))
 
-        imdb_rating = None
-        if movie_data.get("imdbRating") and movie_data.get("imdbRating") != "N/A":
-            try:
-                imdb_rating = float(movie_data.get("imdbRating"))
-            except ValueError:
-                pass
+def collect_omdb_data_concurrent(
+    movies=None,
+    api_key=None,
+    max_in_flight=8,
+    requests_per_second=10.0,
+    burst=None,
+    bucket=None,
+):
+    """
+    Concurrent version of collect_omdb_data.
 
-        rotten_tomatoes = parse_rotten_tomatoes(movie_data.get("Ratings", []))
+    Requests run on a bounded thread pool (at most `max_in_flight` at once)
+    and a shared token bucket keeps the overall rate at `requests_per_second`,
+    instead of sleeping a fixed 0.1s after every call.
 
-        movie_info = {
-            "imdb_id": movie_data.get("imdbID"),
-            "title": movie_data.get("Title"),
-            "box_office": box_office,
-            "imdb_rating": imdb_rating,
-            "rotten_tomatoes": rotten_tomatoes,
-            "is_star_wars": is_star_wars,
-        }
-        movies_data.append(movie_info)
+    Args:
+        movies (list, optional): (imdb_id, title, is_star_wars) tuples to
+            fetch. Defaults to every Star Wars and top movie.
+        api_key (str, optional): OMDB API key. Loaded from api_keys.txt if None.
+        max_in_flight (int): max number of requests running at the same time
+        requests_per_second (float): sustained request rate allowed
+        burst (int, optional): how many requests may go out back to back.
+            Defaults to the per-second rate.
+        bucket (TokenBucket, optional): existing limiter to share between
+            calls. A new one is made from requests_per_second/burst if None.
 
-        # Small delay to respect API rate limits
-        time.sleep(0.1)
+    Returns:
+        list: List of movie data dictionaries, in the same order as
+            collect_omdb_data would return them
+    """
+    if api_key is None:
+        api_key = get_api_key()
+    if not api_key:
+        return []
+
+    all_movies = movies
+    if all_movies is None:
+        all_movies = get_star_wars_movies() + get_top_movies()
+    if not all_movies:
+        return []
+    if bucket is None:
+        bucket = TokenBucket(requests_per_second, burst)
+
+    def fetch(imdb_id):
+        bucket.acquire()
+        return fetch_movie_data(api_key, imdb_id)
+
+    print(
+        f"Collecting {len(all_movies)} movies from OMDB API "
+        f"({max_in_flight} in flight, {requests_per_second} req/s limit)..."
+    )
+
+    start = time.perf_counter()
+    with span("omdb.fetch", movies=len(all_movies), max_in_flight=max_in_flight):
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            # map keeps the input order, so the results line up with all_movies
+            responses = list(executor.map(fetch, [movie[0] for movie in all_movies]))
+    elapsed = time.perf_counter() - start
+
+    movies_data = []
+    with span("omdb.parse"):
+        for (imdb_id, title, is_star_wars), movie_data in zip(all_movies, responses):
+            if not movie_data:
+                continue
+            movies_data.append(parse_movie_data(movie_data, is_star_wars))
+
+    achieved_rate = len(all_movies) / elapsed if elapsed > 0 else 0.0
+    print(
+        f"Fetched {len(all_movies)} movies in {elapsed:.2f}s "
+        f"({achieved_rate:.1f} requests/second)"
+    )
 
     return movies_data
 
 
-def insert_into_database(limit=25):
+def get_missing_movies(cursor, movies):
+    """
+    Filters a candidate movie list down to the movies not yet in MovieMetrics.
+
+    Args:
+        cursor (sqlite3.Cursor): cursor on the database
+        movies (list): (imdb_id, title, is_star_wars) tuples
+
+    Returns:
+        list: candidates whose imdb_id is not in MovieMetrics, without
+            duplicates and in their original order
+    """
+    cursor.execute("SELECT imdb_id FROM MovieMetrics")
+    seen = {row[0] for row in cursor.fetchall()}
+
+    missing = []
+    for movie in movies:
+        if movie[0] in seen:
+            continue
+        seen.add(movie[0])
+        missing.append(movie)
+    return missing
+
+
+def resume_order(missing, movies, last_id):
+    """
+    Puts the missing movies after `last_id` (the last one a previous run
+    attempted) first, so a run continues where the last one stopped. The
+    missing movies up to `last_id` (their fetch failed) go to the back and
+    are retried once the rest of the list has been tried.
+
+    Args:
+        missing (list): (imdb_id, title, is_star_wars) tuples to fetch
+        movies (list): the full candidate list, in collection order
+        last_id (str): IMDb id saved in collection_state, or None
+
+    Returns:
+        list: the same movies, reordered
+    """
+    positions = {movie[0]: i for i, movie in enumerate(movies)}
+    if last_id not in positions:
+        return missing
+    stop = positions[last_id]
+    after = [movie for movie in missing if positions[movie[0]] > stop]
+    before = [movie for movie in missing if positions[movie[0]] <= stop]
+    return after + before
+
+
+@traced("omdb.collect")
+def insert_into_database(
+    limit=25,
+    concurrent=False,
+    max_in_flight=8,
+    requests_per_second=10.0,
+    db_filename="starwars.db",
+    movies=None,
+    api_key=None,
+):
     """
     Inserts movie data into database, limiting to 'limit' new entries per run.
     Creates the MovieMetrics table if it doesn't exist.
 
+    Only movies missing from MovieMetrics are requested from the API, and
+    fetching stops as soon as `limit` new rows have been added, so a run
+    costs about `limit` API calls no matter how many movies are already stored.
+    The last IMDb id attempted is saved in collection_state with each batch
+    of inserts, and the next run starts after it (see resume_order).
+
     Args:
         limit (int): Maximum number of new entries to add per run (default 25)
+        concurrent (bool): fetch with collect_omdb_data_concurrent instead of
+            one request at a time
+        max_in_flight (int): max parallel requests when concurrent is True
+        requests_per_second (float): rate limit when concurrent is True
+        db_filename (str): filename of the database
+        movies (list, optional): (imdb_id, title, is_star_wars) candidates.
+            Defaults to every Star Wars and top movie.
+        api_key (str, optional): OMDB API key. Loaded from api_keys.txt if None.
 
     Returns:
         int: Number of movies added this run
     """
+    conn = sqlite3.connect(db_filename)
+    cursor = conn.cursor()
 
-    # Collect data from API
-    movies_data = collect_omdb_data()
+    # Diff the candidate list against the table before any network call
+    if movies is None:
+        movies = get_star_wars_movies() + get_top_movies()
+    missing = get_missing_movies(cursor, movies)
+    if not missing:
+        print("All movies are already in the database. Nothing to fetch.")
+        conn.close()
+        return 0
 
-    if not movies_data:
-        print("No movie data collected")
+    if api_key is None:
+        api_key = get_api_key()
+    if not api_key:
+        conn.close()
         return 0
 
-    conn = sqlite3.connect("starwars.db")
-    cursor = conn.cursor()
+    missing = resume_order(missing, movies, load_cursor(conn, "omdb", "last_id"))
 
     rows_added = 0
-
-    print(f"Found {len(movies_data)} movies. Processing with limit of {limit}...")
-
-    for movie in movies_data:
-        # Check if we've hit the limit
-        if rows_added >= limit:
-            print("Reached limit of 25 rows.")
-            break
-
-        # Check if movie already exists
-        cursor.execute(
-            "SELECT imdb_id FROM MovieMetrics WHERE imdb_id = ?", (movie["imdb_id"],)
-        )
-        if cursor.fetchone():
-            continue
-
-        # Insert into database
-        try:
-            cursor.execute(
-                """
-                INSERT INTO MovieMetrics 
-                (imdb_id, title, box_office, imdb_rating, rotten_tomatoes, is_star_wars)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """,
-                (
-                    movie["imdb_id"],
-                    movie["title"],
-                    movie["box_office"],
-                    movie["imdb_rating"],
-                    movie["rotten_tomatoes"],
-                    movie["is_star_wars"],
-                ),
+    requests_made = 0
+    # One limiter for the whole run so the batches share the rate budget
+    bucket = TokenBucket(requests_per_second)
+
+    print(f"{len(missing)} movies missing from the database. Limit is {limit}...")
+
+    while missing and rows_added < limit:
+        # Only fetch as many movies as we still have room for
+        batch = missing[: limit - rows_added]
+        missing = missing[len(batch) :]
+        requests_made += len(batch)
+
+        if concurrent:
+            movies_data = collect_omdb_data_concurrent(
+                movies=batch,
+                api_key=api_key,
+                max_in_flight=max_in_flight,
+                requests_per_second=requests_per_second,
+                bucket=bucket,
             )
-            conn.commit()
-            rows_added += 1
+        else:
+            movies_data = collect_omdb_data(movies=batch, api_key=api_key)
 
-            movie_type = "[SW]" if movie["is_star_wars"] else "[TM]"
-            print(f"Added: {movie_type} - {movie['title']}")
+        # The batch's rows and the cursor past it are committed together
+        with span("omdb.insert", movies=len(movies_data)), conn:
+            for movie in movies_data:
+                if rows_added >= limit:
+                    break
 
-        except sqlite3.IntegrityError:
-            continue
+                # Insert into database
+                try:
+                    cursor.execute(
+                        """
+                        INSERT INTO MovieMetrics 
+                        (imdb_id, title, box_office, imdb_rating, rotten_tomatoes, is_star_wars)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                        (
+                            movie["imdb_id"],
+                            movie["title"],
+                            movie["box_office"],
+                            movie["imdb_rating"],
+                            movie["rotten_tomatoes"],
+                            movie["is_star_wars"],
+                        ),
+                    )
+                    rows_added += 1
+                    count("rows_written_total", table="MovieMetrics")
+
+                    movie_type = "[SW]" if movie["is_star_wars"] else "[TM]"
+                    print(f"Added: {movie_type} - {movie['title']}")
+
+                except sqlite3.IntegrityError:
+                    continue
+
+            save_cursor(conn, "omdb", "last_id", batch[-1][0])
+
+    if rows_added >= limit:
+        print(f"Reached limit of {limit} rows.")
+    print(f"Made {requests_made} API calls for {rows_added} new rows.")
 
     # Show summary
     cursor.execute("SELECT COUNT(*) FROM MovieMetrics")
@@ -363,7 +588,6 @@ if __name__ == "__main__":
     print(API_KEY)
 
     # Insert data into database (limit 25 per run)
-    total_added = insert_into_database(limit=25)
+    total_added = insert_into_database(limit=25, concurrent=True)
     print(f"Job complete. Total new movies added: {total_added}")
-
-    
\ No newline at end of file
+    get_cache().report()
@@ -4,15 +4,35 @@ Author: Emma Marion (emarion@umich.edu)
 Purpose: Collect cannon Star Wars comics by websceraping wookiepedia
 """
 
-from bs4 import BeautifulSoup
-import requests
+import os
 import sqlite3
+import sys
+
+# tracing.py lives in the project root (normally added by http_cache)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from collection_state import load_cursor, save_cursor
+from tracing import count, span
+
+# bs4, requests and http_cache (which imports requests) are imported in the
+# functions that fetch or parse, so importing this module stays cheap
+
+# WOOKIEEPEDIA_TIMELINE_URL points the scraper at another page (e.g. benchmarks/mock_api.py)
+TIMELINE_URL = os.environ.get(
+    "WOOKIEEPEDIA_TIMELINE_URL",
+    "https://starwars.fandom.com/wiki/Timeline_of_canon_media",
+)
 
 
 def collect_comics():
     """
     Fetches the raw HTML content from the Wookieepedia timeline page using a GET request.
 
+    The page is served from the shared HTTP cache when it is still fresh, and
+    revalidated with the server (a cheap 304 if unchanged) when it is not.
+
     The function includes error handling: it raises an exception for bad HTTP
     status codes (4xx, 5xx) and exits the program if a network error occurs.
 
@@ -22,9 +42,11 @@ def collect_comics():
     Returns:
         str: The raw HTML content of the Wookieepedia 'Timeline of canon media' page.
     """
-    url = "https://starwars.fandom.com/wiki/Timeline_of_canon_media"
+    import requests
+    from http_cache import cached_get
+
     try:
-        response = requests.get(url)
+        response = cached_get(TIMELINE_URL, source="wookieepedia")
         response.raise_for_status()  # Raises error for 404, 500, etc.
         return response.text
     except requests.RequestException as e:
@@ -32,7 +54,86 @@ def collect_comics():
         exit()
 
 
-def scrape(html_content, database_filename="starwars.db", limit=25):
+def extract_comic_row(table_row):
+    """
+    Pulls the title and release year out of one comic row of the timeline table.
+
+    Args:
+        table_row (bs4.element.Tag): a <tr class="comic"> element
+
+    Returns:
+        tuple: (title, year) where year is the first 4 characters of the date
+    """
+    cells = table_row.find_all("td")
+    title_cell = cells[2]
+    for unordered_list in title_cell.find_all("ul"):
+        unordered_list.decompose()
+
+    title = title_cell.get_text(strip=True)
+    title = title.strip("†")
+
+    # Change date to year to avoid duplicate string data
+    date_text = cells[3].get_text(strip=True)
+    year = date_text[:4]
+    return title, year
+
+
+def find_comic_rows(html_content, fast=True):
+    """
+    Finds every comic row on the timeline page.
+
+    In fast mode a SoupStrainer tells BeautifulSoup to only build the
+    <tr class="comic"> rows, so the rest of the (very large) page is never
+    turned into a tree. fast=False parses the whole document like before.
+
+    Args:
+        html_content (str): The raw HTML content from the Wookieepedia timeline page.
+        fast (bool, optional): only build the comic rows. Defaults to True.
+
+    Returns:
+        list[bs4.element.Tag]: the <tr class="comic"> rows, in page order
+    """
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    if fast:
+        # The strainer sees the raw class string (e.g. "comic ya"), so match
+        # "comic" as one of its words like find_all(class_="comic") does
+        only_comic_rows = SoupStrainer(
+            "tr", class_=lambda value: value is not None and "comic" in value.split()
+        )
+        soup = BeautifulSoup(html_content, "html.parser", parse_only=only_comic_rows)
+    else:
+        soup = BeautifulSoup(html_content, "html.parser")
+
+    return soup.find_all("tr", class_="comic")
+
+
+def resume_row(cursor, comic_table_rows):
+    """
+    Index of the first timeline row the last run didn't get to.
+
+    Starts over at 0 when there is no cursor or the page changed since: a
+    different number of comic rows, or a different title just before the
+    cursor, means rows were added or removed somewhere. Starting over is
+    always safe, INSERT OR IGNORE skips the comics already stored.
+
+    Args:
+        cursor (dict): {"row", "title", "rows"} saved by scrape, or None
+        comic_table_rows (list): rows from find_comic_rows
+
+    Returns:
+        int: row index to continue from
+    """
+    if not cursor or cursor["rows"] != len(comic_table_rows):
+        return 0
+    row = cursor["row"]
+    if not 0 < row <= len(comic_table_rows):
+        return 0
+    title, _ = extract_comic_row(comic_table_rows[row - 1])
+    return row if title == cursor["title"] else 0
+
+
+def scrape(html_content, database_filename="starwars.db", limit=25, fast=True):
     """
     Scrapes Star Wars comic data from an HTML page, extracts the title and release
     year, and inserts them into the 'comics' table in the SQLite database.
@@ -40,58 +141,73 @@ def scrape(html_content, database_filename="starwars.db", limit=25):
     The function limits the total number of new items added to prevent exceeding
     the project's 25-item-per-run limit.
     It also handles duplicate entries by skipping comics whose title already exists
-    in the database.
+    in the database (INSERT OR IGNORE).
+
+    The index of the next timeline row is saved in collection_state in the same
+    transaction as each batch, so the next run starts there instead of walking
+    the timeline from the top again; rows before it are never extracted. A
+    full-timeline load (limit=None) is one batch and commits once.
 
     Args:
         html_content (str): The raw HTML content from the Wookieepedia timeline page.
         database_filename (str): The string of the database filename.
         limit (int, optional): The maximum number of new comic rows to add during this function call. Defaults to 25.
+            None adds every comic on the page.
+        fast (bool, optional): only parse the comic rows (see find_comic_rows). Defaults to True.
 
     Returns:
         int: The number of new comic rows successfully added to the database.
     """
-    soup = BeautifulSoup(html_content, "html.parser")
-    comic_table_rows = soup.find_all("tr", class_="comic")
+    with span("wookieepedia.parse"):
+        comic_table_rows = find_comic_rows(html_content, fast=fast)
+    total_rows = len(comic_table_rows)
 
     conn = sqlite3.connect(database_filename)
-    cursor = conn.cursor()
     rows_added = 0
 
-    print(f"Found {len(comic_table_rows)} comic rows. Processing...")
-
-    for table_row in comic_table_rows:
-        if rows_added >= limit:
-            print("Reached limit of 25 rows.")
-            break
-
-        cells = table_row.find_all("td")
-        title_cell = cells[2]
-        for unordered_list in title_cell.find_all("ul"):
-            unordered_list.decompose()
-
-        title = title_cell.get_text(strip=True)
-        title = title.strip("†")
-
-        # Change date to year to avoid duplicate string data
-        date_text = cells[3].get_text(strip=True)
-        year = date_text[:4]
-
-        try:
-            cursor.execute(
-                "INSERT INTO comics (title, release_date) VALUES (?, ?)",
-                (title, year),
-            )
-            conn.commit()
-            rows_added += 1
-            print(f"Added: {title}")
-        except sqlite3.IntegrityError:
-            # if the title is already in the database, skip it
-            continue
+    row = resume_row(load_cursor(conn, "wookieepedia", "timeline"), comic_table_rows)
+    print(f"Found {total_rows} comic rows. Processing from row {row}...")
+
+    # Each batch commits together with the cursor past it. INSERT OR IGNORE
+    # skips titles that already exist, and the cursor's rowcount tells us how
+    # many rows of each batch were actually new (total_changes would also
+    # count the change-counter trigger writes).
+    with span("wookieepedia.insert", rows=total_rows - row):
+        while row < total_rows and (limit is None or rows_added < limit):
+            end = total_rows
+            if limit is not None:
+                # Never try more rows than we still have room for
+                end = min(total_rows, row + limit - rows_added)
+            batch = [extract_comic_row(r) for r in comic_table_rows[row:end]]
+
+            with conn:
+                inserted = conn.executemany(
+                    "INSERT OR IGNORE INTO comics (title, release_date) VALUES (?, ?)",
+                    batch,
+                )
+                rows_added += inserted.rowcount
+                save_cursor(
+                    conn,
+                    "wookieepedia",
+                    "timeline",
+                    {"row": end, "title": batch[-1][0], "rows": total_rows},
+                )
+            row = end
+    count("rows_written_total", rows_added, table="comics")
+
+    if limit is not None and rows_added >= limit:
+        print(f"Reached limit of {limit} rows.")
+    elif row == total_rows:
+        print("Reached the end of the timeline.")
+    print(f"Added {rows_added} new comics.")
 
     conn.close()
     return rows_added
 
 
 if __name__ == "__main__":
+    from http_cache import get_cache
+
     html_content = collect_comics()
     scrape(html_content)
+    get_cache().report()
@@ -0,0 +1,76 @@
+"""
+collection_state.py
+Purpose: Per-source resume cursors for the collectors
+
+Each collector records where it stopped in the collection_state table:
+
+    omdb          last_id       last IMDb id attempted
+    rebrickable   theme:<id>    page, results of that page handled, `next` link
+    wookieepedia  timeline      next timeline row, the title before it, row count
+
+save_cursor() only executes the UPSERT; the collector commits it in the
+same transaction as the rows it inserted. So a cursor never points past
+rows that weren't saved, and a run that crashes or stops at its limit
+resumes exactly where the last commit left off instead of re-fetching or
+re-parsing from the start.
+
+    with conn:
+        conn.executemany("INSERT ...", rows)
+        save_cursor(conn, "rebrickable", "theme:158", {"page": 2, "offset": 40})
+"""
+
+import json
+import os
+import sys
+import time
+
+# database_setup.py lives in the project root
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from database_setup import COLLECTION_STATE_TABLE
+
+
+def ensure_state_table(conn):
+    """Creates collection_state in databases set up before it existed."""
+    conn.execute(COLLECTION_STATE_TABLE)
+
+
+def load_cursor(conn, source, key):
+    """
+    Returns the saved cursor of `source`/`key`, or None if there is none.
+    """
+    ensure_state_table(conn)
+    row = conn.execute(
+        "SELECT value FROM collection_state WHERE source = ? AND key = ?",
+        (source, key),
+    ).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def save_cursor(conn, source, key, value):
+    """
+    Stores a cursor (any JSON value). Doesn't commit: call it inside the
+    transaction that inserts the rows the cursor moves past.
+    """
+    conn.execute(
+        """
+        INSERT INTO collection_state (source, key, value, updated_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(source, key) DO UPDATE SET
+            value = excluded.value,
+            updated_at = excluded.updated_at
+        """,
+        (source, key, json.dumps(value), time.time()),
+    )
+
+
+def clear_cursors(conn, source=None):
+    """Forgets the cursors of one source (or all), so it starts over."""
+    ensure_state_table(conn)
+    with conn:
+        if source is None:
+            conn.execute("DELETE FROM collection_state")
+        else:
+            conn.execute("DELETE FROM collection_state WHERE source = ?", (source,))
@@ -0,0 +1,323 @@
+"""
+http_cache.py
+Purpose: Persistent HTTP response cache shared by the collectors
+
+Responses are stored in a small SQLite file keyed by URL + query params.
+Each source gets its own time-to-live. Once a cached response is older
+than its TTL it is revalidated with ETag / Last-Modified, so an unchanged
+page only costs a 304 instead of the full body. The cache is capped in
+size and evicts the least recently used responses first.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from urllib.parse import urlencode
+
+import requests
+
+# tracing.py lives in the project root
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from tracing import count, span
+
+CACHE_FILENAME = "http_cache.db"
+MAX_CACHE_BYTES = 200 * 1024 * 1024  # 200 MB
+
+# Seconds a response is served without asking the server again
+SOURCE_TTLS = {
+    "omdb": 7 * 24 * 60 * 60,  # movie ratings barely change
+    "rebrickable": 24 * 60 * 60,
+    "wookieepedia": 6 * 60 * 60,  # the timeline page is edited often
+}
+DEFAULT_TTL = 60 * 60
+
+
+class CachedResponse:
+    """
+    Minimal stand-in for requests.Response built from a cache entry.
+    Supports the parts the collectors use: text, json() and raise_for_status().
+    """
+
+    def __init__(self, url, content, headers, encoding="utf-8"):
+        self.url = url
+        self.status_code = 200
+        self.content = content
+        self.headers = headers
+        self.encoding = encoding or "utf-8"
+        self.from_cache = True
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        return None
+
+
+class HTTPCache:
+    """
+    On-disk response cache with per-source TTLs and an LRU size cap.
+
+    Args:
+        filename (str): SQLite file the responses are stored in
+        max_bytes (int): total body size kept before old entries are evicted
+        ttls (dict, optional): {source: seconds}, overrides SOURCE_TTLS
+        session (requests.Session, optional): session used for network calls
+    """
+
+    def __init__(
+        self,
+        filename=CACHE_FILENAME,
+        max_bytes=MAX_CACHE_BYTES,
+        ttls=None,
+        session=None,
+    ):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.ttls = dict(SOURCE_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.session = session or requests.Session()
+        self.lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "revalidated": 0,
+            "evictions": 0,
+            "bytes_saved": 0,
+            "bytes_downloaded": 0,
+        }
+
+        self.conn = sqlite3.connect(filename, check_same_thread=False)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key           TEXT PRIMARY KEY,
+                url           TEXT,
+                source        TEXT,
+                body          BLOB,
+                headers       TEXT,
+                encoding      TEXT,
+                etag          TEXT,
+                last_modified TEXT,
+                size          INTEGER,
+                stored_at     REAL,
+                last_access   REAL
+            )
+            """
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)"
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(url, params=None):
+        """
+        Builds the cache key for a URL and its query params.
+        The key is a hash, so API keys in the params are never stored.
+        """
+        query = urlencode(sorted((params or {}).items()))
+        return hashlib.sha256(f"{url}?{query}".encode("utf-8")).hexdigest()
+
+    def get(
+        self,
+        url,
+        params=None,
+        headers=None,
+        source="default",
+        timeout=30,
+        cacheable=None,
+    ):
+        """
+        GET request served from the cache when possible.
+
+        Args:
+            url (str): URL to request
+            params (dict, optional): query params
+            headers (dict, optional): request headers (not part of the key)
+            source (str): name used to pick the TTL, e.g. "omdb"
+            timeout (int): seconds before the network request gives up
+            cacheable (callable, optional): called with a 200 response,
+                returns False for responses that must not be stored (e.g.
+                an API error reported with status 200)
+
+        Returns:
+            requests.Response or CachedResponse
+
+        Raises:
+            requests.RequestException: if the network request fails
+        """
+        with span("http.get", source=source) as current:
+            response = self._get(url, params, headers, source, timeout, cacheable)
+            current.set(status=response.status_code)
+            return response
+
+    def _get(self, url, params, headers, source, timeout, cacheable):
+        key = self.make_key(url, params)
+        ttl = self.ttls.get(source, DEFAULT_TTL)
+
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT body, headers, encoding, etag, last_modified, size, stored_at "
+                "FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+
+            if row and time.time() - row[6] < ttl:
+                self._touch(key)
+                self.stats["hits"] += 1
+                self.stats["bytes_saved"] += row[5]
+                count("cache_hits_total", source=source)
+                return CachedResponse(url, row[0], json.loads(row[1]), row[2])
+
+        request_headers = dict(headers or {})
+        if row:
+            # Stale entry: ask the server whether it changed
+            if row[3]:
+                request_headers["If-None-Match"] = row[3]
+            if row[4]:
+                request_headers["If-Modified-Since"] = row[4]
+
+        response = self.session.get(
+            url, params=params, headers=request_headers, timeout=timeout
+        )
+        count("http_requests_total", source=source, status=response.status_code)
+        count("http_bytes_total", len(response.content), source=source)
+
+        with self.lock:
+            if response.status_code == 304 and row:
+                self.conn.execute(
+                    "UPDATE responses SET stored_at = ?, last_access = ? WHERE key = ?",
+                    (time.time(), time.time(), key),
+                )
+                self.conn.commit()
+                self.stats["hits"] += 1
+                self.stats["revalidated"] += 1
+                self.stats["bytes_saved"] += row[5]
+                count("cache_hits_total", source=source)
+                return CachedResponse(url, row[0], json.loads(row[1]), row[2])
+
+            self.stats["misses"] += 1
+            count("cache_misses_total", source=source)
+            self.stats["bytes_downloaded"] += len(response.content)
+            if response.status_code == 200 and (
+                cacheable is None or cacheable(response)
+            ):
+                self._store(key, url, source, response)
+
+        return response
+
+    def _touch(self, key):
+        self.conn.execute(
+            "UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key)
+        )
+        self.conn.commit()
+
+    def _store(self, key, url, source, response):
+        now = time.time()
+        body = response.content
+        self.conn.execute(
+            """
+            INSERT OR REPLACE INTO responses
+            (key, url, source, body, headers, encoding, etag, last_modified,
+             size, stored_at, last_access)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                key,
+                url,
+                source,
+                body,
+                json.dumps(dict(response.headers)),
+                response.encoding,
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+                len(body),
+                now,
+                now,
+            ),
+        )
+        self._evict()
+        self.conn.commit()
+
+    def _evict(self):
+        """Deletes least recently used entries until the cache fits max_bytes."""
+        total = self.conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self.conn.execute(
+            "SELECT key, size FROM responses ORDER BY last_access ASC"
+        ).fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        """Removes every cached response."""
+        with self.lock:
+            self.conn.execute("DELETE FROM responses")
+            self.conn.commit()
+
+    def report(self):
+        """Prints the hit/miss counters."""
+        s = self.stats
+        print(
+            f"HTTP cache: {s['hits']} hits ({s['revalidated']} revalidated), "
+            f"{s['misses']} misses, {s['bytes_saved']:,} bytes saved, "
+            f"{s['bytes_downloaded']:,} bytes downloaded, {s['evictions']} evictions"
+        )
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Returns the shared HTTPCache, creating it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = HTTPCache()
+        return _cache
+
+
+def set_cache(cache):
+    """Replaces the shared HTTPCache (e.g. with one pointing at a test file)."""
+    global _cache
+    with _cache_lock:
+        _cache = cache
+
+
+def cached_get(
+    url, params=None, headers=None, source="default", timeout=30, cacheable=None
+):
+    """GET through the shared cache. See HTTPCache.get."""
+    return get_cache().get(
+        url,
+        params=params,
+        headers=headers,
+        source=source,
+        timeout=timeout,
+        cacheable=cacheable,
+    )
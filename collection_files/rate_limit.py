@@ -0,0 +1,57 @@
+"""
+rate_limit.py
+Purpose: Shared token-bucket rate limiter for the API collectors
+
+Lets the collectors fire several requests at once while keeping the
+overall request rate under what the API plan allows.
+"""
+
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Tokens refill continuously at `rate` per second up to `capacity`.
+    Every request takes one token and waits if the bucket is empty.
+
+    Args:
+        rate (float): tokens added per second (sustained requests/second)
+        capacity (int, optional): max tokens held at once (burst size).
+            Defaults to max(1, rate).
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate must be greater than 0")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity else max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.last_refill
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.last_refill = now
+
+    def acquire(self):
+        """
+        Takes one token, sleeping until one is available.
+
+        Returns:
+            float: seconds spent waiting for the token
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+            waited += wait_time
@@ -0,0 +1,106 @@
+"""
+connections.py
+Purpose: Long-lived read-only database connections for calculations and charts
+
+    conn = get_connection("starwars.db")
+    cur = conn.cursor()
+    ...
+    cur.close()   # never conn.close(), the connection is shared
+
+Opening a connection parses the schema and starts with an empty page and
+statement cache, which used to happen in every calculate_* and plot_*
+function. get_connection() opens each database once per thread and keeps it:
+
+- read-only (URI mode=ro plus PRAGMA query_only), so it can't take a write lock
+- cache_size, mmap_size and temp_store from the database's performance
+  profile (database_setup.PERFORMANCE_PROFILES)
+- a larger prepared statement cache, so repeated queries skip parsing
+
+Connections are kept per process and per thread (sqlite3 connections must
+not cross threads, and must not be used after a fork), so the threads of
+the pipeline and the processes of visualizations.render_all each get their
+own. A database file that was replaced (e.g. regenerated by a benchmark)
+gets a new connection.
+
+Each statement runs in its own read transaction, so with WAL a kept
+connection still sees rows the collectors commit later.
+"""
+
+import os
+import sqlite3
+import threading
+from urllib.parse import quote
+
+from database_setup import DEFAULT_PROFILE, PERFORMANCE_PROFILES, get_profile_name
+
+# Prepared statements kept per connection (sqlite3's default is 128)
+CACHED_STATEMENTS = 256
+
+_local = threading.local()
+
+
+def _connections():
+    # Thread-local state is copied into a forked child, so check the pid
+    if getattr(_local, "pid", None) != os.getpid():
+        _local.pid = os.getpid()
+        _local.connections = {}
+    return _local.connections
+
+
+def _file_id(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        raise sqlite3.OperationalError(f"unable to open database file: {path}")
+    return stat.st_dev, stat.st_ino
+
+
+def open_read_only(db_filename):
+    """
+    Opens a new read-only connection with the profile's read settings.
+
+    Raises:
+        sqlite3.OperationalError: if the database doesn't exist
+    """
+    path = os.path.abspath(db_filename)
+    conn = sqlite3.connect(
+        f"file:{quote(path)}?mode=ro",
+        uri=True,
+        cached_statements=CACHED_STATEMENTS,
+    )
+    settings = PERFORMANCE_PROFILES.get(
+        get_profile_name(conn), PERFORMANCE_PROFILES[DEFAULT_PROFILE]
+    )
+    conn.execute("PRAGMA query_only = ON")
+    conn.execute(f"PRAGMA cache_size = {settings['cache_size']}")
+    conn.execute(f"PRAGMA mmap_size = {settings['mmap_size']}")
+    conn.execute(f"PRAGMA temp_store = {settings['temp_store']}")
+    return conn
+
+
+def get_connection(db_filename="starwars.db"):
+    """
+    Returns this thread's shared read-only connection to `db_filename`,
+    opening it on first use. Don't close it; use close_connections().
+    """
+    path = os.path.abspath(db_filename)
+    file_id = _file_id(path)
+    connections = _connections()
+
+    entry = connections.get(path)
+    if entry is not None and entry[0] == file_id:
+        return entry[1]
+    if entry is not None:
+        entry[1].close()
+
+    conn = open_read_only(path)
+    connections[path] = (file_id, conn)
+    return conn
+
+
+def close_connections():
+    """Closes every connection this thread opened."""
+    connections = _connections()
+    for _, conn in connections.values():
+        conn.close()
+    connections.clear()
@@ -1,16 +1,538 @@
+import argparse
 import sqlite3
 
+# PRAGMA settings for each performance profile. journal_mode is stored in the
+# database file itself; the others are per-connection, so apply_profile()
+# has to be called on every new connection that wants them.
+PERFORMANCE_PROFILES = {
+    # SQLite defaults: rollback journal, fsync on every commit
+    "safe": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "cache_size": -2000,  # negative = KiB, so 2 MB
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+    },
+    # WAL lets the collectors write while calculations read
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16000,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+    # For bulk loads / benchmarks, a crash can lose the last transactions
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -64000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+}
+DEFAULT_PROFILE = "balanced"
 
-def database_setup(filename):
+# Indexes for the filters, GROUP BYs and ORDER BYs in calculations.py and
+# visualizations.py. Most are covering, so the query never touches the table.
+INDEXES = [
+    # comics per year
+    "CREATE INDEX IF NOT EXISTS idx_comics_release_date ON comics(release_date)",
+    # lego complexity by year
+    "CREATE INDEX IF NOT EXISTS idx_lego_sets_year_parts ON lego_sets(year, num_parts)",
+    # top lego sets by part count
+    "CREATE INDEX IF NOT EXISTS idx_lego_sets_parts ON lego_sets(num_parts)",
+    # theme averages (JOIN on theme_id) and the per-theme count in collect_lego
+    "CREATE INDEX IF NOT EXISTS idx_lego_sets_theme_parts "
+    "ON lego_sets(theme_id, num_parts, set_num)",
+    # Star Wars vs other averages
+    "CREATE INDEX IF NOT EXISTS idx_movies_sw_ratings "
+    "ON MovieMetrics(is_star_wars, imdb_rating, rotten_tomatoes)",
+    # top 10 by IMDb / by Rotten Tomatoes
+    "CREATE INDEX IF NOT EXISTS idx_movies_imdb ON MovieMetrics(imdb_rating)",
+    "CREATE INDEX IF NOT EXISTS idx_movies_rt ON MovieMetrics(rotten_tomatoes)",
+    # rating differences, ordered by title
+    "CREATE INDEX IF NOT EXISTS idx_movies_title_ratings "
+    "ON MovieMetrics(title, imdb_rating, rotten_tomatoes, is_star_wars)",
+    # top movies by combined score (ties by title)
+    "CREATE INDEX IF NOT EXISTS idx_movies_combined "
+    "ON MovieMetrics(combined_score DESC, title)",
+    # Star Wars movies ordered by audience-critic gap
+    "CREATE INDEX IF NOT EXISTS idx_movies_sw_gap "
+    "ON MovieMetrics(is_star_wars, rating_gap DESC, title)",
+]
+
+# Generated columns on MovieMetrics, so the rankings can be indexed. Both are
+# NULL when either rating is missing.
+#   combined_score: mean of the IMDb rating (out of 100) and the RT score
+#   rating_gap:     IMDb rating (out of 100) minus the RT score
+MOVIE_GENERATED_COLUMNS = {
+    "combined_score": "(imdb_rating * 10 + rotten_tomatoes) / 2",
+    "rating_gap": "imdb_rating * 10 - rotten_tomatoes",
+}
+
+# Resume cursors of the collectors (see collection_files/collection_state.py),
+# one JSON value per source and key
+COLLECTION_STATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS collection_state (
+        source     TEXT,
+        key        TEXT,
+        value      TEXT,
+        updated_at REAL,
+        PRIMARY KEY (source, key)
+    )
+"""
+
+# Data tables whose writes are counted in table_changes. A row count or the
+# highest rowid misses UPDATEs and a delete followed by an insert; these
+# counters don't, so result_cache.py and pipeline.py use them to tell
+# whether a table changed.
+TRACKED_TABLES = (
+    "comics",
+    "lego_sets",
+    "lego_set_names",
+    "lego_themes",
+    "MovieMetrics",
+)
+
+CHANGE_COUNTER_TABLE = """
+    CREATE TABLE IF NOT EXISTS table_changes (
+        table_name TEXT PRIMARY KEY,
+        changes    INTEGER NOT NULL
+    )
+"""
+
+# Optional summary tables kept up to date by triggers, so the per-group
+# calculations read one row per group instead of scanning the whole table.
+# Key columns have no declared type so they hold exactly the value stored in
+# the source table (e.g. a release_date that isn't a number stays as text).
+#
+# {aggregate table: (key column, SELECT that rebuilds it from the live table)}
+AGGREGATES = {
+    "agg_comics_per_year": (
+        "release_date",
+        """
+        SELECT release_date, COUNT(*)
+        FROM comics
+        WHERE release_date != '' AND release_date IS NOT NULL
+        GROUP BY release_date
+        """,
+    ),
+    "agg_lego_year": (
+        "year",
+        """
+        SELECT year, SUM(num_parts), COUNT(*)
+        FROM lego_sets
+        WHERE year IS NOT NULL AND num_parts IS NOT NULL
+        GROUP BY year
+        """,
+    ),
+    "agg_lego_theme": (
+        "theme_id",
+        """
+        SELECT theme_id, SUM(num_parts), COUNT(*)
+        FROM lego_sets
+        WHERE theme_id IS NOT NULL AND num_parts IS NOT NULL
+        GROUP BY theme_id
+        """,
+    ),
+    "agg_movie_ratings": (
+        "is_star_wars",
+        """
+        SELECT is_star_wars, SUM(imdb_rating), SUM(rotten_tomatoes), COUNT(*)
+        FROM MovieMetrics
+        WHERE imdb_rating IS NOT NULL AND rotten_tomatoes IS NOT NULL
+        GROUP BY is_star_wars
+        """,
+    ),
+}
+
+AGGREGATE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS agg_comics_per_year (
+        release_date PRIMARY KEY,
+        comic_count  INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS agg_lego_year (
+        year      PRIMARY KEY,
+        parts_sum INTEGER NOT NULL,
+        set_count INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS agg_lego_theme (
+        theme_id  PRIMARY KEY,
+        parts_sum INTEGER NOT NULL,
+        set_count INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS agg_movie_ratings (
+        is_star_wars PRIMARY KEY,
+        imdb_sum     REAL NOT NULL,
+        rt_sum       REAL NOT NULL,
+        movie_count  INTEGER NOT NULL
+    )
+    """,
+]
+
+# SQL run for every row added (NEW) or removed (OLD). An UPDATE removes the
+# old row and adds the new one. Groups that drop to zero rows are deleted.
+_AGGREGATE_ADD = {
+    "comics": """
+        INSERT INTO agg_comics_per_year (release_date, comic_count)
+        SELECT NEW.release_date, 1
+        WHERE NEW.release_date != '' AND NEW.release_date IS NOT NULL
+        ON CONFLICT(release_date) DO UPDATE SET comic_count = comic_count + 1;
+    """,
+    "lego_sets": """
+        INSERT INTO agg_lego_year (year, parts_sum, set_count)
+        SELECT NEW.year, NEW.num_parts, 1
+        WHERE NEW.year IS NOT NULL AND NEW.num_parts IS NOT NULL
+        ON CONFLICT(year) DO UPDATE SET
+            parts_sum = parts_sum + excluded.parts_sum,
+            set_count = set_count + 1;
+        INSERT INTO agg_lego_theme (theme_id, parts_sum, set_count)
+        SELECT NEW.theme_id, NEW.num_parts, 1
+        WHERE NEW.theme_id IS NOT NULL AND NEW.num_parts IS NOT NULL
+        ON CONFLICT(theme_id) DO UPDATE SET
+            parts_sum = parts_sum + excluded.parts_sum,
+            set_count = set_count + 1;
+    """,
+    "MovieMetrics": """
+        INSERT INTO agg_movie_ratings (is_star_wars, imdb_sum, rt_sum, movie_count)
+        SELECT NEW.is_star_wars, NEW.imdb_rating, NEW.rotten_tomatoes, 1
+        WHERE NEW.imdb_rating IS NOT NULL AND NEW.rotten_tomatoes IS NOT NULL
+        ON CONFLICT(is_star_wars) DO UPDATE SET
+            imdb_sum = imdb_sum + excluded.imdb_sum,
+            rt_sum = rt_sum + excluded.rt_sum,
+            movie_count = movie_count + 1;
+    """,
+}
+
+_AGGREGATE_REMOVE = {
+    "comics": """
+        UPDATE agg_comics_per_year SET comic_count = comic_count - 1
+        WHERE release_date = OLD.release_date;
+        DELETE FROM agg_comics_per_year WHERE comic_count <= 0;
+    """,
+    "lego_sets": """
+        UPDATE agg_lego_year SET
+            parts_sum = parts_sum - OLD.num_parts,
+            set_count = set_count - 1
+        WHERE year = OLD.year AND OLD.num_parts IS NOT NULL;
+        DELETE FROM agg_lego_year WHERE set_count <= 0;
+        UPDATE agg_lego_theme SET
+            parts_sum = parts_sum - OLD.num_parts,
+            set_count = set_count - 1
+        WHERE theme_id = OLD.theme_id AND OLD.num_parts IS NOT NULL;
+        DELETE FROM agg_lego_theme WHERE set_count <= 0;
+    """,
+    "MovieMetrics": """
+        UPDATE agg_movie_ratings SET
+            imdb_sum = imdb_sum - OLD.imdb_rating,
+            rt_sum = rt_sum - OLD.rotten_tomatoes,
+            movie_count = movie_count - 1
+        WHERE is_star_wars = OLD.is_star_wars
+          AND OLD.imdb_rating IS NOT NULL AND OLD.rotten_tomatoes IS NOT NULL;
+        DELETE FROM agg_movie_ratings WHERE movie_count <= 0;
+    """,
+}
+
+
+def add_generated_columns(conn):
+    """
+    Adds the MOVIE_GENERATED_COLUMNS that an older MovieMetrics table lacks.
+
+    New tables get them as STORED columns in CREATE TABLE. ALTER TABLE can
+    only add VIRTUAL ones, which are computed when read, but their indexes
+    store the values just the same.
+
+    RETURNS:
+        list: names of the columns added
+    """
+    existing = {row[1] for row in conn.execute("PRAGMA table_xinfo(MovieMetrics)")}
+    added = []
+    for column, expression in MOVIE_GENERATED_COLUMNS.items():
+        if column not in existing:
+            conn.execute(
+                f"ALTER TABLE MovieMetrics ADD COLUMN {column} REAL "
+                f"GENERATED ALWAYS AS ({expression}) VIRTUAL"
+            )
+            added.append(column)
+    return added
+
+
+def get_profile_name(conn):
+    """
+    Returns the performance profile recorded in the database,
+    or DEFAULT_PROFILE if none was recorded.
+    """
+    try:
+        row = conn.execute(
+            "SELECT value FROM db_settings WHERE key = 'performance_profile'"
+        ).fetchone()
+    except sqlite3.Error:
+        row = None
+    return row[0] if row else DEFAULT_PROFILE
+
+
+def apply_profile(conn, profile=None):
+    """
+    Applies a performance profile's PRAGMAs to an open connection.
+
+    ARGS:
+        conn (sqlite3.Connection): connection to configure
+        profile (str, optional): name in PERFORMANCE_PROFILES. Defaults to the
+            profile recorded in the database.
+
+    RETURNS:
+        str: name of the profile that was applied
+    """
+    if profile is None:
+        profile = get_profile_name(conn)
+    if profile not in PERFORMANCE_PROFILES:
+        raise ValueError(
+            f"Unknown profile {profile!r}, expected one of {list(PERFORMANCE_PROFILES)}"
+        )
+
+    settings = PERFORMANCE_PROFILES[profile]
+    conn.execute(f"PRAGMA journal_mode = {settings['journal_mode']}")
+    conn.execute(f"PRAGMA synchronous = {settings['synchronous']}")
+    conn.execute(f"PRAGMA cache_size = {settings['cache_size']}")
+    conn.execute(f"PRAGMA mmap_size = {settings['mmap_size']}")
+    conn.execute(f"PRAGMA temp_store = {settings['temp_store']}")
+    return profile
+
+
+def connect(filename, profile=None):
+    """
+    Opens a connection with the database's performance profile applied.
+
+    ARGS:
+        filename (str): filename of the database
+        profile (str, optional): override the recorded profile
+
+    RETURNS:
+        sqlite3.Connection
+    """
+    conn = sqlite3.connect(filename)
+    apply_profile(conn, profile)
+    return conn
+
+
+def explain_query_plans(filename, queries):
+    """
+    Runs EXPLAIN QUERY PLAN on each query and checks that it uses an index.
+
+    A query counts as using an index when none of its plan steps is a plain
+    full-table SCAN (a SCAN ... USING INDEX walks an index and is fine).
+
+    ARGS:
+        filename (str): filename of the database
+        queries (dict): {name: (sql, params)}
+
+    RETURNS:
+        dict: {name: {"plan": [plan lines], "uses_index": bool}}
+    """
+    conn = sqlite3.connect(filename)
+    results = {}
+    try:
+        for name, (sql, params) in queries.items():
+            rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+            plan = [row[3] for row in rows]
+            full_scans = [
+                line for line in plan if line.startswith("SCAN") and "INDEX" not in line
+            ]
+            results[name] = {"plan": plan, "uses_index": not full_scans}
+    finally:
+        conn.close()
+    return results
+
+
+def create_change_counters(conn):
+    """
+    Creates table_changes and the triggers that add 1 to a table's counter
+    on every row inserted, updated or deleted in it, for TRACKED_TABLES.
+    Also records a random data_id in db_settings, so a database rebuilt at
+    the same path never matches the counters of the old one. Safe to run
+    again (no commit).
+
+    ARGS:
+        conn (sqlite3.Connection): open connection
+    """
+    conn.execute(CHANGE_COUNTER_TABLE)
+    conn.execute(
+        "INSERT OR IGNORE INTO db_settings (key, value) "
+        "VALUES ('data_id', lower(hex(randomblob(8))))"
+    )
+    for table in TRACKED_TABLES:
+        conn.execute(
+            "INSERT OR IGNORE INTO table_changes (table_name, changes) VALUES (?, 0)",
+            (table,),
+        )
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_changes_{event.lower()}
+                AFTER {event} ON {table} BEGIN
+                    UPDATE table_changes SET changes = changes + 1
+                    WHERE table_name = '{table}';
+                END
+                """
+            )
+
+
+def change_version(conn, tables):
+    """
+    The database's data_id and the write counter of each table. Any
+    insert, update or delete in one of `tables` changes it.
+
+    ARGS:
+        conn (sqlite3.Connection): open connection (may be read-only)
+        tables (iterable[str]): names from TRACKED_TABLES
+
+    RETURNS:
+        list: [data_id, (table, changes), ...], or None if the database has
+        no counter for one of the tables (set up before they existed; run
+        database_setup again)
+    """
+    tables = list(tables)
+    try:
+        data_id = conn.execute(
+            "SELECT value FROM db_settings WHERE key = 'data_id'"
+        ).fetchone()
+        placeholders = ", ".join("?" for _ in tables)
+        counters = dict(
+            conn.execute(
+                "SELECT table_name, changes FROM table_changes "
+                f"WHERE table_name IN ({placeholders})",
+                tables,
+            )
+        )
+    except sqlite3.Error:
+        return None
+    if data_id is None or len(counters) != len(tables):
+        return None
+    return [data_id[0]] + [(table, counters[table]) for table in tables]
+
+
+def has_aggregate_tables(conn):
+    """
+    Returns True if the trigger-maintained aggregate tables exist.
+    """
+    names = ", ".join(f"'{table}'" for table in AGGREGATES)
+    row = conn.execute(
+        f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ({names})"
+    ).fetchone()
+    return row[0] == len(AGGREGATES)
+
+
+def rebuild_aggregates(conn):
+    """
+    Recomputes every aggregate table from the live tables (no commit).
+    """
+    for table, (key, select) in AGGREGATES.items():
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(f"INSERT INTO {table} {select}")
+
+
+def create_aggregate_tables(conn):
+    """
+    Creates the aggregate tables and their triggers, then fills them from
+    the existing rows. Safe to run again on a database that already has them.
+
+    ARGS:
+        conn (sqlite3.Connection): open connection (committed here)
+
+    RETURNS:
+        None
+    """
+    for table in AGGREGATE_TABLES:
+        conn.execute(table)
+
+    for source in _AGGREGATE_ADD:
+        add = _AGGREGATE_ADD[source]
+        remove = _AGGREGATE_REMOVE[source]
+        triggers = {
+            f"trg_{source}_agg_insert": f"AFTER INSERT ON {source} BEGIN {add} END",
+            f"trg_{source}_agg_delete": f"AFTER DELETE ON {source} BEGIN {remove} END",
+            f"trg_{source}_agg_update": (
+                f"AFTER UPDATE ON {source} BEGIN {remove} {add} END"
+            ),
+        }
+        for name, body in triggers.items():
+            conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+    rebuild_aggregates(conn)
+    conn.commit()
+
+
+def check_aggregates(filename, repair=False, tolerance=1e-6):
+    """
+    Consistency check: recomputes every aggregate from the live tables and
+    compares it with what the triggers have stored.
+
+    ARGS:
+        filename (str): filename of the database
+        repair (bool): rebuild the aggregate tables (or create them if
+            missing) if they don't match
+        tolerance (float): allowed difference for the REAL rating sums
+
+    RETURNS:
+        list[str]: one line per mismatching group (empty if consistent)
+    """
+    conn = sqlite3.connect(filename)
+    problems = []
+    try:
+        if not has_aggregate_tables(conn):
+            if repair:
+                create_aggregate_tables(conn)
+            return ["aggregate tables do not exist"]
+
+        for table, (key, select) in AGGREGATES.items():
+            expected = {row[0]: row[1:] for row in conn.execute(select)}
+            stored = {
+                row[0]: row[1:]
+                for row in conn.execute(f"SELECT * FROM {table} ORDER BY {key}")
+            }
+
+            for group in sorted(set(expected) | set(stored), key=str):
+                want = expected.get(group)
+                have = stored.get(group)
+                if want is None or have is None:
+                    problems.append(f"{table}[{group}]: expected {want}, stored {have}")
+                elif any(abs(w - h) > tolerance for w, h in zip(want, have)):
+                    problems.append(f"{table}[{group}]: expected {want}, stored {have}")
+
+        if problems and repair:
+            rebuild_aggregates(conn)
+            conn.commit()
+    finally:
+        conn.close()
+    return problems
+
+
+def database_setup(filename, profile=DEFAULT_PROFILE, aggregates=False):
     """
     Generates database if it doesn't exist and then creates all tables.
 
     ARGS:
         filename (str): filename of the database to create
+        profile (str, optional): performance profile from PERFORMANCE_PROFILES
+            to apply and record in the database
+        aggregates (bool, optional): also create the trigger-maintained
+            aggregate tables (see create_aggregate_tables)
 
     RETURNS:
         None
     """
+    if profile not in PERFORMANCE_PROFILES:
+        raise ValueError(
+            f"Unknown profile {profile!r}, expected one of {list(PERFORMANCE_PROFILES)}"
+        )
+
     conn = sqlite3.connect(filename)
     cursor = conn.cursor()
 
@@ -40,15 +562,20 @@ def database_setup(filename):
         )
     """
 
-    table_3 = """
+    generated_columns = ",\n".join(
+        f"            {column} REAL GENERATED ALWAYS AS ({expression}) STORED"
+        for column, expression in MOVIE_GENERATED_COLUMNS.items()
+    )
+    table_3 = f"""
          CREATE TABLE IF NOT EXISTS MovieMetrics (
             imdb_id TEXT PRIMARY KEY,
             title TEXT NOT NULL,
             box_office INTEGER,
             imdb_rating REAL,
             rotten_tomatoes INTEGER,
-            is_star_wars INTEGER DEFAULT 0
-        )   
+            is_star_wars INTEGER DEFAULT 0,
+{generated_columns}
+        )
     """
 
     # Table 5: Media types
@@ -59,17 +586,98 @@ def database_setup(filename):
             release_date INTEGER
         )
     """
+    # Settings stored with the database (e.g. the performance profile)
+    settings_table = """
+        CREATE TABLE IF NOT EXISTS db_settings (
+            key   TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """
+
     # Parent tables
     cursor.execute(table_1)
     cursor.execute(table_2)
     cursor.execute(table_0)
     cursor.execute(table_3)
     cursor.execute(table_5)  # Create Comic Table
+    cursor.execute(settings_table)
+    cursor.execute(COLLECTION_STATE_TABLE)
+    create_change_counters(conn)
+
+    # Tables created before the generated columns existed
+    add_generated_columns(conn)
+
+    for index in INDEXES:
+        cursor.execute(index)
+
+    cursor.execute(
+        "INSERT OR REPLACE INTO db_settings (key, value) VALUES ('performance_profile', ?)",
+        (profile,),
+    )
 
     conn.commit()  # save the changes
+
+    if aggregates:
+        create_aggregate_tables(conn)
+
+    # journal_mode can't change inside a transaction, so apply after commit
+    apply_profile(conn, profile)
+    conn.execute("PRAGMA optimize")
+
     conn.close()  # close the connection
-    print("Database setup complete")
+    print(f"Database setup complete (profile: {profile})")
 
 
 if __name__ == "__main__":
-    database_setup(filename="starwars.db")
+    parser = argparse.ArgumentParser(description="Create the starwars.db tables")
+    parser.add_argument(
+        "--profile",
+        choices=sorted(PERFORMANCE_PROFILES),
+        default=DEFAULT_PROFILE,
+        help="SQLite performance profile to apply and record",
+    )
+    parser.add_argument(
+        "--check-plans",
+        action="store_true",
+        help="EXPLAIN every calculation query and fail if one does a full table scan",
+    )
+    parser.add_argument(
+        "--aggregates",
+        action="store_true",
+        help="create trigger-maintained aggregate tables for the calculations",
+    )
+    parser.add_argument(
+        "--check-aggregates",
+        action="store_true",
+        help="compare the aggregate tables with the live tables and report any "
+        "difference (checked before setup touches them)",
+    )
+    parser.add_argument(
+        "--repair-aggregates",
+        action="store_true",
+        help="with --check-aggregates, rebuild the aggregate tables if they differ",
+    )
+    args = parser.parse_args()
+
+    # Check first: setup with --aggregates rebuilds the tables, which would
+    # hide any drift
+    if args.check_aggregates:
+        problems = check_aggregates("starwars.db", repair=args.repair_aggregates)
+        for problem in problems:
+            print(problem)
+        if problems and args.repair_aggregates:
+            print(f"Rebuilt the aggregate tables ({len(problems)} groups were off).")
+        elif problems:
+            raise SystemExit(f"{len(problems)} aggregate groups are out of date.")
+        else:
+            print("Aggregate tables match the live tables.")
+
+    database_setup(
+        filename="starwars.db", profile=args.profile, aggregates=args.aggregates
+    )
+
+    if args.check_plans:
+        from calculations import check_query_plans
+
+        if check_query_plans("starwars.db"):
+            raise SystemExit("Some calculation queries do not use an index.")
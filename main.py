@@ -0,0 +1,287 @@
+"""
+main.py
+Purpose: One command-line front end for the whole project
+
+    python main.py setup [--profile fast] [--aggregates]
+    python main.py collect omdb|lego|wookieepedia|all
+    python main.py calc [--columnar]
+    python main.py plot [--batch] [--force]
+    python main.py status
+
+Each subcommand imports only the modules it needs, inside its handler, so
+`status` doesn't load matplotlib or NumPy and `calc` doesn't load the
+collectors' HTTP and HTML libraries. Run
+benchmarks/bench_import_time.py to see what each subcommand imports and
+how long it takes to start.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+from database_setup import DEFAULT_PROFILE, PERFORMANCE_PROFILES
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The report and chart files `status` looks for
+REPORT_FILES = (
+    "calculation_results.txt",
+    "calculation_results.json",
+    "calculation_results.csv",
+)
+CHARTS_DIR = "visualizations"
+
+# collect source -> its name in collection_state
+CURSOR_SOURCES = {"omdb": "omdb", "lego": "rebrickable", "wookieepedia": "wookieepedia"}
+
+
+def cmd_setup(args):
+    from database_setup import database_setup
+
+    database_setup(args.db, profile=args.profile, aggregates=args.aggregates)
+
+
+def cmd_collect(args):
+    sys.path.insert(0, os.path.join(ROOT_DIR, "collection_files"))
+
+    def collect_omdb():
+        from collect_omdb import insert_into_database
+
+        return insert_into_database(
+            limit=args.limit, concurrent=True, db_filename=args.db
+        )
+
+    def collect_lego():
+        from collect_lego import insert_lego_sets
+
+        return insert_lego_sets(limit=args.limit, db_filename=args.db)
+
+    def collect_wookieepedia():
+        from collect_wookiepedia import collect_comics, scrape
+
+        return scrape(collect_comics(), args.db, limit=args.limit)
+
+    collectors = {
+        "omdb": collect_omdb,
+        "lego": collect_lego,
+        "wookieepedia": collect_wookieepedia,
+    }
+    sources = collectors if args.source == "all" else [args.source]
+    if args.restart:
+        from collection_state import clear_cursors
+
+        conn = sqlite3.connect(args.db)
+        try:
+            for source in sources:
+                clear_cursors(conn, CURSOR_SOURCES[source])
+        finally:
+            conn.close()
+    for source in sources:
+        print(f"\n--- Collecting {source} ---")
+        added = collectors[source]()
+        print(f"{source}: {added} new rows")
+
+    from http_cache import get_cache
+
+    get_cache().report()
+
+
+def cmd_calc(args):
+    from calculations import run_calculations
+
+    run_calculations(args.db, args.report, columnar=args.columnar)
+
+
+def cmd_plot(args):
+    if not args.show:
+        # No windows, so skip loading an interactive GUI backend
+        os.environ.setdefault("MPLBACKEND", "Agg")
+    from visualizations import CHARTS, OUTPUT_DIR, render_all, render_chart
+
+    if args.batch:
+        render_all(
+            args.db,
+            dpi=args.dpi,
+            fmt=args.format,
+            workers=args.workers,
+            force=args.force,
+        )
+        return
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    for name in CHARTS:
+        status = render_chart(
+            name,
+            args.db,
+            dpi=args.dpi,
+            fmt=args.format,
+            show=args.show,
+            force=args.force,
+        )
+        print(f"{name:<32} {status}")
+
+
+def _ago(timestamp):
+    seconds = time.time() - timestamp
+    if seconds < 120:
+        return f"{seconds:.0f}s ago"
+    if seconds < 7200:
+        return f"{seconds / 60:.0f}m ago"
+    if seconds < 172800:
+        return f"{seconds / 3600:.0f}h ago"
+    return f"{seconds / 86400:.0f}d ago"
+
+
+def cmd_status(args):
+    """Row counts, settings and outputs, read with sqlite3 alone."""
+    if not os.path.exists(args.db):
+        print(f"{args.db} does not exist yet, run: python main.py setup")
+        return
+
+    from urllib.parse import quote
+
+    from database_setup import get_profile_name, has_aggregate_tables
+
+    # Plain sqlite3, not connections.get_connection: no profile lookup needed.
+    # Quoted like connections.open_read_only, so "?" or "#" in the path
+    # isn't read as part of the URI
+    path = os.path.abspath(args.db)
+    conn = sqlite3.connect(f"file:{quote(path)}?mode=ro", uri=True)
+    try:
+        tables = [
+            row[0]
+            for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' "
+                "AND name NOT LIKE 'sqlite_%' ORDER BY name"
+            )
+        ]
+        print(f"Database: {args.db} ({os.path.getsize(args.db) / 1024:.0f} KiB)")
+        print(f"Profile:  {get_profile_name(conn)}")
+        print(f"Aggregate tables: {'yes' if has_aggregate_tables(conn) else 'no'}")
+
+        print(f"\n{'Table':<28} {'Rows':>10}")
+        print("-" * 39)
+        for table in tables:
+            rows = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+            print(f"{table:<28} {rows:>10}")
+
+        if "pipeline_state" in tables:
+            print(f"\n{'Pipeline stage':<28} {'Last run':>10} {'Time (s)':>9}")
+            print("-" * 49)
+            for stage, finished_at, seconds in conn.execute(
+                "SELECT stage, finished_at, seconds FROM pipeline_state ORDER BY stage"
+            ):
+                print(f"{stage:<28} {_ago(finished_at):>10} {seconds:>9.2f}")
+
+        if "collection_state" in tables:
+            print(f"\n{'Collector cursor':<28} {'Updated':>10}  Position")
+            print("-" * 70)
+            for source, key, value, updated_at in conn.execute(
+                "SELECT source, key, value, updated_at FROM collection_state "
+                "ORDER BY source, key"
+            ):
+                shown = value if len(value) <= 40 else value[:37] + "..."
+                print(f"{source + ' ' + key:<28} {_ago(updated_at):>10}  {shown}")
+    finally:
+        conn.close()
+
+    print("\nOutputs:")
+    for path in REPORT_FILES:
+        if os.path.exists(path):
+            print(f"  {path:<36} {_ago(os.path.getmtime(path))}")
+        else:
+            print(f"  {path:<36} missing")
+    charts = []
+    if os.path.isdir(CHARTS_DIR):
+        charts = [
+            name
+            for name in sorted(os.listdir(CHARTS_DIR))
+            if not name.endswith(".sha256")
+        ]
+    print(f"  {CHARTS_DIR + '/':<36} {len(charts)} charts")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Star Wars comparison project")
+    parser.add_argument("--db", default="starwars.db", help="database filename")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    setup = subparsers.add_parser("setup", help="create the tables and indexes")
+    setup.add_argument(
+        "--profile",
+        choices=sorted(PERFORMANCE_PROFILES),
+        default=DEFAULT_PROFILE,
+        help="SQLite performance profile to apply and record",
+    )
+    setup.add_argument(
+        "--aggregates",
+        action="store_true",
+        help="create trigger-maintained aggregate tables for the calculations",
+    )
+    setup.set_defaults(handler=cmd_setup)
+
+    collect = subparsers.add_parser("collect", help="run the data collectors")
+    collect.add_argument(
+        "source",
+        nargs="?",
+        choices=("omdb", "lego", "wookieepedia", "all"),
+        default="all",
+    )
+    collect.add_argument(
+        "--limit", type=int, default=25, help="new rows per collector (rubric: 25)"
+    )
+    collect.add_argument(
+        "--restart",
+        action="store_true",
+        help="forget where the last runs stopped and start from the beginning",
+    )
+    collect.set_defaults(handler=cmd_collect)
+
+    calc = subparsers.add_parser("calc", help="run the calculations and reports")
+    calc.add_argument("--report", default="calculation_results.txt")
+    calc.add_argument(
+        "--columnar",
+        action="store_true",
+        help="compute the movie results with NumPy arrays instead of SQL",
+    )
+    calc.set_defaults(handler=cmd_calc)
+
+    plot = subparsers.add_parser("plot", help="render the charts")
+    plot.add_argument(
+        "--batch",
+        action="store_true",
+        help="render all charts in parallel processes",
+    )
+    plot.add_argument(
+        "--show", action="store_true", help="open each chart in a plot window"
+    )
+    plot.add_argument("--dpi", type=int, default=300, help="output resolution")
+    plot.add_argument(
+        "--format", default="png", help="image format, e.g. png, svg or pdf"
+    )
+    plot.add_argument(
+        "--workers", type=int, default=None, help="processes used with --batch"
+    )
+    plot.add_argument(
+        "--force",
+        action="store_true",
+        help="re-render charts even if their data and settings are unchanged",
+    )
+    plot.set_defaults(handler=cmd_plot)
+
+    status = subparsers.add_parser(
+        "status", help="show row counts, settings and outputs"
+    )
+    status.set_defaults(handler=cmd_status)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+movie_columns.py
+Purpose: Columnar (NumPy) versions of the movie calculations
+
+MovieMetrics is read once into arrays (imdb, rt, Star Wars mask) and the
+rating differences, group averages and top-k lists are computed as array
+operations instead of a Python loop per movie.
+Every method returns the same structure as the matching calculate_*
+function in calculations.py. Ties are broken by title.
+"""
+
+import gc
+from contextlib import contextmanager
+from itertools import compress
+
+import numpy as np
+
+from connections import get_connection
+
+# Covered by idx_movies_title_ratings, so the table itself is never read
+MOVIE_COLUMNS_QUERY = """
+    SELECT title, imdb_rating, rotten_tomatoes, is_star_wars
+    FROM MovieMetrics
+    ORDER BY title ASC
+"""
+
+
+@contextmanager
+def _gc_paused():
+    # Building millions of tuples and dicts keeps triggering the cyclic
+    # garbage collector, although none of them can form a cycle
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def top_k(values, valid, k):
+    """
+    Indexes of the k largest values, largest first.
+
+    argpartition finds the top k without sorting every row. Rows tied with
+    the k-th value are taken in index (title) order, so the result is the
+    same as a stable sort.
+
+    Args:
+        values (np.ndarray): scores
+        valid (np.ndarray): boolean mask of rows that may be picked
+        k (int): how many to return
+
+    Returns:
+        np.ndarray: row indexes
+    """
+    candidates = np.flatnonzero(valid)
+    if candidates.size > k > 0:
+        scores = values[candidates]
+        kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+        above = candidates[scores > kth]
+        tied = candidates[scores == kth][: k - above.size]
+        candidates = np.concatenate([above, tied])
+    elif k <= 0:
+        candidates = candidates[:0]
+    order = np.lexsort((candidates, -values[candidates]))
+    return candidates[order]
+
+
+class MovieColumns:
+    """
+    MovieMetrics loaded as columns.
+
+        titles:        sequence of titles (sorted)
+        imdb:          float array, IMDb rating out of 10, NaN when missing
+        rt:            float array, Rotten Tomatoes %, NaN when missing
+        is_star_wars:  int array (1/0, -1 when missing)
+
+    The raw rt and is_star_wars values are kept too, so results
+    hold the same Python ints the SQL versions return.
+    """
+
+    def __init__(self, titles, imdb, rt, is_star_wars):
+        self.titles = titles
+        self.rt_values = rt
+        self.star_wars_values = is_star_wars
+
+        # None becomes NaN in a float array
+        self.imdb = np.array(imdb, dtype=float)
+        self.rt = np.array(self.rt_values, dtype=float)
+        # NULL matches neither group, like "is_star_wars = ?" in SQL
+        self.is_star_wars = np.nan_to_num(
+            np.array(is_star_wars, dtype=float), nan=-1
+        ).astype(np.int8)
+
+        self.has_imdb = ~np.isnan(self.imdb)
+        self.has_rt = ~np.isnan(self.rt)
+        self.has_both = self.has_imdb & self.has_rt
+        self.imdb_normalized = self.imdb * 10
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Builds the columns from MOVIE_COLUMNS_QUERY rows."""
+        if not rows:
+            return cls([], [], [], [])
+        with _gc_paused():
+            return cls(*zip(*rows))
+
+    @classmethod
+    def load(cls, db_filename="starwars.db"):
+        """
+        Reads MovieMetrics with one query.
+
+        Args:
+            db_filename (str): filename of the database
+        """
+        with _gc_paused():
+            rows = get_connection(db_filename).execute(MOVIE_COLUMNS_QUERY).fetchall()
+        return cls.from_rows(rows)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def rating_differences(self):
+        """Same result as calculations.calculate_rating_differences."""
+        # The arithmetic is vectorized; what's left is building one dict per
+        # movie, done with zip/compress rather than indexing row by row
+        difference = self.imdb_normalized - self.rt
+        rows = compress(
+            zip(
+                self.titles,
+                self.imdb_normalized.tolist(),
+                self.rt_values,
+                difference.tolist(),
+                self.star_wars_values,
+            ),
+            self.has_both.tolist(),
+        )
+        with _gc_paused():
+            return {
+                title: {
+                    "imdb": imdb,
+                    "rt": rt,
+                    "difference": diff,
+                    "is_star_wars": is_star_wars,
+                }
+                for title, imdb, rt, diff, is_star_wars in rows
+            }
+
+    def average_ratings(self):
+        """Same result as calculations.calculate_average_ratings_comparison."""
+
+        def averages(mask):
+            count = int(mask.sum())
+            if not count:
+                return {"imdb": 0, "rt": 0, "count": 0}
+            return {
+                "imdb": float(self.imdb[mask].mean() * 10),
+                "rt": float(self.rt[mask].mean()),
+                "count": count,
+            }
+
+        star_wars = self.is_star_wars == 1
+        return {
+            "star_wars": averages(self.has_both & star_wars),
+            "other_movies": averages(self.has_both & (self.is_star_wars == 0)),
+        }
+
+    def _movie(self, row):
+        return {
+            "title": self.titles[row],
+            "imdb": float(self.imdb_normalized[row]) if self.has_imdb[row] else None,
+            "rt": self.rt_values[row],
+            "is_star_wars": self.star_wars_values[row],
+        }
+
+    def top_rated(self, limit=10):
+        """Same result as calculations.calculate_top_rated_movies."""
+        return {
+            "top_by_imdb": [
+                self._movie(row) for row in top_k(self.imdb, self.has_imdb, limit)
+            ],
+            "top_by_rt": [
+                self._movie(row) for row in top_k(self.rt, self.has_rt, limit)
+            ],
+        }
@@ -0,0 +1,424 @@
+"""
+pipeline.py
+Purpose: Run the whole project (setup -> collectors -> calculations -> charts)
+
+The steps from the README are modelled as a small DAG:
+
+    setup -> collect_omdb, collect_lego, collect_wookieepedia (in parallel)
+          -> calculations, visualizations (in parallel)
+
+Stages whose dependencies are all done run at the same time on a thread pool.
+Setup, calculations and visualizations are skipped when their inputs (the
+schema or the tables' write counters, plus the stage's own code) have the same
+fingerprint as at their last successful run and their outputs still exist.
+Fingerprints are kept in a pipeline_state table in the database.
+
+With --until-complete each collector is re-run until a run adds no new rows,
+instead of running the scripts five times by hand.
+
+Usage:
+    python pipeline.py
+    python pipeline.py --until-complete --max-runs 20
+    python pipeline.py --only calculations visualizations --force
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT_DIR, "collection_files"))
+
+from database_setup import change_version
+from report import report_filenames
+from tracing import span
+
+# Tables the calculations and charts read
+DATA_TABLES = ("comics", "lego_sets", "lego_set_names", "lego_themes", "MovieMetrics")
+
+
+@dataclass
+class Stage:
+    """
+    One step of the pipeline.
+
+        name:        unique stage name
+        run:         callable doing the work, returns a short result (e.g. rows added)
+        deps:        stages that must succeed first
+        fingerprint: callable returning a string describing the stage's
+                     inputs, or None to always run the stage
+        outputs:     files the stage must have produced to count as up to date
+    """
+
+    name: str
+    run: Callable
+    deps: tuple = ()
+    fingerprint: Optional[Callable] = None
+    outputs: tuple = field(default_factory=tuple)
+
+
+def _hash(value):
+    return hashlib.sha256(json.dumps(value, default=str).encode("utf-8")).hexdigest()
+
+
+def file_hash(*paths):
+    """sha256 of some source files, so code changes re-run a stage."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(os.path.join(ROOT_DIR, path), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def schema_fingerprint(db_filename):
+    """Hash of every CREATE statement in the database."""
+    if not os.path.exists(db_filename):
+        return None
+    conn = sqlite3.connect(db_filename)
+    try:
+        rows = conn.execute(
+            "SELECT type, name, sql FROM sqlite_master "
+            "WHERE name != 'pipeline_state' AND name NOT LIKE 'sqlite_%' "
+            "ORDER BY type, name"
+        ).fetchall()
+    finally:
+        conn.close()
+    return _hash(rows)
+
+
+def data_fingerprint(db_filename, tables=DATA_TABLES):
+    """
+    Hash of the tables' write counters (see database_setup.change_version),
+    so any insert, update or delete changes it. None if the database has no
+    counters, which makes the stages reading it always run.
+    """
+    conn = sqlite3.connect(db_filename)
+    try:
+        version = change_version(conn, tables)
+    finally:
+        conn.close()
+    return None if version is None else _hash(version)
+
+
+def combine_fingerprints(*parts):
+    """Hash of several fingerprint parts; None if any of them is None."""
+    if any(part is None for part in parts):
+        return None
+    return _hash(list(parts))
+
+
+def _ensure_state_table(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS pipeline_state (
+            stage       TEXT PRIMARY KEY,
+            fingerprint TEXT,
+            finished_at REAL,
+            seconds     REAL
+        )
+        """
+    )
+
+
+def load_fingerprint(db_filename, stage):
+    if not os.path.exists(db_filename):
+        return None
+    conn = sqlite3.connect(db_filename)
+    try:
+        _ensure_state_table(conn)
+        row = conn.execute(
+            "SELECT fingerprint FROM pipeline_state WHERE stage = ?", (stage,)
+        ).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+
+def save_fingerprint(db_filename, stage, fingerprint, seconds):
+    conn = sqlite3.connect(db_filename)
+    try:
+        with conn:
+            _ensure_state_table(conn)
+            conn.execute(
+                """
+                INSERT INTO pipeline_state (stage, fingerprint, finished_at, seconds)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(stage) DO UPDATE SET
+                    fingerprint = excluded.fingerprint,
+                    finished_at = excluded.finished_at,
+                    seconds = excluded.seconds
+                """,
+                (stage, fingerprint, time.time(), seconds),
+            )
+    finally:
+        conn.close()
+
+
+def repeat_until_exhausted(collect, max_runs, pause=0.0):
+    """
+    Calls a collector until a run adds nothing (or max_runs is reached).
+
+    Args:
+        collect (callable): returns the number of rows added
+        max_runs (int): upper bound on the number of runs
+        pause (float): seconds to wait between runs
+
+    Returns:
+        int: total rows added
+    """
+    total = 0
+    for run in range(max_runs):
+        if run and pause:
+            time.sleep(pause)
+        added = collect()
+        total += added
+        if not added:
+            break
+    return total
+
+
+def build_stages(args):
+    """Returns the project's stages, in dependency order."""
+    db = args.db
+    runs = args.max_runs if args.until_complete else 1
+
+    def collector(collect):
+        return lambda: repeat_until_exhausted(collect, runs, args.pause)
+
+    def setup():
+        from database_setup import database_setup, get_profile_name
+
+        # Keep whatever profile was chosen with database_setup.py --profile
+        conn = sqlite3.connect(db)
+        try:
+            profile = get_profile_name(conn)
+        finally:
+            conn.close()
+        database_setup(db, profile=profile)
+
+    def collect_omdb():
+        from collect_omdb import insert_into_database
+
+        return insert_into_database(limit=25, concurrent=True, db_filename=db)
+
+    def collect_lego():
+        from collect_lego import insert_lego_sets
+
+        return insert_lego_sets(limit=25, db_filename=db)
+
+    def collect_wookieepedia():
+        from collect_wookiepedia import collect_comics, scrape
+
+        return scrape(collect_comics(), db, limit=25)
+
+    def calculations():
+        from calculations import run_calculations
+
+        run_calculations(db, args.report)
+
+    def visualizations():
+        from visualizations import render_all
+
+        results = render_all(
+            db, args.charts_dir, dpi=args.dpi, fmt=args.format, force=args.force
+        )
+        rendered = sum(status == "rendered" for status, _ in results.values())
+        return f"{rendered} charts rendered"
+
+    def chart_outputs():
+        from visualizations import CHARTS
+
+        return tuple(
+            os.path.join(args.charts_dir, f"{name}.{args.format}") for name in CHARTS
+        )
+
+    collectors = ("collect_omdb", "collect_lego", "collect_wookieepedia")
+    return [
+        Stage(
+            "setup",
+            setup,
+            fingerprint=lambda: combine_fingerprints(
+                schema_fingerprint(db), file_hash("database_setup.py")
+            ),
+            outputs=(db,),
+        ),
+        Stage("collect_omdb", collector(collect_omdb), deps=("setup",)),
+        Stage("collect_lego", collector(collect_lego), deps=("setup",)),
+        Stage("collect_wookieepedia", collector(collect_wookieepedia), deps=("setup",)),
+        Stage(
+            "calculations",
+            calculations,
+            deps=collectors,
+            fingerprint=lambda: combine_fingerprints(
+                data_fingerprint(db),
+                file_hash(
+                    "calculations.py",
+                    "analytics.py",
+                    "report.py",
+                    "result_cache.py",
+                ),
+                args.report,
+            ),
+            outputs=tuple(report_filenames(args.report).values()),
+        ),
+        Stage(
+            "visualizations",
+            visualizations,
+            deps=collectors,
+            fingerprint=lambda: combine_fingerprints(
+                data_fingerprint(db),
+                file_hash("visualizations.py", "calculations.py"),
+                args.dpi,
+                args.format,
+            ),
+            outputs=chart_outputs(),
+        ),
+    ]
+
+
+def run_stage(stage, db_filename, force):
+    """
+    Runs one stage unless its inputs are unchanged.
+
+    Returns:
+        tuple: (status, seconds, result) where status is "ran" or "skipped"
+    """
+    start = time.perf_counter()
+    fingerprint = stage.fingerprint() if stage.fingerprint else None
+    up_to_date = (
+        not force
+        and fingerprint is not None
+        and all(os.path.exists(path) for path in stage.outputs)
+        and load_fingerprint(db_filename, stage.name) == fingerprint
+    )
+    if up_to_date:
+        return "skipped", time.perf_counter() - start, None
+
+    with span(f"stage.{stage.name}"):
+        result = stage.run()
+    seconds = time.perf_counter() - start
+
+    if stage.fingerprint:
+        # Fingerprint again: e.g. setup changes the schema it fingerprints
+        save_fingerprint(db_filename, stage.name, stage.fingerprint(), seconds)
+    return "ran", seconds, result
+
+
+def run_pipeline(stages, db_filename, force=False, max_workers=4):
+    """
+    Runs the stages as a DAG: every stage starts as soon as all of its
+    dependencies succeeded. Stages depending on a failed stage are blocked.
+
+    Returns:
+        dict: {stage name: (status, seconds, result or error)}
+    """
+    by_name = {stage.name: stage for stage in stages}
+    results = {}
+    pending = dict(by_name)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                statuses = [results.get(dep, (None,))[0] for dep in stage.deps]
+                if any(status in ("failed", "blocked") for status in statuses):
+                    results[name] = ("blocked", 0.0, None)
+                    del pending[name]
+                elif all(status in ("ran", "skipped") for status in statuses):
+                    print(f"[pipeline] starting {name}")
+                    running[executor.submit(run_stage, stage, db_filename, force)] = (
+                        name
+                    )
+                    del pending[name]
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except BaseException as e:
+                    # collect_comics() calls exit() on network errors
+                    results[name] = ("failed", 0.0, e)
+                print(f"[pipeline] {name}: {results[name][0]}")
+
+    return results
+
+
+def select_stages(stages, only):
+    """
+    Keeps just the stages named in `only`. Dependencies on stages that are
+    left out are dropped, so the kept stages don't wait for them.
+    """
+    return [
+        Stage(
+            s.name,
+            s.run,
+            tuple(d for d in s.deps if d in only),
+            s.fingerprint,
+            s.outputs,
+        )
+        for s in stages
+        if s.name in only
+    ]
+
+
+def print_summary(results):
+    print(f"\n{'Stage':<24} {'Status':<9} {'Time (s)':>9}  Result")
+    print("-" * 60)
+    for name, (status, seconds, result) in results.items():
+        shown = "" if result is None else result
+        if isinstance(result, BaseException):
+            shown = f"{type(result).__name__}: {result}"
+        print(f"{name:<24} {status:<9} {seconds:>9.2f}  {shown}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the whole project pipeline")
+    parser.add_argument("--db", default="starwars.db", help="database filename")
+    parser.add_argument(
+        "--until-complete",
+        action="store_true",
+        help="re-run each collector until a run adds no new rows",
+    )
+    parser.add_argument(
+        "--max-runs", type=int, default=50, help="run cap for --until-complete"
+    )
+    parser.add_argument(
+        "--pause", type=float, default=0.0, help="seconds between collector runs"
+    )
+    parser.add_argument(
+        "--only", nargs="+", metavar="STAGE", help="run just these stages"
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="run stages even if unchanged"
+    )
+    parser.add_argument("--report", default="calculation_results.txt")
+    parser.add_argument("--charts-dir", default="visualizations")
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--format", default="png")
+    args = parser.parse_args()
+
+    stages = build_stages(args)
+    if args.only:
+        unknown = set(args.only) - {stage.name for stage in stages}
+        if unknown:
+            parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+        stages = select_stages(stages, args.only)
+
+    results = run_pipeline(stages, args.db, force=args.force)
+    print_summary(results)
+    if any(status in ("failed", "blocked") for status, _, _ in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+report.py
+Purpose: Render every calculation once as a text, JSON and CSV report
+
+All three formats are rendered from the same AnalyticsSnapshot
+(analytics.build_snapshot), so nothing is queried or computed twice. Each
+file is built in memory and written in one go through a temp file that
+replaces the old report, so a reader never sees a half-written report and
+the sections can't end up out of order.
+
+    calculation_results.txt   the human-readable report
+    calculation_results.json  every section as JSON
+    calculation_results.csv   one row per value: section, key, metric, value
+
+A report whose content didn't change is left untouched.
+"""
+
+import csv
+import io
+import json
+import os
+import tempfile
+from collections.abc import Mapping
+
+REPORT_FORMATS = ("txt", "json", "csv")
+
+
+def format_comic_data(data):
+    """Comics per year section of the text report."""
+    f = io.StringIO()
+    f.write("Star Wars Comics Released Per Year\n")
+    f.write("================================\n")
+    # Iterate through the dictionary to write clear lines
+    for year, count in data.items():
+        f.write(f"Year: {year} | Comics Released: {count}\n")
+    return f.getvalue()
+
+
+def format_omdb_calculations(snapshot):
+    """Movie ratings section of the text report."""
+    f = io.StringIO()
+    f.write("\n\n")
+    f.write("=" * 70 + "\n")
+    f.write("STAR WARS vs ALL OTHER MOVIES - RATING ANALYSIS\n")
+    f.write("=" * 70 + "\n\n")
+
+    # CALCULATION 1: Average ratings comparison
+    f.write("AVERAGE RATINGS COMPARISON\n")
+    f.write("-" * 70 + "\n")
+
+    averages = snapshot.average_ratings
+
+    f.write(f"Star Wars Movies ({averages['star_wars']['count']} total):\n")
+    f.write(
+        f"  Average IMDb Rating:           {averages['star_wars']['imdb']:.1f}/100\n"
+    )
+    f.write(
+        f"  Average Rotten Tomatoes Score: {averages['star_wars']['rt']:.1f}/100\n\n"
+    )
+
+    f.write(f"Other Movies ({averages['other_movies']['count']} total):\n")
+    f.write(
+        f"  Average IMDb Rating:           {averages['other_movies']['imdb']:.1f}/100\n"
+    )
+    f.write(
+        f"  Average Rotten Tomatoes Score: {averages['other_movies']['rt']:.1f}/100\n\n"
+    )
+
+    # Calculate differences
+    imdb_diff = averages["star_wars"]["imdb"] - averages["other_movies"]["imdb"]
+    rt_diff = averages["star_wars"]["rt"] - averages["other_movies"]["rt"]
+
+    f.write("Comparison:\n")
+    f.write(f"  Star Wars IMDb is {abs(imdb_diff):.1f} points ")
+    f.write("HIGHER\n" if imdb_diff > 0 else "LOWER\n")
+    f.write(f"  Star Wars RT is {abs(rt_diff):.1f} points ")
+    f.write("HIGHER\n" if rt_diff > 0 else "LOWER\n")
+
+    # CALCULATION 2: Rating differences for Star Wars only
+    f.write("\n\n")
+    f.write("STAR WARS MOVIES - CRITIC vs AUDIENCE AGREEMENT\n")
+    f.write("-" * 70 + "\n")
+    f.write(f"{'Movie Title':<45} {'IMDb':<8} {'RT':<8} {'Diff':<8}\n")
+    f.write("-" * 70 + "\n")
+
+    all_diffs = snapshot.rating_differences
+    sw_diffs = {k: v for k, v in all_diffs.items() if v["is_star_wars"]}
+
+    for title, data in sorted(sw_diffs.items()):
+        short_title = title[:42] + "..." if len(title) > 42 else title
+        f.write(
+            f"{short_title:<45} "
+            f"{data['imdb']:>6.1f}  "
+            f"{data['rt']:>6.1f}  "
+            f"{data['difference']:>+6.1f}\n"
+        )
+
+    # CALCULATION 3: Top movies ranking
+    f.write("\n\n")
+    f.write("TOP 10 HIGHEST RATED MOVIES (ALL MOVIES)\n")
+    f.write("-" * 70 + "\n")
+
+    top_movies = snapshot.top_rated_movies
+
+    f.write("By IMDb Rating:\n")
+    for i, movie in enumerate(top_movies["top_by_imdb"], 1):
+        marker = "[STAR WARS]" if movie["is_star_wars"] else "[Other]    "
+        short_title = (
+            movie["title"][:40] + "..." if len(movie["title"]) > 40 else movie["title"]
+        )
+        f.write(f"{i:2}. {marker} {short_title:<43} {movie['imdb']:.1f}\n")
+
+    f.write("\nBy Rotten Tomatoes Score:\n")
+    for i, movie in enumerate(top_movies["top_by_rt"], 1):
+        marker = "[STAR WARS]" if movie["is_star_wars"] else "[Other]    "
+        short_title = (
+            movie["title"][:40] + "..." if len(movie["title"]) > 40 else movie["title"]
+        )
+        f.write(f"{i:2}. {marker} {short_title:<43} {movie['rt']:.0f}\n")
+
+    f.write("\n" + "=" * 70 + "\n")
+    return f.getvalue()
+
+
+def format_lego_calculations(snapshot):
+    """LEGO complexity section of the text report."""
+    f = io.StringIO()
+    f.write("\n\n")
+    f.write("=" * 70 + "\n")
+    f.write("LEGO SET COMPLEXITY ANALYSIS\n")
+    f.write("=" * 70 + "\n\n")
+
+    # CALCULATION 1: Average complexity by year
+    f.write("AVERAGE LEGO COMPLEXITY BY YEAR\n")
+    f.write("-" * 70 + "\n")
+
+    complexity = snapshot.lego_complexity_by_year
+    if not complexity:
+        f.write("No Lego data available in the database.\n\n")
+    else:
+        for year, avg_parts in sorted(complexity.items()):
+            f.write(f"Year: {year:<6} | Average Pieces per Set: {avg_parts:6.1f}\n")
+
+    # CALCULATION 2: Top most complex Lego sets
+    f.write("\nTOP MOST COMPLEX LEGO SETS (BY PART COUNT)\n")
+    f.write("-" * 70 + "\n")
+
+    top_sets = snapshot.top_lego_sets
+    if not top_sets:
+        f.write("No Lego sets found in the database.\n")
+    else:
+        for i, s in enumerate(top_sets, 1):
+            year_str = s["year"] if s["year"] is not None else "N/A"
+            f.write(
+                f"{i:2}. {s['name']} "
+                f"(Set {s['set_num']}, {year_str}) "
+                f"- {s['num_parts']} pieces\n"
+            )
+
+    f.write("\n" + "=" * 70 + "\n")
+
+    f.write("\nTOP 10 LEGO THEMES BY COMPLEXITY (AVG PARTS)\n")
+    f.write("-" * 70 + "\n")
+
+    # Results of the lego_sets / lego_themes join
+    theme_stats = snapshot.lego_theme_averages
+
+    if not theme_stats:
+        f.write("No theme data available.\n")
+    else:
+        f.write(f"{'Theme Name':<40} {'Avg Parts':<10} {'Set Count':<10}\n")
+        f.write("-" * 70 + "\n")
+        for name, avg, count in theme_stats:
+            # Handle cases where name might be None
+            safe_name = name if name else "Unknown Theme"
+            f.write(f"{safe_name:<40} {avg:<10.1f} {count:<10}\n")
+    return f.getvalue()
+
+
+def render_text(snapshot):
+    """The full calculation_results.txt report."""
+    return (
+        format_comic_data(snapshot.comics_per_year)
+        + format_omdb_calculations(snapshot)
+        + format_lego_calculations(snapshot)
+    )
+
+
+def _plain(value):
+    """Read-only snapshot values back to dicts and lists."""
+    if isinstance(value, Mapping):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    return value
+
+
+def report_data(snapshot):
+    """
+    Every section as plain dicts and lists (what the JSON report holds).
+
+    Returns:
+        dict: {section: value}, same shapes as the calculate_* functions,
+            except that lego_theme_averages rows become dicts
+    """
+    return {
+        "comics_per_year": _plain(snapshot.comics_per_year),
+        "average_ratings": _plain(snapshot.average_ratings),
+        "rating_differences": _plain(snapshot.rating_differences),
+        "top_rated_movies": _plain(snapshot.top_rated_movies),
+        "lego_complexity_by_year": _plain(snapshot.lego_complexity_by_year),
+        "top_lego_sets": _plain(snapshot.top_lego_sets),
+        "lego_theme_averages": [
+            {"theme": name, "avg_parts": avg, "set_count": count}
+            for name, avg, count in snapshot.lego_theme_averages
+        ],
+    }
+
+
+def render_json(snapshot):
+    return json.dumps(report_data(snapshot), indent=2) + "\n"
+
+
+def render_csv(snapshot):
+    """
+    Every value as one (section, key, metric, value) row. Ranked lists use
+    the rank (1 = first) as the key.
+    """
+    f = io.StringIO()
+    writer = csv.writer(f, lineterminator="\n")
+    writer.writerow(("section", "key", "metric", "value"))
+    for year, count in snapshot.comics_per_year.items():
+        writer.writerow(("comics_per_year", year, "comics", count))
+    for group, averages in snapshot.average_ratings.items():
+        for metric, value in averages.items():
+            writer.writerow(("average_ratings", group, metric, value))
+    for title, data in snapshot.rating_differences.items():
+        for metric, value in data.items():
+            writer.writerow(("rating_differences", title, metric, value))
+    for ranking, movies in snapshot.top_rated_movies.items():
+        for rank, movie in enumerate(movies, 1):
+            for metric, value in movie.items():
+                writer.writerow((ranking, rank, metric, value))
+    for year, avg_parts in snapshot.lego_complexity_by_year.items():
+        writer.writerow(("lego_complexity_by_year", year, "avg_parts", avg_parts))
+    for rank, lego_set in enumerate(snapshot.top_lego_sets, 1):
+        for metric, value in lego_set.items():
+            writer.writerow(("top_lego_sets", rank, metric, value))
+    for name, avg, count in snapshot.lego_theme_averages:
+        writer.writerow(("lego_theme_averages", name, "avg_parts", avg))
+        writer.writerow(("lego_theme_averages", name, "set_count", count))
+    return f.getvalue()
+
+
+RENDERERS = {"txt": render_text, "json": render_json, "csv": render_csv}
+
+
+def _file_mode(path):
+    """Mode of the existing file at `path`, or 0666 minus the umask."""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except OSError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def write_atomic(path, text):
+    """
+    Replaces `path` with `text` in one step (temp file + os.replace).
+
+    Returns:
+        bool: False if the file already had exactly this content
+    """
+    try:
+        with open(path, encoding="utf-8", newline="") as f:
+            if f.read() == text:
+                return False
+    except (OSError, UnicodeDecodeError):
+        pass
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        # mkstemp creates the file as 0600; give it the mode a plain open()
+        # would have, so other users (e.g. a Prometheus collector) can read it
+        os.chmod(temp_path, _file_mode(path))
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return True
+
+
+def report_filenames(filename="calculation_results.txt", formats=REPORT_FORMATS):
+    """{format: path}, e.g. calculation_results.txt -> .json / .csv next to it."""
+    base = os.path.splitext(filename)[0]
+    return {fmt: filename if fmt == "txt" else f"{base}.{fmt}" for fmt in formats}
+
+
+def write_report(snapshot, filename="calculation_results.txt", formats=REPORT_FORMATS):
+    """
+    Renders the snapshot in every format and writes each file atomically.
+
+    Args:
+        snapshot (AnalyticsSnapshot): results to report
+        filename (str): text report path; the other formats use the same
+            name with their own extension
+        formats (tuple): any of REPORT_FORMATS
+
+    Returns:
+        dict: {path: True if written, False if unchanged}
+    """
+    written = {}
+    for fmt, path in report_filenames(filename, formats).items():
+        written[path] = write_atomic(path, RENDERERS[fmt](snapshot))
+    return written
@@ -0,0 +1,253 @@
+"""
+result_cache.py
+Purpose: Keep calculation results on disk until the tables they read change
+
+    @cached_result("comics")
+    def calculate_comics_per_year(db_filename="starwars.db"):
+        ...
+
+A result is stored under the function and its arguments, together with the
+version of the tables it reads: their write counters, which triggers bump
+on every insert, update and delete (database_setup.create_change_counters),
+plus a hash of the function's code (see code_version). Any write to those
+tables changes the version and the next call recomputes, and so does
+editing the function or a *_QUERY it runs. A database set up before the
+counters existed isn't cached until database_setup runs on it again.
+Calling again with nothing changed unpickles the stored result instead.
+
+Results are kept in a small SQLite file next to the database
+(starwars.db -> starwars.db.cache), one row per function and arguments.
+Cache problems never fail a calculation, they only make it a miss.
+Set STARWARS_RESULT_CACHE=0 (or call disable()) to always recompute.
+"""
+
+import functools
+import hashlib
+import marshal
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import types
+
+from connections import get_connection
+from database_setup import change_version
+from tracing import count
+
+CACHE_SUFFIX = ".cache"
+
+_enabled = os.environ.get("STARWARS_RESULT_CACHE", "1") != "0"
+_lock = threading.Lock()
+_stats = {}
+_MISS = object()
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    """Makes every cached function recompute (e.g. for benchmarks)."""
+    global _enabled
+    _enabled = False
+
+
+def cache_filename(db_filename):
+    return db_filename + CACHE_SUFFIX
+
+
+def table_version(db_filename, tables):
+    """
+    Write counters of the tables (database_setup.change_version).
+
+    Returns:
+        list: [data_id, (table, changes), ...], or None if the database
+        can't be read or has no counters
+    """
+    try:
+        return change_version(get_connection(db_filename), tables)
+    except sqlite3.Error:
+        return None
+
+
+def _connect(db_filename):
+    conn = sqlite3.connect(cache_filename(db_filename), timeout=5)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS results (
+            key        TEXT PRIMARY KEY,
+            function   TEXT,
+            version    TEXT,
+            value      BLOB,
+            created_at REAL
+        )
+        """
+    )
+    return conn
+
+
+def _load(db_filename, key, version):
+    conn = _connect(db_filename)
+    try:
+        row = conn.execute(
+            "SELECT version, value FROM results WHERE key = ?", (key,)
+        ).fetchone()
+    finally:
+        conn.close()
+    if row is None or row[0] != version:
+        return _MISS
+    return pickle.loads(row[1])
+
+
+def _store(db_filename, key, function, version, value):
+    conn = _connect(db_filename)
+    try:
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO results (key, function, version, value, created_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    version = excluded.version,
+                    value = excluded.value,
+                    created_at = excluded.created_at
+                """,
+                (
+                    key,
+                    function,
+                    version,
+                    pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                    time.time(),
+                ),
+            )
+    finally:
+        conn.close()
+
+
+def _record(function, hit):
+    with _lock:
+        entry = _stats.setdefault(function, {"hits": 0, "misses": 0})
+        entry["hits" if hit else "misses"] += 1
+    count("result_cache_total", function=function, result="hit" if hit else "miss")
+
+
+def _arguments(func, args, kwargs):
+    """Every argument by name, defaults filled in (like Signature.bind)."""
+    code = func.__code__
+    names = code.co_varnames[: code.co_argcount]
+    defaults = func.__defaults__ or ()
+    arguments = dict(zip(names[len(names) - len(defaults) :], defaults))
+    arguments.update(zip(names, args))
+    arguments.update(kwargs)
+    return arguments
+
+
+def _global_names(code):
+    """Every name a code object (and the code nested in it) looks up."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _global_names(const)
+    return names
+
+
+def code_version(func):
+    """
+    sha256 of what a function's result depends on besides the tables: its
+    compiled code, the strings it reads from module globals (the *_QUERY
+    constants in calculations.py) and, the same way, the functions of its
+    own module that it calls.
+    """
+    digest = hashlib.sha256()
+    seen = set()
+
+    def add(func):
+        while hasattr(func, "__wrapped__"):
+            func = func.__wrapped__
+        if func in seen:
+            return
+        seen.add(func)
+        digest.update(marshal.dumps(func.__code__))
+        for name in sorted(_global_names(func.__code__)):
+            value = func.__globals__.get(name)
+            if isinstance(value, str):
+                digest.update(f"{name}={value}".encode())
+            elif (
+                isinstance(value, types.FunctionType)
+                and value.__module__ == func.__module__
+            ):
+                add(value)
+
+    add(func)
+    return digest.hexdigest()
+
+
+def cached_result(*tables):
+    """
+    Decorator caching a function's result until one of `tables` changes.
+    The function must take the database filename as its `db_filename`
+    argument and return something picklable.
+    """
+
+    def decorator(func):
+        name = func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+
+            arguments = _arguments(func, args, kwargs)
+            db_filename = arguments["db_filename"]
+            tables_version = table_version(db_filename, tables)
+            if tables_version is None:
+                # Missing table or counters: let the function handle it, don't cache
+                return func(*args, **kwargs)
+
+            key = f"{name}:{sorted(arguments.items())!r}"
+            # Computed per call: the query constants are read at call time too
+            version = repr((code_version(func), tables_version))
+            try:
+                value = _load(db_filename, key, version)
+            except (sqlite3.Error, pickle.PickleError, EOFError) as e:
+                print(f"Result cache error ({name}): {e}")
+                value = _MISS
+            if value is not _MISS:
+                _record(name, hit=True)
+                return value
+
+            _record(name, hit=False)
+            value = func(*args, **kwargs)
+            try:
+                _store(db_filename, key, name, version, value)
+            except sqlite3.Error as e:
+                print(f"Result cache error ({name}): {e}")
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+def stats():
+    """
+    Hits and misses per function in this process.
+
+    Returns:
+        dict: {function: {"hits": int, "misses": int}}
+    """
+    with _lock:
+        return {name: dict(entry) for name, entry in _stats.items()}
+
+
+def print_stats():
+    entries = stats()
+    if not entries:
+        return
+    hits = sum(entry["hits"] for entry in entries.values())
+    misses = sum(entry["misses"] for entry in entries.values())
+    print(f"\nResult cache: {hits} hits, {misses} misses")
+    for name, entry in sorted(entries.items()):
+        print(f"  {name:<40} {entry['hits']:>4} hits {entry['misses']:>4} misses")
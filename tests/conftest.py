@@ -0,0 +1,76 @@
+"""
+conftest.py
+Purpose: Shared fixtures for the tests
+
+Run from the project root:
+    python -m pytest -q
+"""
+
+import os
+import sqlite3
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "collection_files"))
+sys.path.insert(0, os.path.join(ROOT_DIR, "benchmarks"))
+
+from database_setup import database_setup
+
+
+@pytest.fixture
+def db_filename(tmp_path):
+    """An empty starwars.db with every table, in a temp folder."""
+    filename = str(tmp_path / "starwars.db")
+    database_setup(filename)
+    return filename
+
+
+def insert_rows(db_filename, sql, rows):
+    conn = sqlite3.connect(db_filename)
+    try:
+        with conn:
+            conn.executemany(sql, rows)
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def mock_api(tmp_path, monkeypatch):
+    """
+    Starts benchmarks/mock_api.py and points the collectors at it; call it
+    with a MockConfig. Responses are never served from the HTTP cache
+    without asking the server, since tests change the mock's data.
+    """
+    import collect_lego
+    import collect_omdb
+    import collect_wookiepedia
+    from http_cache import SOURCE_TTLS, HTTPCache, set_cache
+    from mock_api import LEGO_SETS_PATH, OMDB_PATH, TIMELINE_PATH, start_server
+
+    servers = []
+
+    def start(config):
+        server = start_server(config)
+        servers.append(server)
+        monkeypatch.setattr(collect_lego, "BASE_URL", server.url + LEGO_SETS_PATH)
+        monkeypatch.setattr(collect_omdb, "BASE_URL", server.url + OMDB_PATH)
+        monkeypatch.setattr(
+            collect_wookiepedia, "TIMELINE_URL", server.url + TIMELINE_PATH
+        )
+        return server
+
+    monkeypatch.setattr(collect_lego, "RETRY_BACKOFF", 0.0)
+    monkeypatch.setattr(collect_lego, "MAX_RETRY_WAIT", 0.0)
+    set_cache(
+        HTTPCache(
+            str(tmp_path / "http_cache.db"),
+            ttls={source: 0 for source in SOURCE_TTLS},
+        )
+    )
+    yield start
+    for server in servers:
+        server.shutdown()
+    set_cache(None)
@@ -0,0 +1,53 @@
+import pytest
+
+import calculations
+
+EMPTY_RESULTS = [
+    (calculations.calculate_comics_per_year, {}),
+    (calculations.calculate_rating_differences, {}),
+    (calculations.calculate_average_ratings_comparison, {}),
+    (calculations.calculate_top_rated_movies, {}),
+    (calculations.calculate_star_wars_rating_differences, {}),
+    (calculations.calculate_top_combined_movies, []),
+    (calculations.calculate_lego_complexity_by_year, {}),
+    (calculations.calculate_top_lego_sets, []),
+    (calculations.calculate_lego_theme_averages, []),
+]
+
+
+@pytest.mark.parametrize("calculate, empty", EMPTY_RESULTS)
+def test_missing_database_prints_error_and_returns_empty(
+    calculate, empty, tmp_path, capsys
+):
+    missing = str(tmp_path / "missing.db")
+    assert calculate(db_filename=missing) == empty
+    assert "Database error" in capsys.readouterr().out
+
+
+def test_columnar_snapshot_matches_sql(db_filename):
+    from analytics import build_snapshot
+    from conftest import insert_rows
+
+    insert_rows(
+        db_filename,
+        "INSERT INTO MovieMetrics "
+        "(imdb_id, title, box_office, imdb_rating, rotten_tomatoes, is_star_wars) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            ("tt1", "A New Hope", 775, 8.6, 93, 1),
+            ("tt2", "Alien", 106, 8.5, 98, 0),
+            ("tt3", "Heat", 187, 8.3, 88, 0),
+            ("tt4", "The Phantom Menace", 1027, 6.5, 52, 1),
+            ("tt5", "No Ratings", None, None, None, 0),
+        ],
+    )
+
+    sql = build_snapshot(db_filename)
+    columnar = build_snapshot(db_filename, columnar=True)
+    assert columnar.rating_differences == sql.rating_differences
+    assert columnar.top_rated_movies == sql.top_rated_movies
+    for group in ("star_wars", "other_movies"):
+        for key in ("imdb", "rt", "count"):
+            assert columnar.average_ratings[group][key] == pytest.approx(
+                sql.average_ratings[group][key]
+            )
@@ -0,0 +1,137 @@
+import sqlite3
+
+import collect_lego
+from mock_api import MockConfig
+
+THEMES = {158: "Star Wars", 1: "Technic"}
+
+
+def lego_set_count(db_filename):
+    conn = sqlite3.connect(db_filename)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM lego_sets").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def sync(db_filename):
+    # One theme at a time, so the server's seeded failures are repeatable
+    return collect_lego.sync_lego_catalog(
+        db_filename,
+        theme_ids=THEMES,
+        page_size=50,
+        max_in_flight=1,
+        requests_per_second=1000,
+        api_key="test",
+    )
+
+
+def test_sync_retries_rate_limited_and_failed_pages(db_filename, mock_api, capsys):
+    server = mock_api(
+        MockConfig(sets_per_theme=240, rate_limit_rate=0.2, error_rate=0.1, seed=1)
+    )
+
+    assert sync(db_filename) == 480
+    assert lego_set_count(db_filename) == 480
+    # 5 pages per theme, the rest were retries
+    assert server.requests > 10
+    assert "INCOMPLETE" not in capsys.readouterr().out
+
+
+def test_sync_reports_a_theme_it_could_not_finish(db_filename, mock_api, capsys):
+    mock_api(MockConfig(sets_per_theme=240, error_rate=1.0))
+
+    assert sync(db_filename) == 0
+    out = capsys.readouterr().out
+    assert "Star Wars: 0 sets on 0 pages, 0 new (INCOMPLETE" in out
+    assert (
+        "INCOMPLETE themes (run --sync again to fetch the rest): Star Wars, Technic"
+        in out
+    )
+
+
+def test_retry_delay_honours_retry_after():
+    class Response:
+        def __init__(self, headers):
+            self.headers = headers
+
+    max_wait = collect_lego.MAX_RETRY_WAIT
+    assert collect_lego.retry_delay(Response({"Retry-After": "3"}), 0) == 3.0
+    assert collect_lego.retry_delay(Response({}), 2) == min(
+        collect_lego.RETRY_BACKOFF * 4, max_wait
+    )
+    assert collect_lego.retry_delay(Response({"Retry-After": "3600"}), 0) == (max_wait)
+
+
+def name_rows(db_filename):
+    conn = sqlite3.connect(db_filename)
+    try:
+        return dict(conn.execute("SELECT name, id FROM lego_set_names"))
+    finally:
+        conn.close()
+
+
+def test_name_resolver_creates_missing_names_once(db_filename):
+    conn = sqlite3.connect(db_filename)
+    queries = []
+    conn.set_trace_callback(queries.append)
+    names = collect_lego.NameResolver(conn.cursor())
+
+    with conn:
+        first = names.resolve_many(["X-wing", "TIE Fighter", "X-wing", None])
+    assert set(first) == {"X-wing", "TIE Fighter", None}
+    assert first[None] is None
+
+    queries.clear()
+    assert names.resolve_many(["TIE Fighter"]) == {"TIE Fighter": first["TIE Fighter"]}
+    assert queries == []  # served from the cache
+    conn.close()
+
+    assert name_rows(db_filename) == {
+        "X-wing": first["X-wing"],
+        "TIE Fighter": first["TIE Fighter"],
+    }
+
+
+def test_name_resolvers_on_two_connections_get_distinct_ids(db_filename):
+    conn_1 = sqlite3.connect(db_filename)
+    conn_2 = sqlite3.connect(db_filename)
+    names_1 = collect_lego.NameResolver(conn_1.cursor())
+    names_2 = collect_lego.NameResolver(conn_2.cursor())
+
+    # Each writer commits in turn, so neither can rely on ids it saw earlier
+    with conn_1:
+        names_1.resolve_many(["A"])
+    with conn_2:
+        names_2.resolve_many(["B"])
+    with conn_1:
+        names_1.resolve_many(["C"])
+    with conn_2:
+        names_2.resolve_many(["A", "D"])
+    conn_1.close()
+    conn_2.close()
+
+    ids = name_rows(db_filename)
+    assert sorted(ids) == ["A", "B", "C", "D"]
+    assert len(set(ids.values())) == 4
+
+
+def collect(db_filename, limit, page_size=5):
+    return collect_lego.insert_lego_sets(
+        limit=limit, db_filename=db_filename, page_size=page_size
+    )
+
+
+def test_finished_theme_picks_up_sets_added_upstream(
+    db_filename, mock_api, monkeypatch
+):
+    monkeypatch.setattr(collect_lego, "get_api_key", lambda: "test")
+    server = mock_api(MockConfig(sets_per_theme=7))
+    themes = len(collect_lego.THEME_IDS)
+
+    assert collect(db_filename, limit=10 * themes) == 7 * themes
+    assert collect(db_filename, limit=10 * themes) == 0
+
+    server.config.sets_per_theme = 12  # the last page fills up and a new one starts
+    assert collect(db_filename, limit=10 * themes) == 5 * themes
+    assert lego_set_count(db_filename) == 12 * themes
@@ -0,0 +1,94 @@
+import sqlite3
+
+import collect_omdb
+from conftest import insert_rows
+
+MOVIES = [(f"tt{i:07d}", f"Movie {i}", int(i <= 3)) for i in range(1, 11)]
+NOT_FOUND = {"tt0000004", "tt0000006"}
+
+
+def stored_ids(db_filename):
+    conn = sqlite3.connect(db_filename)
+    try:
+        return [row[0] for row in conn.execute("SELECT imdb_id FROM MovieMetrics")]
+    finally:
+        conn.close()
+
+
+def test_only_missing_movies_are_fetched_in_shrinking_batches(db_filename, monkeypatch):
+    insert_rows(
+        db_filename,
+        "INSERT INTO MovieMetrics (imdb_id, title, is_star_wars) VALUES (?, ?, ?)",
+        [MOVIES[1], MOVIES[4]],
+    )
+
+    requested = []
+    batches = []
+
+    def fetch_movie_data(api_key, imdb_id):
+        requested.append(imdb_id)
+        if imdb_id in NOT_FOUND:
+            return None
+        return {"Response": "True", "imdbID": imdb_id, "Title": imdb_id}
+
+    collect_concurrent = collect_omdb.collect_omdb_data_concurrent
+
+    def record_batch(movies, **kwargs):
+        batches.append([movie[0] for movie in movies])
+        return collect_concurrent(movies=movies, **kwargs)
+
+    monkeypatch.setattr(collect_omdb, "fetch_movie_data", fetch_movie_data)
+    monkeypatch.setattr(collect_omdb, "collect_omdb_data_concurrent", record_batch)
+
+    # tt0000003 is listed twice and must only be asked for once
+    added = collect_omdb.insert_into_database(
+        limit=4,
+        concurrent=True,
+        requests_per_second=1000.0,
+        db_filename=db_filename,
+        movies=MOVIES + [MOVIES[2]],
+        api_key="key",
+    )
+
+    # First batch: 4 missing movies, 2 of them not found. Second batch:
+    # only the 2 rows still allowed by the limit
+    assert batches == [
+        ["tt0000001", "tt0000003", "tt0000004", "tt0000006"],
+        ["tt0000007", "tt0000008"],
+    ]
+    assert sorted(requested) == [imdb_id for batch in batches for imdb_id in batch]
+    assert added == 4
+    assert sorted(stored_ids(db_filename)) == [
+        "tt0000001",
+        "tt0000002",
+        "tt0000003",
+        "tt0000005",
+        "tt0000007",
+        "tt0000008",
+    ]
+
+
+def test_nothing_is_fetched_when_every_movie_is_stored(db_filename, monkeypatch):
+    insert_rows(
+        db_filename,
+        "INSERT INTO MovieMetrics (imdb_id, title, is_star_wars) VALUES (?, ?, ?)",
+        MOVIES,
+    )
+    requested = []
+    monkeypatch.setattr(
+        collect_omdb,
+        "fetch_movie_data",
+        lambda api_key, imdb_id: requested.append(imdb_id),
+    )
+
+    assert (
+        collect_omdb.insert_into_database(
+            limit=4,
+            concurrent=True,
+            db_filename=db_filename,
+            movies=MOVIES,
+            api_key="key",
+        )
+        == 0
+    )
+    assert requested == []
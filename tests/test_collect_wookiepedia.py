@@ -0,0 +1,47 @@
+import sqlite3
+
+from collect_wookiepedia import scrape
+
+
+def timeline(titles):
+    rows = "".join(
+        '<tr class="comic"><td>ABY</td><td>C</td>'
+        f"<td><i>{title}</i></td><td>{2015 + i}-01-01</td></tr>"
+        for i, title in enumerate(titles)
+    )
+    return f"<html><body><table class='sortable'>{rows}</table></body></html>"
+
+
+def comics(db_filename):
+    conn = sqlite3.connect(db_filename)
+    try:
+        return conn.execute(
+            "SELECT title, release_date FROM comics ORDER BY id"
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+def test_duplicates_across_batches_are_skipped_and_not_counted(db_filename):
+    page = timeline(["A", "B", "A", "C", "B", "D", "E"])
+
+    # limit 4: rows 0-3 are one batch (A, B, C new, the second A ignored),
+    # then one row per batch: B (already stored) and D
+    assert scrape(page, db_filename, limit=4) == 4
+    assert comics(db_filename) == [
+        ("A", 2015),
+        ("B", 2016),
+        ("C", 2018),
+        ("D", 2020),
+    ]
+
+    # The next run resumes after D and only E is left
+    assert scrape(page, db_filename, limit=4) == 1
+    assert [title for title, _ in comics(db_filename)] == ["A", "B", "C", "D", "E"]
+
+
+def test_full_load_counts_only_new_titles(db_filename):
+    scrape(timeline(["A", "B"]), db_filename, limit=None)
+
+    assert scrape(timeline(["B", "C", "C", "A", "D"]), db_filename, limit=None) == 2
+    assert [title for title, _ in comics(db_filename)] == ["A", "B", "C", "D"]
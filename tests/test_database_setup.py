@@ -0,0 +1,51 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+from conftest import ROOT_DIR, insert_rows
+
+SCRIPT = os.path.join(ROOT_DIR, "database_setup.py")
+INSERT_LEGO_SET = (
+    "INSERT INTO lego_sets (set_num, year, num_parts, theme_id) VALUES (?, ?, ?, ?)"
+)
+
+
+def run(cwd, *args):
+    return subprocess.run(
+        [sys.executable, SCRIPT, *args], cwd=cwd, capture_output=True, text=True
+    )
+
+
+def setup_with_drift(tmp_path):
+    """starwars.db with aggregate tables that no longer match lego_sets."""
+    db_filename = str(tmp_path / "starwars.db")
+    run(tmp_path, "--aggregates")
+    insert_rows(db_filename, INSERT_LEGO_SET, [("1-1", 2000, 100, 158)])
+    conn = sqlite3.connect(db_filename)
+    with conn:
+        conn.execute("UPDATE agg_lego_year SET parts_sum = 1 WHERE year = 2000")
+    conn.close()
+    return db_filename
+
+
+def test_check_aggregates_runs_before_setup_rebuilds(tmp_path):
+    setup_with_drift(tmp_path)
+
+    result = run(tmp_path, "--aggregates", "--check-aggregates")
+    assert result.returncode != 0
+    assert "agg_lego_year[2000]" in result.stdout
+
+    # Checking doesn't repair anything
+    assert run(tmp_path, "--check-aggregates").returncode != 0
+
+
+def test_repair_aggregates_rebuilds_them(tmp_path):
+    setup_with_drift(tmp_path)
+
+    result = run(tmp_path, "--check-aggregates", "--repair-aggregates")
+    assert result.returncode == 0
+    assert "Rebuilt the aggregate tables" in result.stdout
+    result = run(tmp_path, "--check-aggregates")
+    assert result.returncode == 0
+    assert "Aggregate tables match the live tables." in result.stdout
@@ -0,0 +1,116 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from collect_omdb import omdb_found
+from http_cache import CachedResponse, HTTPCache
+
+BODY_SIZE = 100
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Serves a fixed-size body per path, with an ETag, and answers 304s."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if self.path.startswith("/omdb"):
+            body = json.dumps({"Response": "False", "Error": "Movie not found!"})
+            self._send(200, body.encode(), {})
+            return
+
+        etag = f'"{self.path}"'
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, b"", {"ETag": etag})
+            return
+        body = self.path.encode().ljust(BODY_SIZE, b".")
+        self._send(200, body, {"ETag": etag})
+
+    def _send(self, status, body, headers):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    server.url = f"http://{host}:{port}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_cache(tmp_path):
+    caches = []
+
+    def make(**kwargs):
+        cache = HTTPCache(str(tmp_path / "http_cache.db"), **kwargs)
+        caches.append(cache)
+        return cache
+
+    yield make
+    for cache in caches:
+        cache.close()
+
+
+def cached_urls(cache):
+    return {row[0] for row in cache.conn.execute("SELECT url FROM responses")}
+
+
+def test_fresh_response_is_served_from_the_cache(server, make_cache):
+    cache = make_cache()
+
+    first = cache.get(server.url + "/a", source="test")
+    second = cache.get(server.url + "/a", source="test")
+
+    assert isinstance(second, CachedResponse)
+    assert second.content == first.content
+    assert server.requests == ["/a"]
+    assert cache.stats["hits"] == 1
+
+
+def test_stale_response_is_revalidated_with_a_304(server, make_cache):
+    cache = make_cache(ttls={"test": 0})
+
+    first = cache.get(server.url + "/a", source="test")
+    second = cache.get(server.url + "/a", source="test")
+
+    assert isinstance(second, CachedResponse)
+    assert second.content == first.content
+    assert server.requests == ["/a", "/a"]
+    assert cache.stats["revalidated"] == 1
+
+
+def test_least_recently_used_response_is_evicted(server, make_cache):
+    cache = make_cache(max_bytes=2 * BODY_SIZE)
+
+    cache.get(server.url + "/a", source="test")
+    cache.get(server.url + "/b", source="test")
+    cache.get(server.url + "/a", source="test")  # /b is now least recently used
+    cache.get(server.url + "/c", source="test")
+
+    assert cached_urls(cache) == {server.url + "/a", server.url + "/c"}
+    assert cache.stats["evictions"] == 1
+
+
+def test_omdb_error_responses_are_not_cached(server, make_cache):
+    cache = make_cache()
+
+    for _ in range(2):
+        response = cache.get(server.url + "/omdb", source="omdb", cacheable=omdb_found)
+        assert response.json()["Response"] == "False"
+
+    assert server.requests == ["/omdb", "/omdb"]
+    assert cached_urls(cache) == set()
@@ -0,0 +1,105 @@
+import gzip
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+import collect_lego
+from conftest import ROOT_DIR
+
+FIXTURES = os.path.join(ROOT_DIR, "tests", "fixtures")
+SETS_CSV = os.path.join(FIXTURES, "sets.csv")
+THEMES_CSV = os.path.join(FIXTURES, "themes.csv")
+
+
+def query(db_filename, sql):
+    conn = sqlite3.connect(db_filename)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def sets_per_theme(db_filename):
+    return dict(
+        query(
+            db_filename,
+            "SELECT theme_id, COUNT(*) FROM lego_sets GROUP BY theme_id",
+        )
+    )
+
+
+def test_load_theme_parents():
+    themes = collect_lego.load_theme_parents(THEMES_CSV)
+
+    assert len(themes) == 7
+    assert themes[158] == ("Star Wars", None)
+    assert themes[172] == ("Episode IV", 171)
+
+
+def test_sub_themes_are_stored_under_their_collected_parent(db_filename):
+    added = collect_lego.ingest_lego_csv(SETS_CSV, THEMES_CSV, db_filename)
+
+    # Star Wars has two levels of sub-themes; Space isn't collected and the
+    # row without a set number is skipped
+    assert added == 6
+    assert sets_per_theme(db_filename) == {1: 1, 158: 4, 435: 1}
+    assert query(
+        db_filename,
+        "SELECT n.name FROM lego_sets s JOIN lego_set_names n ON n.id = s.name_id "
+        "WHERE s.set_num = '75181-1'",
+    ) == [("Y-Wing Starfighter",)]
+
+    # Loading the same file again adds nothing
+    assert collect_lego.ingest_lego_csv(SETS_CSV, THEMES_CSV, db_filename) == 0
+
+
+def test_without_a_themes_file_only_listed_themes_are_kept(db_filename):
+    assert collect_lego.ingest_lego_csv(SETS_CSV, db_filename=db_filename) == 3
+    assert sets_per_theme(db_filename) == {1: 1, 158: 1, 435: 1}
+
+
+def test_all_themes_keeps_each_sets_own_theme(db_filename, tmp_path, monkeypatch):
+    resolvers = []
+
+    class RecordingResolver(collect_lego.NameResolver):
+        def resolve_many(self, names):
+            resolvers.append(self)
+            return super().resolve_many(names)
+
+    monkeypatch.setattr(collect_lego, "NameResolver", RecordingResolver)
+
+    # Rebrickable's downloads are gzipped
+    sets_gz = str(tmp_path / "sets.csv.gz")
+    with open(SETS_CSV, "rb") as src, gzip.open(sets_gz, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+
+    added = collect_lego.ingest_lego_csv(
+        sets_gz, THEMES_CSV, db_filename, theme_ids=None, batch_size=3
+    )
+
+    assert added == 8
+    assert sets_per_theme(db_filename) == {
+        1: 1,
+        158: 1,
+        171: 2,
+        172: 1,
+        435: 1,
+        600: 1,
+        601: 1,
+    }
+    assert len(query(db_filename, "SELECT id FROM lego_themes")) == 7
+    # Every set's theme exists
+    assert query(
+        db_filename,
+        "SELECT COUNT(*) FROM lego_sets WHERE theme_id NOT IN (SELECT id FROM lego_themes)",
+    ) == [(0,)]
+    # The name cache is emptied after every batch
+    assert len(resolvers) == 3
+    assert resolvers[0].ids == {}
+
+
+def test_all_themes_needs_the_themes_file(db_filename):
+    with pytest.raises(ValueError):
+        collect_lego.ingest_lego_csv(SETS_CSV, db_filename=db_filename, theme_ids=None)
@@ -0,0 +1,81 @@
+import json
+import os
+import sqlite3
+
+import main
+from conftest import insert_rows
+
+INSERT_COMIC = "INSERT INTO comics (title, release_date) VALUES (?, ?)"
+INSERT_MOVIE = (
+    "INSERT INTO MovieMetrics "
+    "(imdb_id, title, imdb_rating, rotten_tomatoes, is_star_wars) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+
+
+def fill(db_filename):
+    insert_rows(db_filename, INSERT_COMIC, [("A", 2015), ("B", 2015), ("C", 2016)])
+    insert_rows(
+        db_filename,
+        INSERT_MOVIE,
+        [("tt1", "A New Hope", 8.6, 93, 1), ("tt2", "Alien", 8.5, 98, 0)],
+    )
+
+
+def test_setup_creates_the_database(tmp_path, capsys):
+    db_filename = str(tmp_path / "new.db")
+    main.main(["--db", db_filename, "setup", "--profile", "fast"])
+
+    conn = sqlite3.connect(db_filename)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+    finally:
+        conn.close()
+    assert {"comics", "MovieMetrics", "lego_sets"} <= tables
+    assert "profile: fast" in capsys.readouterr().out
+
+
+def test_status_on_a_path_that_needs_quoting(tmp_path, monkeypatch, capsys):
+    # "?" and "#" would end the file name in an unquoted URI
+    folder = tmp_path / "run #1?"
+    folder.mkdir()
+    db_filename = str(folder / "star wars.db")
+    main.main(["--db", db_filename, "setup"])
+    fill(db_filename)
+    monkeypatch.chdir(tmp_path)
+    capsys.readouterr()
+
+    main.main(["--db", db_filename, "status"])
+    out = capsys.readouterr().out
+    assert f"Database: {db_filename}" in out
+    assert "Profile:  balanced" in out
+    rows = dict(
+        line.split()[:2]
+        for line in out.splitlines()
+        if line.startswith(("comics ", "MovieMetrics "))
+    )
+    assert rows == {"comics": "3", "MovieMetrics": "2"}
+    assert "calculation_results.txt              missing" in out
+
+
+def test_status_without_a_database(tmp_path, capsys):
+    main.main(["--db", str(tmp_path / "missing.db"), "status"])
+    assert "does not exist yet" in capsys.readouterr().out
+    assert not os.path.exists(tmp_path / "missing.db")
+
+
+def test_calc_writes_every_report(db_filename, tmp_path, monkeypatch, capsys):
+    fill(db_filename)
+    monkeypatch.chdir(tmp_path)
+
+    main.main(["--db", db_filename, "calc", "--report", "results.txt"])
+    assert "All calculations complete!" in capsys.readouterr().out
+    for name in ("results.txt", "results.json", "results.csv"):
+        assert (tmp_path / name).stat().st_size > 0
+    data = json.loads((tmp_path / "results.json").read_text())
+    assert data["comics_per_year"] == {"2015": 2, "2016": 1}
+
+    # The columnar movie path writes the same numbers
+    json_before = (tmp_path / "results.json").read_text()
+    main.main(["--db", db_filename, "calc", "--report", "results.txt", "--columnar"])
+    assert (tmp_path / "results.json").read_text() == json_before
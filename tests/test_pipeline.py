@@ -0,0 +1,138 @@
+import os
+import sqlite3
+import threading
+
+import pipeline
+from conftest import insert_rows
+from pipeline import Stage, data_fingerprint, run_pipeline, run_stage, select_stages
+
+INSERT_COMIC = "INSERT INTO comics (title, release_date) VALUES (?, ?)"
+
+
+def recording_stages(order, fail=()):
+    """setup -> a, b -> report, where the stages in `fail` raise."""
+    lock = threading.Lock()
+
+    def step(name):
+        def run():
+            with lock:
+                order.append(name)
+            if name in fail:
+                raise RuntimeError(name)
+            return name
+
+        return run
+
+    return [
+        Stage("setup", step("setup")),
+        Stage("a", step("a"), deps=("setup",)),
+        Stage("b", step("b"), deps=("setup",)),
+        Stage("report", step("report"), deps=("a", "b")),
+    ]
+
+
+def test_stages_start_after_their_dependencies(db_filename):
+    order = []
+    results = run_pipeline(recording_stages(order), db_filename)
+
+    assert {name: status for name, (status, _, _) in results.items()} == {
+        "setup": "ran",
+        "a": "ran",
+        "b": "ran",
+        "report": "ran",
+    }
+    assert order[0] == "setup"
+    assert order[-1] == "report"
+    assert sorted(order[1:3]) == ["a", "b"]
+
+
+def test_failed_stage_blocks_its_dependents(db_filename):
+    order = []
+    results = run_pipeline(recording_stages(order, fail=("a",)), db_filename)
+
+    assert results["a"][0] == "failed"
+    assert isinstance(results["a"][2], RuntimeError)
+    assert results["b"][0] == "ran"
+    assert results["report"][0] == "blocked"
+    assert "report" not in order
+
+
+def test_only_drops_dependencies_on_left_out_stages(db_filename):
+    order = []
+    stages = select_stages(recording_stages(order), ["b", "report"])
+
+    assert [(s.name, s.deps) for s in stages] == [("b", ()), ("report", ("b",))]
+    results = run_pipeline(stages, db_filename)
+    assert order == ["b", "report"]
+    assert set(results) == {"b", "report"}
+
+
+def test_stage_with_unchanged_fingerprint_is_skipped(db_filename):
+    runs = []
+    stage = Stage(
+        "calculations",
+        lambda: runs.append(1),
+        fingerprint=lambda: data_fingerprint(db_filename),
+        outputs=(db_filename,),
+    )
+
+    assert run_stage(stage, db_filename, force=False)[0] == "ran"
+    assert run_stage(stage, db_filename, force=False)[0] == "skipped"
+    assert run_stage(stage, db_filename, force=True)[0] == "ran"
+    assert len(runs) == 2
+
+
+def test_stage_reruns_when_its_outputs_are_missing(db_filename, tmp_path):
+    output = tmp_path / "report.txt"
+    stage = Stage(
+        "calculations",
+        lambda: output.write_text("done"),
+        fingerprint=lambda: "same",
+        outputs=(str(output),),
+    )
+
+    assert run_stage(stage, db_filename, force=False)[0] == "ran"
+    os.remove(output)
+    assert run_stage(stage, db_filename, force=False)[0] == "ran"
+
+
+def test_update_in_place_reruns_the_stage(db_filename):
+    insert_rows(db_filename, INSERT_COMIC, [("Comic 1", "2000"), ("Comic 2", "2001")])
+    stage = Stage(
+        "calculations",
+        lambda: None,
+        fingerprint=lambda: data_fingerprint(db_filename),
+        outputs=(db_filename,),
+    )
+    assert run_stage(stage, db_filename, force=False)[0] == "ran"
+    assert run_stage(stage, db_filename, force=False)[0] == "skipped"
+
+    # Same row count and max rowid, different contents
+    insert_rows(
+        db_filename,
+        "UPDATE comics SET release_date = ? WHERE title = ?",
+        [("1999", "Comic 1")],
+    )
+    assert run_stage(stage, db_filename, force=False)[0] == "ran"
+
+    # Delete and reinsert the last row
+    insert_rows(db_filename, "DELETE FROM comics WHERE title = ?", [("Comic 2",)])
+    insert_rows(db_filename, INSERT_COMIC, [("Comic 3", "2002")])
+    assert run_stage(stage, db_filename, force=False)[0] == "ran"
+
+
+def test_database_without_counters_always_runs(db_filename):
+    conn = sqlite3.connect(db_filename)
+    conn.execute("DROP TABLE table_changes")
+    conn.close()
+    assert data_fingerprint(db_filename) is None
+    assert pipeline.combine_fingerprints(data_fingerprint(db_filename), "code") is None
+
+    stage = Stage(
+        "calculations",
+        lambda: None,
+        fingerprint=lambda: data_fingerprint(db_filename),
+        outputs=(db_filename,),
+    )
+    assert run_stage(stage, db_filename, force=False)[0] == "ran"
+    assert run_stage(stage, db_filename, force=False)[0] == "ran"
@@ -0,0 +1,71 @@
+import pytest
+
+import rate_limit
+from rate_limit import TokenBucket
+
+
+class FakeClock:
+    """Stands in for the time module: sleep() moves monotonic() forward."""
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return clock
+
+
+def test_full_bucket_allows_a_burst_of_capacity(clock):
+    bucket = TokenBucket(rate=2, capacity=5)
+
+    assert [bucket.acquire() for _ in range(5)] == [0.0] * 5
+    assert clock.sleeps == []
+
+    # The sixth request waits for one token at 2 per second
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+
+def test_tokens_refill_at_the_rate_up_to_capacity(clock):
+    bucket = TokenBucket(rate=4, capacity=2)
+    bucket.acquire()
+    bucket.acquire()
+
+    # 0.25s at 4 per second is exactly one token
+    clock.now += 0.25
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == pytest.approx(0.25)
+
+    # A long pause refills only up to the capacity
+    clock.now += 60
+    assert [bucket.acquire() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(0.25)
+
+
+def test_sustained_rate(clock):
+    # Rates that are powers of two keep the fake clock's sums exact
+    bucket = TokenBucket(rate=8)
+    start = clock.now
+    for _ in range(24):
+        bucket.acquire()
+
+    # 8 from the initial burst, then 16 more at 8 per second
+    assert clock.now - start == pytest.approx(2.0)
+
+
+def test_capacity_defaults_to_the_rate_and_rate_must_be_positive(clock):
+    assert TokenBucket(rate=3).capacity == 3
+    assert TokenBucket(rate=0.5).capacity == 1
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
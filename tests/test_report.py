@@ -0,0 +1,41 @@
+import os
+import stat
+
+import pytest
+
+from report import write_atomic
+
+
+@pytest.fixture
+def umask_022():
+    old = os.umask(0o022)
+    yield
+    os.umask(old)
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_new_file_gets_the_umask_mode(tmp_path, umask_022):
+    path = str(tmp_path / "trace.prom")
+    assert write_atomic(path, "a 1\n")
+    assert mode(path) == 0o644
+
+
+def test_replaced_file_keeps_its_mode(tmp_path, umask_022):
+    path = str(tmp_path / "calculation_results.txt")
+    with open(path, "w") as f:
+        f.write("old\n")
+    os.chmod(path, 0o640)
+
+    assert write_atomic(path, "new\n")
+    assert mode(path) == 0o640
+    with open(path) as f:
+        assert f.read() == "new\n"
+
+
+def test_unchanged_file_is_not_rewritten(tmp_path):
+    path = str(tmp_path / "calculation_results.txt")
+    assert write_atomic(path, "same\n")
+    assert not write_atomic(path, "same\n")
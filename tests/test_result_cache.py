@@ -0,0 +1,110 @@
+import os
+import sqlite3
+
+import calculations
+import result_cache
+from conftest import insert_rows
+
+LEGO_SETS = [
+    ("1-1", 2000, 100, 158),
+    ("2-1", 2000, 300, 158),
+    ("3-1", 2001, 50, 158),
+]
+INSERT_LEGO_SET = (
+    "INSERT INTO lego_sets (set_num, year, num_parts, theme_id) VALUES (?, ?, ?, ?)"
+)
+
+
+def misses(function):
+    return result_cache.stats().get(function, {}).get("misses", 0)
+
+
+def test_unchanged_tables_hit_and_new_rows_miss(db_filename, monkeypatch):
+    monkeypatch.setattr(result_cache, "_enabled", True)
+    insert_rows(db_filename, INSERT_LEGO_SET, LEGO_SETS)
+    name = "calculate_lego_complexity_by_year"
+
+    before = misses(name)
+    assert calculations.calculate_lego_complexity_by_year(db_filename) == {
+        2000: 200.0,
+        2001: 50.0,
+    }
+    calculations.calculate_lego_complexity_by_year(db_filename)
+    assert misses(name) == before + 1
+
+    insert_rows(db_filename, INSERT_LEGO_SET, [("4-1", 2001, 150, 158)])
+    assert calculations.calculate_lego_complexity_by_year(db_filename)[2001] == 100.0
+    assert misses(name) == before + 2
+
+
+def test_changing_a_query_is_a_miss(db_filename, monkeypatch):
+    monkeypatch.setattr(result_cache, "_enabled", True)
+    insert_rows(db_filename, INSERT_LEGO_SET, LEGO_SETS)
+    name = "calculate_lego_complexity_by_year"
+
+    calculations.calculate_lego_complexity_by_year(db_filename)
+    before = misses(name)
+
+    monkeypatch.setattr(
+        calculations,
+        "LEGO_COMPLEXITY_BY_YEAR_QUERY",
+        calculations.LEGO_COMPLEXITY_BY_YEAR_QUERY.replace(
+            "AVG(num_parts)", "MAX(num_parts)"
+        ),
+    )
+    assert calculations.calculate_lego_complexity_by_year(db_filename) == {
+        2000: 300,
+        2001: 50,
+    }
+    assert misses(name) == before + 1
+
+
+def test_code_version_follows_helpers_and_queries():
+    namespace = {"__name__": "fake_module", "QUERY": "SELECT 1"}
+    exec(
+        "def helper():\n    return QUERY\n\ndef func():\n    return helper()\n",
+        namespace,
+    )
+    version = result_cache.code_version(namespace["func"])
+
+    namespace["QUERY"] = "SELECT 2"
+    assert result_cache.code_version(namespace["func"]) != version
+
+
+def run_sql(db_filename, sql):
+    conn = sqlite3.connect(db_filename)
+    try:
+        with conn:
+            conn.execute(sql)
+    finally:
+        conn.close()
+
+
+def test_updates_and_reinserts_are_misses(db_filename, monkeypatch):
+    monkeypatch.setattr(result_cache, "_enabled", True)
+    insert_rows(db_filename, INSERT_LEGO_SET, LEGO_SETS)
+    name = "calculate_lego_complexity_by_year"
+    calculations.calculate_lego_complexity_by_year(db_filename)
+    before = misses(name)
+
+    # Same row count and highest rowid, different data
+    run_sql(db_filename, "UPDATE lego_sets SET num_parts = 500 WHERE set_num = '3-1'")
+    assert calculations.calculate_lego_complexity_by_year(db_filename)[2001] == 500
+    assert misses(name) == before + 1
+
+    run_sql(db_filename, "DELETE FROM lego_sets WHERE set_num = '3-1'")
+    insert_rows(db_filename, INSERT_LEGO_SET, [("3-1", 2001, 70, 158)])
+    assert calculations.calculate_lego_complexity_by_year(db_filename)[2001] == 70
+    assert misses(name) == before + 2
+
+
+def test_database_without_counters_is_not_cached(db_filename, monkeypatch):
+    monkeypatch.setattr(result_cache, "_enabled", True)
+    run_sql(db_filename, "DROP TABLE table_changes")
+    name = "calculate_lego_complexity_by_year"
+    before = misses(name)
+
+    calculations.calculate_lego_complexity_by_year(db_filename)
+    calculations.calculate_lego_complexity_by_year(db_filename)
+    assert misses(name) == before
+    assert not os.path.exists(result_cache.cache_filename(db_filename))
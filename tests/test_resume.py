@@ -0,0 +1,141 @@
+import sqlite3
+
+import collect_lego
+import collect_omdb
+import collect_wookiepedia
+import main
+from collection_state import load_cursor
+from mock_api import MockConfig, timeline_page
+
+
+def rows(db_filename, sql):
+    conn = sqlite3.connect(db_filename)
+    try:
+        return [row[0] for row in conn.execute(sql)]
+    finally:
+        conn.close()
+
+
+def cursor(db_filename, source, key):
+    conn = sqlite3.connect(db_filename)
+    try:
+        return load_cursor(conn, source, key)
+    finally:
+        conn.close()
+
+
+def imdb_id(number):
+    return f"tt{number:07d}"
+
+
+def test_omdb_resumes_after_the_last_id(db_filename, mock_api):
+    mock_api(MockConfig(movies=10))
+    # The mock has no movie 99, so its fetch fails every time
+    movies = [(imdb_id(n), f"Movie {n}", 0) for n in (1, 99, 2, 3, 4, 5, 6)]
+
+    def collect(limit):
+        return collect_omdb.insert_into_database(
+            limit=limit,
+            concurrent=True,
+            db_filename=db_filename,
+            movies=movies,
+            api_key="test",
+        )
+
+    assert collect(3) == 3
+    assert cursor(db_filename, "omdb", "last_id") == imdb_id(3)
+    assert collect(2) == 2
+    assert cursor(db_filename, "omdb", "last_id") == imdb_id(5)
+    assert collect(10) == 1
+
+    stored = rows(db_filename, "SELECT imdb_id FROM MovieMetrics ORDER BY imdb_id")
+    assert stored == [imdb_id(n) for n in range(1, 7)]
+
+
+def lego_collect(db_filename, limit):
+    return collect_lego.insert_lego_sets(
+        limit=limit, db_filename=db_filename, page_size=5
+    )
+
+
+def test_lego_resumes_inside_a_page(db_filename, mock_api, monkeypatch):
+    monkeypatch.setattr(collect_lego, "get_api_key", lambda: "test")
+    mock_api(MockConfig(sets_per_theme=12))
+    themes = list(collect_lego.THEME_IDS)
+
+    # 3 sets per theme: each run stops inside a page
+    assert lego_collect(db_filename, 3 * len(themes)) == 3 * len(themes)
+    state = cursor(db_filename, "rebrickable", f"theme:{themes[0]}")
+    assert (state["page"], state["offset"], state["size"]) == (1, 3, 5)
+
+    assert lego_collect(db_filename, 3 * len(themes)) == 3 * len(themes)
+    state = cursor(db_filename, "rebrickable", f"theme:{themes[0]}")
+    assert (state["page"], state["offset"]) == (2, 1)
+
+    assert lego_collect(db_filename, 100) == 6 * len(themes)
+    stored = rows(db_filename, "SELECT set_num FROM lego_sets")
+    assert sorted(stored) == sorted(
+        f"{theme_id}{index:05d}-1" for theme_id in themes for index in range(12)
+    )
+
+
+def comic_titles(db_filename):
+    return rows(db_filename, "SELECT title FROM comics ORDER BY id")
+
+
+def scrape(db_filename, limit):
+    html = collect_wookiepedia.collect_comics()
+    return collect_wookiepedia.scrape(html, db_filename, limit=limit)
+
+
+def test_wookieepedia_resumes_at_the_next_row(db_filename, mock_api, capsys):
+    mock_api(MockConfig(comics=12))
+
+    assert scrape(db_filename, 5) == 5
+    assert cursor(db_filename, "wookieepedia", "timeline") == {
+        "row": 5,
+        "title": "Mock Comic 4",
+        "rows": 12,
+    }
+    capsys.readouterr()
+
+    assert scrape(db_filename, 5) == 5
+    assert "Processing from row 5" in capsys.readouterr().out
+    assert scrape(db_filename, 5) == 2
+    assert comic_titles(db_filename) == [f"Mock Comic {i}" for i in range(12)]
+
+
+def test_wookieepedia_starts_over_when_the_page_grew(db_filename, mock_api, capsys):
+    server = mock_api(MockConfig(comics=10))
+    assert scrape(db_filename, 4) == 4
+
+    # A comic is added at the top of the timeline, so every row moves down
+    new_row = (
+        '<tr class="comic"><td>ABY</td><td>C</td>'
+        "<td><i>New Comic</i></td><td>2026-01-01</td></tr>"
+    )
+    page = timeline_page(10)
+    header_end = page.index("</tr>") + len("</tr>")
+    server.timeline = page[:header_end] + new_row + page[header_end:]
+    capsys.readouterr()
+
+    assert scrape(db_filename, 100) == 7
+    assert "Processing from row 0" in capsys.readouterr().out
+    assert sorted(comic_titles(db_filename)) == sorted(
+        ["New Comic"] + [f"Mock Comic {i}" for i in range(10)]
+    )
+
+
+def test_collect_restart_forgets_the_cursor(db_filename, mock_api, capsys):
+    mock_api(MockConfig(comics=12))
+    assert scrape(db_filename, 5) == 5
+    capsys.readouterr()
+
+    main.main(
+        ["--db", db_filename, "collect", "wookieepedia", "--restart", "--limit", "5"]
+    )
+
+    out = capsys.readouterr().out
+    assert "Processing from row 0" in out
+    assert "wookieepedia: 5 new rows" in out
+    assert comic_titles(db_filename) == [f"Mock Comic {i}" for i in range(10)]
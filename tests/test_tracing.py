@@ -0,0 +1,48 @@
+import json
+import os
+
+import pytest
+
+import tracing
+
+pytest.importorskip("matplotlib")
+
+import visualizations
+from conftest import insert_rows
+
+
+@pytest.fixture
+def tracer():
+    tracer = tracing.enable()
+    yield tracer
+    tracing.disable()
+
+
+def test_batch_worker_spans_are_merged(db_filename, tmp_path, tracer):
+    insert_rows(
+        db_filename,
+        "INSERT INTO lego_sets (set_num, year, num_parts, theme_id) VALUES (?, ?, ?, ?)",
+        [("1-1", 2000, 100, 158)],
+    )
+    visualizations.render_all(
+        db_filename, output_dir=str(tmp_path / "charts"), dpi=20, workers=2
+    )
+
+    spans = {record["name"]: record for record in tracer.spans}
+    plot = spans["plot_lego_complexity_by_year"]
+    assert plot["pid"] != os.getpid()
+    assert plot["parent"] == spans["render_all"]["id"]
+    assert len({record["id"] for record in tracer.spans}) == len(tracer.spans)
+
+
+def test_write_reports(tmp_path, tracer):
+    with tracing.span("stage"):
+        tracing.count("rows_written_total", 3, table="lego_sets")
+
+    prefix = str(tmp_path / "trace")
+    tracing.write_reports(prefix)
+
+    with open(prefix + ".json") as f:
+        assert [record["name"] for record in json.load(f)["spans"]] == ["stage"]
+    with open(prefix + ".prom") as f:
+        assert 'starwars_rows_written_total{table="lego_sets"} 3' in f.read()
@@ -0,0 +1,53 @@
+import os
+import sqlite3
+
+import pytest
+
+pytest.importorskip("matplotlib")
+
+import visualizations
+from conftest import insert_rows
+
+CHART = "lego_complexity_by_year"
+
+
+@pytest.fixture(autouse=True)
+def headless():
+    visualizations._use_headless_backend()
+
+
+def render(db_filename, output_dir):
+    return visualizations.render_chart(
+        CHART, db_filename, output_dir=str(output_dir), dpi=20
+    )
+
+
+def test_unchanged_chart_is_skipped(db_filename, tmp_path):
+    insert_rows(
+        db_filename,
+        "INSERT INTO lego_sets (set_num, year, num_parts, theme_id) VALUES (?, ?, ?, ?)",
+        [("1-1", 2000, 100, 158)],
+    )
+    assert render(db_filename, tmp_path) == "rendered"
+    assert render(db_filename, tmp_path) == "skipped"
+
+
+def test_no_data_removes_the_old_chart(db_filename, tmp_path):
+    insert_rows(
+        db_filename,
+        "INSERT INTO lego_sets (set_num, year, num_parts, theme_id) VALUES (?, ?, ?, ?)",
+        [("1-1", 2000, 100, 158)],
+    )
+    path = visualizations.chart_path(CHART, str(tmp_path))
+    assert render(db_filename, tmp_path) == "rendered"
+    assert os.path.exists(path)
+
+    conn = sqlite3.connect(db_filename)
+    with conn:
+        conn.execute("DELETE FROM lego_sets")
+    conn.close()
+
+    assert render(db_filename, tmp_path) == "no data"
+    assert not os.path.exists(path)
+    assert not os.path.exists(path + ".sha256")
+    assert render(db_filename, tmp_path) == "no data"
@@ -0,0 +1,336 @@
+"""
+tracing.py
+Purpose: Lightweight spans and counters for seeing where a run's time goes
+
+    with span("lego.insert", theme=158):
+        ...
+    count("rows_written_total", added, table="lego_sets")
+
+    @traced()
+    def calculate_comics_per_year(...):
+        ...
+
+A span records its wall time, the counters that changed while it was open
+(HTTP calls, bytes, cache hits, rows written, ...) and, when memory tracing
+is on, the tracemalloc peak. Counters and the tracemalloc peak are
+process-global, so work a span hands to a thread pool shows up in it, but
+spans that run at the same time (the pipeline's collectors, the threads of
+a pool) also get each other's counters and peaks. Compare those by their
+wall time only.
+
+Spans are collected per process. Worker processes (render_all) send theirs
+back with Tracer.export() and the parent adds them with Tracer.merge().
+
+Tracing is off by default and then costs one function call per span. Turn
+it on with enable(), or set STARWARS_TRACE=<prefix> to trace a whole script
+and write <prefix>.json (every span) and <prefix>.prom (Prometheus textfile)
+when it exits. STARWARS_TRACE_MEMORY=1 also records peak memory.
+"""
+
+import atexit
+import functools
+import itertools
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+METRIC_PREFIX = "starwars_"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def metric_key(name, labels=None):
+    """Prometheus-style series name, e.g. http_requests_total{source="omdb"}."""
+    if not labels:
+        return name
+    label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items()))
+    return f"{name}{{{label_text}}}"
+
+
+class Span:
+    """One timed stage. attrs can be added while it runs with set()."""
+
+    def __init__(self, name, span_id, parent_id, attrs):
+        self.name = name
+        self.id = span_id
+        self.parent_id = parent_id
+        self.attrs = attrs
+        self.peak = 0
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class _NullSpan:
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """
+    Collects finished spans and counters for one process.
+
+    Args:
+        memory (bool): record tracemalloc peaks (starts tracemalloc, which
+            slows Python code down noticeably)
+    """
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.ids = itertools.count(1)
+        self.spans = []
+        self.counters = {}
+        self.started_at = time.time()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _stack(self):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def count(self, name, value=1, **labels):
+        key = metric_key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    @contextmanager
+    def span(self, name, **attrs):
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        current = Span(name, next(self.ids), parent.id if parent else None, attrs)
+
+        with self.lock:
+            counters_before = dict(self.counters)
+        if self.memory:
+            # The peak is global, so hand what we've seen so far to the
+            # parent before resetting it for this span
+            if parent:
+                parent.peak = max(parent.peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+
+        stack.append(current)
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            yield current
+        except BaseException as e:
+            current.attrs["error"] = type(e).__name__
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            stack.pop()
+            if self.memory:
+                current.peak = max(current.peak, tracemalloc.get_traced_memory()[1])
+                if parent:
+                    parent.peak = max(parent.peak, current.peak)
+
+            with self.lock:
+                changed = {
+                    key: value - counters_before.get(key, 0)
+                    for key, value in self.counters.items()
+                    if value != counters_before.get(key, 0)
+                }
+                record = {
+                    "name": name,
+                    "id": current.id,
+                    "parent": current.parent_id,
+                    "thread": threading.current_thread().name,
+                    "start": started_at,
+                    "seconds": seconds,
+                    "attrs": current.attrs,
+                    "counters": changed,
+                }
+                if self.memory:
+                    record["peak_bytes"] = current.peak
+                self.spans.append(record)
+
+    def summary(self):
+        """
+        Totals per span name.
+
+        Returns:
+            dict: {name: {"calls", "seconds", "peak_bytes"}}
+        """
+        totals = {}
+        with self.lock:
+            for record in self.spans:
+                entry = totals.setdefault(
+                    record["name"], {"calls": 0, "seconds": 0.0, "peak_bytes": 0}
+                )
+                entry["calls"] += 1
+                entry["seconds"] += record["seconds"]
+                entry["peak_bytes"] = max(
+                    entry["peak_bytes"], record.get("peak_bytes", 0)
+                )
+        return totals
+
+    def write_json(self, path):
+        """Writes every span and counter as a JSON trace."""
+        import json
+
+        # Imported here so that importing tracing (done by every module) stays cheap
+        from report import write_atomic
+
+        with self.lock:
+            trace = {
+                "started_at": self.started_at,
+                "pid": os.getpid(),
+                "spans": list(self.spans),
+                "counters": dict(self.counters),
+            }
+        write_atomic(path, json.dumps(trace, indent=2, default=str))
+
+    def write_prometheus(self, path):
+        """Writes span totals and counters in the Prometheus textfile format."""
+        from report import write_atomic
+
+        lines = []
+        summary = self.summary()
+
+        span_metrics = [
+            (
+                "span_seconds_total",
+                "counter",
+                "Wall time spent in each span",
+                "seconds",
+            ),
+            ("span_calls_total", "counter", "Times each span ran", "calls"),
+        ]
+        if self.memory:
+            span_metrics.append(
+                (
+                    "span_peak_bytes",
+                    "gauge",
+                    "Peak traced memory in a span",
+                    "peak_bytes",
+                )
+            )
+        for metric, kind, help_text, field in span_metrics:
+            lines.append(f"# HELP {METRIC_PREFIX}{metric} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}{metric} {kind}")
+            for name, entry in sorted(summary.items()):
+                series = metric_key(METRIC_PREFIX + metric, {"span": name})
+                lines.append(f"{series} {entry[field]}")
+
+        with self.lock:
+            counters = sorted(self.counters.items())
+        declared = set()
+        for key, value in counters:
+            metric = key.split("{", 1)[0]
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {METRIC_PREFIX}{metric} counter")
+            lines.append(f"{METRIC_PREFIX}{key} {value}")
+
+        # Prometheus' textfile collector must never see a half-written file
+        write_atomic(path, "\n".join(lines) + "\n")
+
+    def export(self):
+        """
+        Spans and counters collected so far as plain (picklable) data, for
+        a worker process to hand to the parent's merge().
+        """
+        with self.lock:
+            return {
+                "pid": os.getpid(),
+                "spans": list(self.spans),
+                "counters": dict(self.counters),
+            }
+
+    def merge(self, trace):
+        """
+        Adds the spans and counters another process exported. Its top-level
+        spans become children of this thread's current span.
+        """
+        stack = self._stack()
+        parent_id = stack[-1].id if stack else None
+        with self.lock:
+            ids = {record["id"]: next(self.ids) for record in trace["spans"]}
+            for record in trace["spans"]:
+                self.spans.append(
+                    dict(
+                        record,
+                        id=ids[record["id"]],
+                        parent=ids.get(record["parent"], parent_id),
+                        pid=trace["pid"],
+                    )
+                )
+            for key, value in trace["counters"].items():
+                self.counters[key] = self.counters.get(key, 0) + value
+
+
+_tracer = None
+
+
+def enable(memory=False):
+    """Starts tracing in this process and returns the Tracer."""
+    global _tracer
+    _tracer = Tracer(memory=memory)
+    return _tracer
+
+
+def disable():
+    """Stops tracing. Already collected data stays on the returned Tracer."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def get_tracer():
+    """The active Tracer, or None when tracing is off."""
+    return _tracer
+
+
+def span(name, **attrs):
+    """Context manager timing one stage. Does nothing when tracing is off."""
+    if _tracer is None:
+        return nullcontext(_NULL_SPAN)
+    return _tracer.span(name, **attrs)
+
+
+def count(name, value=1, **labels):
+    """Adds `value` to a labelled counter. Does nothing when tracing is off."""
+    if _tracer is not None:
+        _tracer.count(name, value, **labels)
+
+
+def traced(name=None):
+    """Decorator running the whole function inside a span (default: its name)."""
+
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with _tracer.span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def write_reports(prefix):
+    """Writes <prefix>.json and <prefix>.prom for the active tracer."""
+    if _tracer is None:
+        return
+    _tracer.write_json(prefix + ".json")
+    _tracer.write_prometheus(prefix + ".prom")
+
+
+if os.environ.get("STARWARS_TRACE"):
+    enable(memory=os.environ.get("STARWARS_TRACE_MEMORY") == "1")
+    atexit.register(write_reports, os.environ["STARWARS_TRACE"])
@@ -1,17 +1,73 @@
-import matplotlib.pyplot as plt
-import sqlite3
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
+from calculations import (
+    calculate_average_ratings_comparison,
+    calculate_comics_per_year,
+    calculate_lego_complexity_by_year,
+    calculate_star_wars_rating_differences,
+    calculate_top_combined_movies,
+)
+from report import write_atomic
+from tracing import enable, get_tracer, traced
 
-def plot_comics_by_year(data):
+OUTPUT_DIR = "visualizations"
+
+# matplotlib.pyplot is imported inside the functions that draw, so importing
+# this module (e.g. for CHARTS) doesn't load matplotlib
+
+
+def chart_path(name, output_dir=OUTPUT_DIR, fmt="png"):
+    return os.path.join(output_dir, f"{name}.{fmt}")
+
+
+def save_figure(name, output_dir=OUTPUT_DIR, dpi=300, fmt="png", show=True):
+    """
+    Saves the current figure as <output_dir>/<name>.<fmt>, then shows it
+    (interactive runs) and closes it.
+
+    Args:
+        name (str): file name without extension
+        output_dir (str): folder to save into
+        dpi (int): output resolution
+        fmt (str): image format understood by matplotlib (png, svg, pdf, ...)
+        show (bool): open the plot window after saving
+
+    Returns:
+        str: path of the saved file
+    """
+    import matplotlib.pyplot as plt
+
+    path = chart_path(name, output_dir, fmt)
+    plt.savefig(path, dpi=dpi, bbox_inches="tight", format=fmt)
+    print(f"[OK] Saved: {name}.{fmt}")
+
+    if show:
+        plt.show()
+    plt.close()
+    return path
+
+
+@traced()
+def plot_comics_by_year(data, output_dir=OUTPUT_DIR, dpi=300, fmt="png", show=True):
     """
     Creates a bar chart showing the number of comics released per year.
 
     Args:
         data (dict): A dictionary where keys are years (str or int) and values are counts (int).
+        output_dir, dpi, fmt, show: passed to save_figure.
+
+    Returns:
+        bool: True if the chart was drawn, False if there was no data
     """
+    import matplotlib.pyplot as plt
+
     if not data:
         print("No data to visualize.")
-        return
+        return False
 
     try:
         sorted_years = sorted(data.keys(), key=lambda x: int(x))
@@ -40,12 +96,9 @@ def plot_comics_by_year(data):
     # Automatically adjust subplot parameters to give specified padding
     plt.tight_layout()
 
-    # Save image
-    plt.savefig("visualizations/lego_comics.png", dpi=300, bbox_inches="tight")
-    print("[OK] Saved: lego_vs_star_wars_overall.png")
-
-    # Display the plot
-    plt.show()
+    # Save image and display the plot
+    save_figure("lego_comics", output_dir, dpi, fmt, show)
+    return True
 
 
 # ============================================================================
@@ -54,42 +107,45 @@ def plot_comics_by_year(data):
 # ============================================================================
 
 
-def plot_star_wars_rating_differences(db_filename="starwars.db"):
+@traced()
+def plot_star_wars_rating_differences(
+    data, output_dir=OUTPUT_DIR, dpi=300, fmt="png", show=True
+):
     """
     REQUIRED VISUALIZATION: Bar chart showing IMDb vs RT differences for Star Wars.
     Shows which Star Wars movies have agreement/disagreement between critics and audiences.
+
+    Args:
+        data (dict): {title: {"imdb", "rt", "difference", "is_star_wars"}} from
+            calculate_star_wars_rating_differences (or calculate_rating_differences,
+            non-Star Wars movies are skipped)
+        output_dir, dpi, fmt, show: passed to save_figure.
+
+    Returns:
+        bool: True if the chart was drawn, False if there was no data
     """
-    conn = sqlite3.connect(db_filename)
-    cur = conn.cursor()
-
-    cur.execute(
-        """
-        SELECT title, imdb_rating, rotten_tomatoes
-        FROM MovieMetrics
-        WHERE imdb_rating IS NOT NULL 
-        AND rotten_tomatoes IS NOT NULL
-        AND is_star_wars = 1
-        ORDER BY (imdb_rating * 10 - rotten_tomatoes) DESC
-    """
-    )
+    import matplotlib.pyplot as plt
 
-    rows = cur.fetchall()
-    conn.close()
+    # Largest difference first, ties by title
+    rows = sorted(
+        ((title, movie) for title, movie in data.items() if movie["is_star_wars"]),
+        key=lambda row: (-row[1]["difference"], row[0]),
+    )
 
     if not rows:
         print("No Star Wars movie data to visualize.")
-        return
+        return False
 
     movies = []
     differences = []
 
-    for title, imdb_rating, rt_score in rows:
+    for title, movie in rows:
         # Shorten titles
         short_title = title.replace("Star Wars: Episode ", "EP ")
         short_title = short_title.replace(" - A Star Wars Story", "")
         short_title = short_title.replace("Star Wars: ", "")
         movies.append(short_title)
-        differences.append(imdb_rating * 10 - rt_score)
+        differences.append(movie["difference"])
 
     # Create plot
     fig, ax = plt.subplots(figsize=(14, 8))
@@ -150,52 +206,38 @@ def plot_star_wars_rating_differences(db_filename="starwars.db"):
     ax.legend(handles=legend_elements, loc="upper right", fontsize=11)
 
     plt.tight_layout()
-    plt.savefig(
-        "visualizations/star_wars_rating_differences.png", dpi=300, bbox_inches="tight"
-    )
-    print("[OK] Saved: star_wars_rating_differences.png")
-    plt.show()
+    save_figure("star_wars_rating_differences", output_dir, dpi, fmt, show)
+    return True
 
 
-def plot_star_wars_vs_all_averages(db_filename="starwars.db"):
+@traced()
+def plot_star_wars_vs_all_averages(
+    data, output_dir=OUTPUT_DIR, dpi=300, fmt="png", show=True
+):
     """
     EXTRA VISUALIZATION #1: Compare Star Wars average ratings to all other movies.
     Shows if Star Wars rates higher or lower than the other collected films.
+
+    Args:
+        data (dict): result of calculate_average_ratings_comparison
+        output_dir, dpi, fmt, show: passed to save_figure.
+
+    Returns:
+        bool: True if the chart was drawn, False if there was no data
     """
-    conn = sqlite3.connect(db_filename)
-    cur = conn.cursor()
-
-    # Star Wars averages
-    cur.execute(
-        """
-        SELECT AVG(imdb_rating), AVG(rotten_tomatoes), COUNT(*)
-        FROM MovieMetrics
-        WHERE is_star_wars = 1 
-        AND imdb_rating IS NOT NULL 
-        AND rotten_tomatoes IS NOT NULL
-    """
-    )
-    sw_result = cur.fetchone()
-    sw_imdb = sw_result[0] * 10 if sw_result[0] else 0
-    sw_rt = sw_result[1] if sw_result[1] else 0
-    sw_count = sw_result[2]
-
-    # Other movies averages
-    cur.execute(
-        """
-        SELECT AVG(imdb_rating), AVG(rotten_tomatoes), COUNT(*)
-        FROM MovieMetrics
-        WHERE is_star_wars = 0 
-        AND imdb_rating IS NOT NULL 
-        AND rotten_tomatoes IS NOT NULL
-    """
-    )
-    other_result = cur.fetchone()
-    other_imdb = other_result[0] * 10 if other_result[0] else 0
-    other_rt = other_result[1] if other_result[1] else 0
-    other_count = other_result[2]
+    import matplotlib.pyplot as plt
 
-    conn.close()
+    if not data:
+        print("No rating data to visualize.")
+        return False
+
+    sw_imdb = data["star_wars"]["imdb"]
+    sw_rt = data["star_wars"]["rt"]
+    sw_count = data["star_wars"]["count"]
+
+    other_imdb = data["other_movies"]["imdb"]
+    other_rt = data["other_movies"]["rt"]
+    other_count = data["other_movies"]["count"]
 
     # Create side-by-side comparison
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 7))
@@ -277,48 +319,43 @@ def plot_star_wars_vs_all_averages(db_filename="starwars.db"):
     )
 
     plt.tight_layout()
-    plt.savefig(
-        "visualizations/star_wars_vs_all_averages.png", dpi=300, bbox_inches="tight"
-    )
-    print("[OK] Saved: star_wars_vs_all_averages.png")
-    plt.show()
+    save_figure("star_wars_vs_all_averages", output_dir, dpi, fmt, show)
+    return True
 
 
-def plot_top_movies_with_star_wars_highlighted(db_filename="starwars.db"):
+@traced()
+def plot_top_movies_with_star_wars_highlighted(
+    data, output_dir=OUTPUT_DIR, dpi=300, fmt="png", show=True
+):
     """
     EXTRA VISUALIZATION #2: Top 15 movies with Star Wars highlighted.
     Shows where Star Wars movies rank among all collected films.
-    """
-    conn = sqlite3.connect(db_filename)
-    cur = conn.cursor()
-
-    cur.execute(
-        """
-        SELECT title, imdb_rating, rotten_tomatoes, is_star_wars
-        FROM MovieMetrics
-        WHERE imdb_rating IS NOT NULL AND rotten_tomatoes IS NOT NULL
-        ORDER BY (imdb_rating * 10 + rotten_tomatoes) / 2 DESC
-        LIMIT 15
-    """
-    )
 
-    rows = cur.fetchall()
-    conn.close()
+    Args:
+        data (list[dict]): result of calculate_top_combined_movies(limit=15)
+        output_dir, dpi, fmt, show: passed to save_figure.
 
-    if not rows:
+    Returns:
+        bool: True if the chart was drawn, False if there was no data
+    """
+    import matplotlib.pyplot as plt
+
+    if not data:
         print("No data for ranking visualization.")
-        return
+        return False
 
     titles = []
     avg_ratings = []
     colors = []
 
-    for title, imdb, rt, is_sw in rows:
+    for movie in data:
         # Shorten titles
+        title = movie["title"]
         short_title = title[:45] + "..." if len(title) > 45 else title
         titles.append(short_title)
-        avg_ratings.append((imdb * 10 + rt) / 2)
-        colors.append("#FFD700" if is_sw else "#3498db")  # Gold for Star Wars
+        avg_ratings.append(movie["combined"])
+        # Gold for Star Wars
+        colors.append("#FFD700" if movie["is_star_wars"] else "#3498db")
 
     # Create plot
     fig, ax = plt.subplots(figsize=(12, 10))
@@ -370,43 +407,36 @@ def plot_top_movies_with_star_wars_highlighted(db_filename="starwars.db"):
     ax.legend(handles=legend_elements, loc="lower center", fontsize=11)
 
     plt.tight_layout()
-    plt.savefig("visualizations/top_movies_ranking.png", dpi=300, bbox_inches="tight")
-    print("[OK] Saved: top_movies_ranking.png")
-    plt.show()
+    save_figure("top_movies_ranking", output_dir, dpi, fmt, show)
+    return True
 
 
 # LEGOOOO TIMEEEEE
-def plot_lego_complexity_by_year(db_filename="starwars.db"):
+@traced()
+def plot_lego_complexity_by_year(
+    data, output_dir=OUTPUT_DIR, dpi=300, fmt="png", show=True
+):
     """
     Creates a bar chart showing the average number of pieces
     per Lego set for each release year.
 
     Data source: lego_sets table (from Rebrickable API).
+
+    Args:
+        data (dict): {year: average_num_parts} from calculate_lego_complexity_by_year
+        output_dir, dpi, fmt, show: passed to save_figure.
+
+    Returns:
+        bool: True if the chart was drawn, False if there was no data
     """
-    conn = sqlite3.connect(db_filename)
-    cur = conn.cursor()
-
-    # Get average num_parts per year, ignoring NULLs
-    cur.execute(
-        """
-        SELECT year, AVG(num_parts), COUNT(*)
-        FROM lego_sets
-        WHERE year IS NOT NULL
-          AND num_parts IS NOT NULL
-        GROUP BY year
-        ORDER BY year ASC
-    """
-    )
-    rows = cur.fetchall()
-    conn.close()
+    import matplotlib.pyplot as plt
 
-    if not rows:
+    if not data:
         print("No Lego data available for visualization.")
-        return
+        return False
 
-    years = [row[0] for row in rows]
-    avg_parts = [row[1] for row in rows]
-    counts = [row[2] for row in rows]  # in case you want to mention it in your report
+    years = sorted(data)
+    avg_parts = [data[year] for year in years]
 
     # Convert years to strings for nicer x-axis labels
     years_str = [str(y) for y in years]
@@ -428,33 +458,256 @@ def plot_lego_complexity_by_year(db_filename="starwars.db"):
     plt.grid(axis="y", linestyle="--", alpha=0.7, zorder=0)
 
     plt.tight_layout()
-    plt.savefig(
-        "visualizations/lego_complexity_by_year.png", dpi=300, bbox_inches="tight"
-    )
-    print("[OK] Saved: lego_complexity_by_year.png")
+    save_figure("lego_complexity_by_year", output_dir, dpi, fmt, show)
+    return True
+
+
+# ============================================================================
+# HEADLESS BATCH RENDERING
+# Renders every chart in parallel without opening any windows
+# ============================================================================
+
+# Chart name: (calculation giving its data, plot function). Order matches
+# the interactive run below.
+CHARTS = {
+    "lego_comics": (calculate_comics_per_year, plot_comics_by_year),
+    "star_wars_rating_differences": (
+        calculate_star_wars_rating_differences,
+        plot_star_wars_rating_differences,
+    ),
+    "star_wars_vs_all_averages": (
+        calculate_average_ratings_comparison,
+        plot_star_wars_vs_all_averages,
+    ),
+    "top_movies_ranking": (
+        lambda db_filename: calculate_top_combined_movies(15, db_filename),
+        plot_top_movies_with_star_wars_highlighted,
+    ),
+    "lego_complexity_by_year": (
+        calculate_lego_complexity_by_year,
+        plot_lego_complexity_by_year,
+    ),
+}
+
+
+def _use_headless_backend():
+    # Agg only draws to files, it never needs a display or blocks on a window
+    os.environ["MPLBACKEND"] = "Agg"
+    import matplotlib.pyplot as plt
+
+    plt.switch_backend("Agg")
+
+
+def chart_fingerprint(name, data, dpi, fmt):
+    """
+    sha256 of everything a chart's image depends on: its input data, the
+    plot function's code and the render settings.
+    """
+    import inspect
+
+    plot = CHARTS[name][1]
+    digest = hashlib.sha256()
+    digest.update(inspect.getsource(plot).encode())
+    digest.update(repr((name, data, dpi, fmt)).encode())
+    return digest.hexdigest()
+
+
+def render_chart(
+    name,
+    db_filename="starwars.db",
+    output_dir=OUTPUT_DIR,
+    dpi=300,
+    fmt="png",
+    show=False,
+    force=False,
+):
+    """
+    Renders one chart from CHARTS unless it is unchanged.
 
-    plt.show()
+    The fingerprint of the rendered chart is saved next to it as
+    <name>.<fmt>.sha256. When the chart file exists and its data and settings
+    still have the same fingerprint, rendering is skipped.
+
+    Returns:
+        str: "rendered", "skipped" or "no data"
+    """
+    calculate, plot = CHARTS[name]
+    data = calculate(db_filename)
+    path = chart_path(name, output_dir, fmt)
+    hash_path = path + ".sha256"
+    fingerprint = chart_fingerprint(name, data, dpi, fmt)
+
+    if not force and os.path.exists(path):
+        try:
+            with open(hash_path) as f:
+                if f.read().strip() == fingerprint:
+                    print(f"[SKIP] {name}.{fmt} unchanged")
+                    return "skipped"
+        except OSError:
+            pass
+
+    if not plot(data, output_dir=output_dir, dpi=dpi, fmt=fmt, show=show):
+        # Don't leave an image of the old data behind, or a fingerprint
+        # that would make the next run skip the chart
+        for stale in (path, hash_path):
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                pass
+        return "no data"
+    write_atomic(hash_path, fingerprint + "\n")
+    return "rendered"
+
+
+def _render_chart(name, db_filename, output_dir, dpi, fmt, force, trace_memory=None):
+    """
+    Renders one chart in a worker process.
+
+    Args:
+        trace_memory (bool, optional): trace the worker (None: tracing is
+            off), with or without memory peaks
+
+    Returns:
+        tuple: (chart name, status, seconds taken, trace). trace is the
+        worker's spans and counters (see tracing.Tracer.export), or None
+        when tracing is off.
+    """
+    _use_headless_backend()
+    # Pool workers exit without running atexit handlers, so their spans are
+    # sent back to the parent. Start empty: a forked worker inherits the
+    # parent's tracer and spans.
+    tracer = None if trace_memory is None else enable(memory=trace_memory)
+    start = time.perf_counter()
+    status = render_chart(name, db_filename, output_dir, dpi, fmt, force=force)
+    seconds = time.perf_counter() - start
+    return name, status, seconds, tracer.export() if tracer else None
+
+
+@traced()
+def render_all(
+    db_filename="starwars.db",
+    output_dir=OUTPUT_DIR,
+    dpi=300,
+    fmt="png",
+    workers=None,
+    force=False,
+):
+    """
+    Headless batch mode: renders every chart in CHARTS in a process pool
+    with a non-interactive backend and never calls plt.show(). Charts whose
+    data and settings are unchanged are skipped unless `force` is set.
+    When tracing is on, the workers' spans are added to this process's
+    trace under the render_all span.
+
+    Args:
+        db_filename (str): filename of the database
+        output_dir (str): folder the charts are saved into
+        dpi (int): output resolution
+        fmt (str): image format (png, svg, pdf, ...)
+        workers (int, optional): number of processes. Defaults to one per chart
+            (capped at the CPU count).
+        force (bool): re-render every chart
+
+    Returns:
+        dict: {chart name: (status, seconds)}, see render_chart for statuses
+    """
+    _use_headless_backend()
+    os.makedirs(output_dir, exist_ok=True)
+    if workers is None:
+        workers = min(len(CHARTS), os.cpu_count() or 1)
+
+    tracer = get_tracer()
+    trace_memory = None if tracer is None else tracer.memory
+
+    start = time.perf_counter()
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                _render_chart,
+                name,
+                db_filename,
+                output_dir,
+                dpi,
+                fmt,
+                force,
+                trace_memory,
+            )
+            for name in CHARTS
+        ]
+        for future in futures:
+            name, status, seconds, trace = future.result()
+            results[name] = (status, seconds)
+            if trace:
+                tracer.merge(trace)
+    total = time.perf_counter() - start
+
+    print(f"\n{'Chart':<32} {'Status':<9} {'Time (s)':>8}")
+    print("-" * 51)
+    for name, (status, seconds) in results.items():
+        print(f"{name:<32} {status:<9} {seconds:>8.2f}")
+    print("-" * 51)
+    print(f"{'Total wall time':<42} {total:>8.2f}  ({workers} workers)")
+
+    return results
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the project visualizations")
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="headless mode: render all charts in parallel without opening windows",
+    )
+    parser.add_argument("--dpi", type=int, default=300, help="output resolution")
+    parser.add_argument(
+        "--format", default="png", help="image format, e.g. png, svg or pdf"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="processes used in batch mode"
+    )
+    parser.add_argument("--db", default="starwars.db", help="database filename")
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="re-render charts even if their data and settings are unchanged",
+    )
+    args = parser.parse_args()
+
+    if args.batch:
+        print("Creating visualizations (batch mode)...")
+        render_all(
+            args.db,
+            dpi=args.dpi,
+            fmt=args.format,
+            workers=args.workers,
+            force=args.force,
+        )
+        raise SystemExit(0)
+
+    options = {
+        "db_filename": args.db,
+        "dpi": args.dpi,
+        "fmt": args.format,
+        "show": True,
+        "force": args.force,
+    }
+
     print("Creating visualizations...")
 
     # Comics visualization
-    from calculations import calculate_comics_per_year
-
-    data = calculate_comics_per_year()
-    plot_comics_by_year(data)
+    render_chart("lego_comics", **options)
 
     # OMDB visualizations
     print("\n1. Required: Star Wars rating differences...")
-    plot_star_wars_rating_differences()
+    render_chart("star_wars_rating_differences", **options)
 
     print("\n2. Extra #1: Star Wars vs All Movies averages...")
-    plot_star_wars_vs_all_averages()
+    render_chart("star_wars_vs_all_averages", **options)
 
     print("\n3. Extra #2: Top movies with Star Wars highlighted...")
-    plot_top_movies_with_star_wars_highlighted()
+    render_chart("top_movies_ranking", **options)
 
     # Rebrickable visualizations
-    plot_lego_complexity_by_year()
+    render_chart("lego_complexity_by_year", **options)
     print("\nAll visualizations complete!")